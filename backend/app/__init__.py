@@ -1,8 +1,6 @@
 import os
-import requests
 import random
 import threading
-import time
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,11 +12,20 @@ from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import json
 
+from backend.blockchain.block_log import BlockLog
 from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.mining_engine import create_mining_engine
+from backend.config import (
+    MAX_PAGE_SIZE,
+    MEMPOOL_MAX_BYTES,
+    MEMPOOL_MAX_TRANSACTIONS
+)
 from backend.wallet.wallet import Wallet
 from backend.wallet.transaction import Transaction
 from backend.wallet.transaction_pool import TransactionPool
+from backend.miner import MinerService
 from backend.pubsub import PubSub
+from backend.sync import RootPoller, stream_blockchain
 
 app = Flask(__name__)
 CORS(app, resources={ r'/*': { 'origins': 'http://localhost:3000' } })
@@ -34,10 +41,24 @@ def json_response(data, status=200):
         status=status,
         mimetype='application/json'
     )
-blockchain = Blockchain()
+mining_workers = os.environ.get('MINING_WORKERS')
+chain_data_dir = os.environ.get('CHAIN_DATA_DIR')
+blockchain = Blockchain(
+    create_mining_engine(int(mining_workers) if mining_workers else None),
+    int(os.environ.get('VALIDATION_WORKERS', os.cpu_count() or 1)),
+    validate_transactions=True,
+    block_log=BlockLog(
+        chain_data_dir,
+        binary=os.environ.get('CHAIN_STORAGE_FORMAT') == 'binary'
+    ) if chain_data_dir else None,
+    lazy_chain=os.environ.get('LAZY_CHAIN') == 'True'
+)
 wallet = Wallet(blockchain)
-transaction_pool = TransactionPool()
+transaction_pool = TransactionPool(MEMPOOL_MAX_TRANSACTIONS, MEMPOOL_MAX_BYTES)
 pubsub = PubSub(blockchain, transaction_pool)
+miner = MinerService(blockchain, transaction_pool, wallet, pubsub)
+# Set when POLL_ROOT is enabled
+root_poller = None
 
 @app.route('/')
 def route_default():
@@ -45,15 +66,85 @@ def route_default():
 
 @app.route('/blockchain')
 def route_blockchain():
-    return json_response(blockchain.to_json())
+    body, etag = blockchain.encoded_response()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+
+    # Answers 304 Not Modified if the If-None-Match header holds the etag
+    return response.make_conditional(request)
+
+@app.route('/blockchain/stream')
+def route_blockchain_stream():
+    # One block per line, sent as chunks while the blocks are written out
+    response = Response(blockchain.encoded_lines(), mimetype='application/x-ndjson')
+    response.headers['X-Chain-Length'] = str(len(blockchain.chain))
+
+    return response
+
+@app.route('/blockchain/tip')
+def route_blockchain_tip():
+    length, tip_hash = blockchain.tip()
+
+    return jsonify({ 'length': length, 'hash': tip_hash })
+
+def blocks_after_response(locator, limit):
+    limit = min(int(limit), MAX_PAGE_SIZE)
+
+    # The located block must still be in the chain when the blocks are read
+    with blockchain.lock:
+        height = blockchain.locate(locator)
+
+        if height is None:
+            return jsonify({ 'message': 'Unknown block' }), 404
+
+        blocks = blockchain.blocks_after(height, max(limit, 1))
+
+    return json_response({
+        'start': height + 1,
+        'blocks': [block.to_json() for block in blocks]
+    })
+
+@app.route('/blockchain/after/<block_hash>')
+def route_blockchain_after(block_hash):
+    # http://localhost:5050/blockchain/after/<hash>?limit=100
+    return blocks_after_response(
+        [block_hash],
+        request.args.get('limit', MAX_PAGE_SIZE)
+    )
+
+@app.route('/blockchain/locate', methods=['POST'])
+def route_blockchain_locate():
+    # Takes { 'locator': [block hashes from the tip back to the genesis] }
+    body = request.get_json()
+
+    return blocks_after_response(
+        body['locator'],
+        body.get('limit', MAX_PAGE_SIZE)
+    )
 
 @app.route('/blockchain/range')
 def route_blockchain_range():
     # http://localhost:5050/blockchain/range?start=2&end=5
     start = int(request.args.get('start'))
     end = int(request.args.get('end'))
+    blocks = blockchain.range_from_tip(start, end, MAX_PAGE_SIZE)
+
+    return json_response([block.to_json() for block in blocks])
+
+@app.route('/blockchain/page')
+def route_blockchain_page():
+    # http://localhost:5050/blockchain/page?limit=10&cursor=42
+    cursor = request.args.get('cursor')
+    limit = min(int(request.args.get('limit', 10)), MAX_PAGE_SIZE)
+    blocks, next_cursor = blockchain.page_from_tip(
+        int(cursor) if cursor is not None else None,
+        max(limit, 1)
+    )
 
-    return jsonify(blockchain.to_json()[::-1][start:end])
+    return json_response({
+        'blocks': [block.to_json() for block in blocks],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/blockchain/length')
 def route_blockchain_length():
@@ -61,15 +152,36 @@ def route_blockchain_length():
 
 @app.route('/blockchain/mine')
 def route_blockchain_mine():
-    transaction_data = transaction_pool.transaction_data()
-    transaction_data.append(Transaction.reward_transaction(wallet).to_json())
-    blockchain.add_block(transaction_data)
-    block = blockchain.chain[-1]
-    pubsub.broadcast_block(block)
-    transaction_pool.clear_blockchain_transactions(blockchain)
+    # The background miner already mines on the tip
+    if miner.running:
+        return json_response(
+            { 'error': 'The background miner is running. Stop it with /miner/stop.' },
+            409
+        )
+
+    block = miner.mine_block(threading.Event())
+
+    if block is None:
+        return json_response({ 'error': 'The chain tip changed while mining' }, 409)
 
     return json_response(block.to_json())
 
+@app.route('/miner/start')
+def route_miner_start():
+    miner.start()
+
+    return jsonify(miner.stats())
+
+@app.route('/miner/stop')
+def route_miner_stop():
+    miner.stop()
+
+    return jsonify(miner.stats())
+
+@app.route('/miner/status')
+def route_miner_status():
+    return jsonify(miner.stats())
+
 @app.route('/wallet/transact', methods=['POST'])
 def route_wallet_transact():
     transaction_data = request.get_json()
@@ -88,8 +200,13 @@ def route_wallet_transact():
             transaction_data['amount']
         )
 
+    evicted = transaction_pool.set_transaction(transaction)
+
+    # A full pool evicts the new transaction if it has the lowest priority
+    if any(evicted_transaction.id == transaction.id for evicted_transaction in evicted):
+        return json_response({ 'error': 'The transaction pool is full' }, 503)
+
     pubsub.broadcast_transaction(transaction)
-    transaction_pool.set_transaction(transaction)
 
     return jsonify(transaction.to_json())
 
@@ -99,18 +216,50 @@ def route_wallet_info():
 
 @app.route('/known-addresses')
 def route_known_addresses():
-    known_addresses = set()
-
-    for block in blockchain.chain:
-        for transaction in block.data:
-            known_addresses.update(transaction['output'].keys())
-
-    return jsonify(list(known_addresses))
+    return jsonify(blockchain.known_addresses())
+
+@app.route('/transaction/<transaction_id>')
+def route_transaction(transaction_id):
+    found_transaction = blockchain.find_transaction(transaction_id)
+
+    if found_transaction is None:
+        return json_response({ 'error': 'Transaction not found' }, 404)
+
+    block_index, position, transaction = found_transaction
+
+    return json_response({
+        'block_index': block_index,
+        'position': position,
+        'transaction': transaction
+    })
+
+@app.route('/address/<address>/history')
+def route_address_history(address):
+    return json_response([
+        {
+            'block_index': block_index,
+            'position': position,
+            'transaction': transaction
+        }
+        for block_index, position, transaction in blockchain.address_history(address)
+    ])
 
 @app.route('/transactions')
 def route_transactions():
     return jsonify(transaction_pool.transaction_data())
 
+@app.route('/metrics')
+def route_metrics():
+    return json_response({
+        'caches': {
+            'public_key': Wallet.public_key_cache.stats(),
+            'verified_signature': Transaction.verified_signature_cache.stats()
+        },
+        'publisher': pubsub.publisher.stats(),
+        'relay': pubsub.listener.stats(),
+        'polling': root_poller.stats() if root_poller else None
+    })
+
 ROOT_PORT = 5050
 PORT = ROOT_PORT
 # In Docker, use service name supplied by an env variable instead of localhost
@@ -119,11 +268,8 @@ root_host = os.environ.get('ROOT_HOST', 'localhost')
 if os.environ.get('PEER') == 'True':
     PORT = random.randint(5051, 6000)
 
-    result = requests.get(f'http://{root_host}:{ROOT_PORT}/blockchain')
-    result_blockchain = Blockchain.from_json(result.json())
-
     try:
-        blockchain.replace_chain(result_blockchain.chain)
+        stream_blockchain(blockchain, f'http://{root_host}:{ROOT_PORT}/blockchain/stream')
         print('\n -- Successfully synchronized the local chain')
     except Exception as e:
         print(f'\n -- Error synchronizing: {e}')
@@ -141,27 +287,27 @@ if os.environ.get('SEED_DATA') == 'True':
         transaction_pool.set_transaction(transaction)
 
 def poll_root_blockchain():
-    poll_interval = int(os.environ.get('POLL_INTERVAL', '15'))
     root_host = os.environ.get('ROOT_HOST', 'localhost')
 
-    print(f'\n -- Starting polling thread for {root_host}:{ROOT_PORT} every {poll_interval}s')
+    print(f'\n -- Starting polling thread for {root_host}:{ROOT_PORT}, at most every {root_poller.idle_interval}s while idle')
 
-    while True:
-        try:
-            result = requests.get(f'http://{root_host}:{ROOT_PORT}/blockchain')
-            result_blockchain = Blockchain.from_json(result.json())
-            blockchain.replace_chain(result_blockchain.chain)
-            print(f'\n -- Successfully polled blockchain from {root_host}')
-        except Exception as e:
-            print(f'\n -- Error polling root blockchain: {e}')
-        
-        time.sleep(poll_interval)
+    root_poller.run()
 
 if os.environ.get('POLL_ROOT') == 'True':
+    root_poller = RootPoller(
+        blockchain,
+        transaction_pool,
+        f"http://{os.environ.get('ROOT_HOST', 'localhost')}:{ROOT_PORT}",
+        int(os.environ.get('POLL_INTERVAL', '15'))
+    )
+
     # Start polling in a background daemon thread so it doesn't block Flask
     polling_thread = threading.Thread(target=poll_root_blockchain, daemon=True)
     polling_thread.start()
 
+if os.environ.get('AUTO_MINE') == 'True':
+    miner.start()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=PORT, debug=True)
 
@@ -0,0 +1,62 @@
+from backend.config import STARTING_BALANCE
+
+class BalanceIndex:
+    """
+    Address balances derived from the transactions of a chain.
+    Blocks are applied in order and every applied block keeps an undo record,
+    so that a chain replacement can roll the index back to the fork point.
+    """
+    def __init__(self):
+        self.balances = {}
+        self.undo_log = []
+
+    @property
+    def length(self):
+        """
+        The number of chain blocks applied to the index.
+        """
+        return len(self.undo_log)
+
+    def sync(self, chain):
+        """
+        Apply the chain blocks that the index has not seen yet.
+        """
+        for i in range(self.length, len(chain)):
+            self.apply_block(chain[i])
+
+    def apply_block(self, block):
+        """
+        Apply the transactions of the block.
+        Any time an address conducts a new transaction it resets its balance to
+        its output. Every other output adds to the recipient's balance.
+        """
+        undo = {}
+
+        for transaction in block.transactions():
+            sender = transaction['input']['address']
+
+            for address, amount in transaction['output'].items():
+                if address not in undo:
+                    undo[address] = self.balances.get(address)
+
+                if address == sender:
+                    self.balances[address] = amount
+                else:
+                    self.balances[address] = \
+                        self.balances.get(address, STARTING_BALANCE) + amount
+
+        self.undo_log.append(undo)
+
+    def rollback(self, length):
+        """
+        Undo the applied blocks until only the first `length` blocks remain.
+        """
+        while self.length > length:
+            for address, balance in self.undo_log.pop().items():
+                if balance is None:
+                    del self.balances[address]
+                else:
+                    self.balances[address] = balance
+
+    def balance(self, address):
+        return self.balances.get(address, STARTING_BALANCE)
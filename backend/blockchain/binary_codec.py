@@ -0,0 +1,442 @@
+import re
+import struct
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from backend.blockchain.block import Block, BLOCK_FIELDS
+from backend.config import MINING_REWARD_INPUT
+from backend.util.lru_cache import LRUCache
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+# Version 1 of the compact binary format for blocks and transactions.
+# Every encoded block or transaction starts with the format version byte.
+FORMAT_VERSION = 1
+
+# Tags of the encoded json values
+TAG_NULL = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STRING = 5
+TAG_LIST = 6
+TAG_DICT = 7
+# A string of 64 lowercase hex characters, stored as its 32 raw bytes
+TAG_HASH = 8
+# A dict in the Transaction json form, see transaction_layout
+TAG_TRANSACTION = 9
+
+# Transaction flags
+FLAG_REWARD = 1
+FLAG_STRING_SIGNATURE = 2
+
+TRANSACTION_KEYS = ['id', 'output', 'input']
+TRANSACTION_INPUT_KEYS = ['timestamp', 'amount', 'address', 'public_key', 'signature']
+
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+DECIMAL_PATTERN = re.compile(r'[0-9]+')
+FLOAT = struct.Struct('>d')
+
+COMPRESSED_KEY_SIZE = 33
+SIGNATURE_VALUE_SIZE = 32
+
+# PEM public key -> compressed point, or None if the PEM can't round-trip
+compressed_key_cache = LRUCache(1024)
+# Compressed point -> PEM public key
+pem_key_cache = LRUCache(1024)
+
+def write_varint(buffer, value):
+    """
+    Append the unsigned LEB128 encoding of the value to the buffer.
+    """
+    while value >= 0x80:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+
+    buffer.append(value)
+
+def read_varint(data, position):
+    """
+    Return the (value, position) of the unsigned LEB128 integer at position.
+    """
+    value = 0
+    shift = 0
+
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+
+        if byte < 0x80:
+            return value, position
+
+        shift += 7
+
+def write_int(buffer, value):
+    """
+    Append a signed integer as a zigzag varint.
+    """
+    write_varint(buffer, value * 2 if value >= 0 else -value * 2 - 1)
+
+def read_int(data, position):
+    value, position = read_varint(data, position)
+
+    return (value >> 1 if value % 2 == 0 else -((value + 1) >> 1)), position
+
+def write_string(buffer, value):
+    encoded = value.encode('utf-8')
+    write_varint(buffer, len(encoded))
+    buffer.extend(encoded)
+
+def read_string(data, position):
+    length, position = read_varint(data, position)
+    end = position + length
+
+    return bytes(data[position:end]).decode('utf-8'), end
+
+def read_bytes(data, position, length):
+    end = position + length
+
+    if end > len(data):
+        raise Exception('Truncated binary data')
+
+    return bytes(data[position:end]), end
+
+def compress_public_key(public_key):
+    """
+    Return the 33 byte compressed SECP256K1 point of a PEM public key, or None
+    if the PEM is not exactly what decompress_public_key produces.
+    """
+    if public_key in compressed_key_cache:
+        return compressed_key_cache.get(public_key)
+
+    compressed_key = None
+
+    try:
+        deserialized_public_key = Wallet.load_public_key(public_key)
+
+        if isinstance(deserialized_public_key.curve, ec.SECP256K1):
+            compressed_key = deserialized_public_key.public_bytes(
+                serialization.Encoding.X962,
+                serialization.PublicFormat.CompressedPoint
+            )
+
+            if decompress_public_key(compressed_key) != public_key:
+                compressed_key = None
+    except Exception:
+        compressed_key = None
+
+    compressed_key_cache.put(public_key, compressed_key)
+
+    return compressed_key
+
+def decompress_public_key(compressed_key):
+    """
+    Return the PEM public key of a 33 byte compressed SECP256K1 point.
+    """
+    public_key = pem_key_cache.get(compressed_key)
+
+    if public_key is None:
+        public_key = ec.EllipticCurvePublicKey.from_encoded_point(
+            ec.SECP256K1(),
+            compressed_key
+        ).public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+        pem_key_cache.put(compressed_key, public_key)
+
+    return public_key
+
+def is_amount(value):
+    return type(value) is int
+
+def signature_values(signature):
+    """
+    Return the (r, s, as_strings) of a json signature, or None if the signature
+    can't be stored as two raw 32 byte values.
+    """
+    if not isinstance(signature, list) or len(signature) != 2:
+        return None
+
+    if all(type(value) is int for value in signature):
+        values = signature
+        as_strings = False
+    elif all(
+        isinstance(value, str) and DECIMAL_PATTERN.fullmatch(value)
+        for value in signature
+    ):
+        values = [int(value) for value in signature]
+        as_strings = True
+
+        if [str(value) for value in values] != signature:
+            return None
+    else:
+        return None
+
+    if not all(0 <= value < 2 ** (8 * SIGNATURE_VALUE_SIZE) for value in values):
+        return None
+
+    return values[0], values[1], as_strings
+
+def transaction_layout(value):
+    """
+    Return the transaction flags and compressed public key if the dict can use
+    the compact transaction encoding, or None.
+    """
+    if list(value.keys()) != TRANSACTION_KEYS or not isinstance(value['id'], str):
+        return None
+
+    output = value['output']
+
+    if not isinstance(output, dict) or not all(
+        isinstance(address, str) and is_amount(amount)
+        for address, amount in output.items()
+    ):
+        return None
+
+    if value['input'] == MINING_REWARD_INPUT:
+        return FLAG_REWARD, None
+
+    input = value['input']
+
+    if not isinstance(input, dict) or list(input.keys()) != TRANSACTION_INPUT_KEYS:
+        return None
+
+    if not is_amount(input['timestamp']) or not is_amount(input['amount']) or \
+            not isinstance(input['address'], str) or \
+            not isinstance(input['public_key'], str):
+        return None
+
+    signature = signature_values(input['signature'])
+
+    if signature is None:
+        return None
+
+    compressed_key = compress_public_key(input['public_key'])
+
+    if compressed_key is None:
+        return None
+
+    return (FLAG_STRING_SIGNATURE if signature[2] else 0), compressed_key
+
+def write_transaction(buffer, value, flags, compressed_key):
+    buffer.append(flags)
+    write_string(buffer, value['id'])
+    write_varint(buffer, len(value['output']))
+
+    for address, amount in value['output'].items():
+        write_string(buffer, address)
+        write_int(buffer, amount)
+
+    if flags & FLAG_REWARD:
+        return
+
+    input = value['input']
+    r, s, as_strings = signature_values(input['signature'])
+    write_int(buffer, input['timestamp'])
+    write_int(buffer, input['amount'])
+    write_string(buffer, input['address'])
+    buffer.extend(compressed_key)
+    buffer.extend(r.to_bytes(SIGNATURE_VALUE_SIZE, 'big'))
+    buffer.extend(s.to_bytes(SIGNATURE_VALUE_SIZE, 'big'))
+
+def read_transaction(data, position):
+    flags = data[position]
+    id, position = read_string(data, position + 1)
+    output_count, position = read_varint(data, position)
+    output = {}
+
+    for i in range(output_count):
+        address, position = read_string(data, position)
+        output[address], position = read_int(data, position)
+
+    if flags & FLAG_REWARD:
+        return { 'id': id, 'output': output, 'input': dict(MINING_REWARD_INPUT) }, \
+            position
+
+    timestamp, position = read_int(data, position)
+    amount, position = read_int(data, position)
+    address, position = read_string(data, position)
+    compressed_key, position = read_bytes(data, position, COMPRESSED_KEY_SIZE)
+    r, position = read_bytes(data, position, SIGNATURE_VALUE_SIZE)
+    s, position = read_bytes(data, position, SIGNATURE_VALUE_SIZE)
+    signature = [int.from_bytes(r, 'big'), int.from_bytes(s, 'big')]
+
+    if flags & FLAG_STRING_SIGNATURE:
+        signature = [str(value) for value in signature]
+
+    return {
+        'id': id,
+        'output': output,
+        'input': {
+            'timestamp': timestamp,
+            'amount': amount,
+            'address': address,
+            'public_key': decompress_public_key(compressed_key),
+            'signature': signature
+        }
+    }, position
+
+def write_value(buffer, value):
+    """
+    Append the tagged encoding of a json value to the buffer.
+    """
+    if value is None:
+        buffer.append(TAG_NULL)
+    elif value is False:
+        buffer.append(TAG_FALSE)
+    elif value is True:
+        buffer.append(TAG_TRUE)
+    elif type(value) is int:
+        buffer.append(TAG_INT)
+        write_int(buffer, value)
+    elif type(value) is float:
+        buffer.append(TAG_FLOAT)
+        buffer.extend(FLOAT.pack(value))
+    elif isinstance(value, str):
+        if HASH_PATTERN.fullmatch(value):
+            buffer.append(TAG_HASH)
+            buffer.extend(bytes.fromhex(value))
+        else:
+            buffer.append(TAG_STRING)
+            write_string(buffer, value)
+    elif isinstance(value, (list, tuple)):
+        buffer.append(TAG_LIST)
+        write_varint(buffer, len(value))
+
+        for item in value:
+            write_value(buffer, item)
+    elif isinstance(value, dict):
+        layout = transaction_layout(value)
+
+        if layout is not None:
+            buffer.append(TAG_TRANSACTION)
+            write_transaction(buffer, value, *layout)
+            return
+
+        buffer.append(TAG_DICT)
+        write_varint(buffer, len(value))
+
+        for key, item in value.items():
+            write_string(buffer, key)
+            write_value(buffer, item)
+    else:
+        raise Exception(f'Cannot encode {type(value).__name__} values')
+
+def read_value(data, position):
+    """
+    Return the (value, position) of the tagged json value at position.
+    """
+    tag = data[position]
+    position += 1
+
+    if tag == TAG_NULL:
+        return None, position
+    if tag == TAG_FALSE:
+        return False, position
+    if tag == TAG_TRUE:
+        return True, position
+    if tag == TAG_INT:
+        return read_int(data, position)
+    if tag == TAG_FLOAT:
+        value, position = read_bytes(data, position, FLOAT.size)
+        return FLOAT.unpack(value)[0], position
+    if tag == TAG_STRING:
+        return read_string(data, position)
+    if tag == TAG_HASH:
+        value, position = read_bytes(data, position, 32)
+        return value.hex(), position
+    if tag == TAG_LIST:
+        count, position = read_varint(data, position)
+        items = []
+
+        for i in range(count):
+            item, position = read_value(data, position)
+            items.append(item)
+
+        return items, position
+    if tag == TAG_DICT:
+        count, position = read_varint(data, position)
+        items = {}
+
+        for i in range(count):
+            key, position = read_string(data, position)
+            items[key], position = read_value(data, position)
+
+        return items, position
+    if tag == TAG_TRANSACTION:
+        return read_transaction(data, position)
+
+    raise Exception(f'Unknown binary value tag: {tag}')
+
+def check_version(data):
+    if not data or data[0] != FORMAT_VERSION:
+        raise Exception('Unsupported binary format version')
+
+def encode_json(value):
+    """
+    Encode a json value into the versioned binary format.
+    """
+    buffer = bytearray([FORMAT_VERSION])
+    write_value(buffer, value)
+
+    return bytes(buffer)
+
+def decode_json(data):
+    """
+    Decode a json value from the versioned binary format.
+    """
+    check_version(data)
+    value, position = read_value(data, 1)
+
+    if position != len(data):
+        raise Exception('Unexpected trailing binary data')
+
+    return value
+
+def encode_block(block):
+    """
+    Encode the block fields in order into the versioned binary format.
+    """
+    buffer = bytearray([FORMAT_VERSION])
+
+    for field in BLOCK_FIELDS:
+        write_value(buffer, getattr(block, field))
+
+    return bytes(buffer)
+
+def decode_block(data):
+    check_version(data)
+    position = 1
+    block_json = {}
+
+    for field in BLOCK_FIELDS:
+        block_json[field], position = read_value(data, position)
+
+    if position != len(data):
+        raise Exception('Unexpected trailing binary data')
+
+    return Block.from_json(block_json)
+
+def encode_transaction(transaction):
+    """
+    Encode the json form of the transaction into the versioned binary format.
+    """
+    return encode_json(transaction.to_json())
+
+def decode_transaction(data):
+    return Transaction.from_json(decode_json(data))
+
+def main():
+    transaction = Transaction(Wallet(), 'recipient', 15)
+    block = Block.mine_block(Block.genesis(), [transaction.to_json()])
+
+    print(f'json block size: {len(block.encoded_json())}')
+    print(f'binary block size: {len(encode_block(block))}')
+    print(f'decoded block: {decode_block(encode_block(block))}')
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
+import copy
+import json
 import time
 
-from backend.util.crypto_hash import crypto_hash
-from backend.util.hex_to_binary import hex_to_binary
+from backend.util.crypto_hash import crypto_hash, BlockHasher
+from backend.util.proof_of_work import (
+    digest_meets_difficulty,
+    hash_meets_difficulty
+)
 from backend.config import MINE_RATE
 
 GENESIS_DATA = {
@@ -13,18 +18,38 @@ GENESIS_DATA = {
     'nonce': 'genesis_nonce'
 }
 
+BLOCK_FIELDS = ('timestamp', 'last_hash', 'hash', 'data', 'difficulty', 'nonce')
+
 class Block:
     """
     Block: a unit of storage.
     Store transactions in a blockchain that supports a cryptocurrency.
+
+    Blocks are immutable once created: use replace() to derive a changed copy.
+    The data attribute must not be mutated either, because the block caches
+    its json encoding and its hash. to_json() returns a copy of the data.
     """
+    __slots__ = BLOCK_FIELDS + ('_encoded_json', '_computed_hash')
+
     def __init__(self, timestamp, last_hash, hash, data, difficulty, nonce):
-        self.timestamp = timestamp
-        self.last_hash = last_hash
-        self.hash = hash
-        self.data = data
-        self.difficulty = difficulty
-        self.nonce = nonce
+        set_field = object.__setattr__
+        set_field(self, 'timestamp', timestamp)
+        set_field(self, 'last_hash', last_hash)
+        set_field(self, 'hash', hash)
+        set_field(self, 'data', data)
+        set_field(self, 'difficulty', difficulty)
+        set_field(self, 'nonce', nonce)
+        set_field(self, '_encoded_json', None)
+        set_field(self, '_computed_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Blocks are immutable. Use Block.replace instead.')
+
+    def __delattr__(self, name):
+        raise AttributeError('Blocks are immutable. Use Block.replace instead.')
+
+    def __reduce__(self):
+        return (Block, tuple(getattr(self, field) for field in BLOCK_FIELDS))
 
     def __repr__(self):
         return (
@@ -38,13 +63,92 @@ class Block:
         )
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if not isinstance(other, Block):
+            return NotImplemented
+
+        return all(
+            getattr(self, field) == getattr(other, field) for field in BLOCK_FIELDS
+        )
+
+    def replace(self, **changes):
+        """
+        Return a copy of the block with the given fields changed.
+        """
+        return Block(**{ **self.fields(), **changes })
 
     def to_json(self):
         """
-        Serialize the block into a dictionary of its attributes
+        Serialize the block into a new dictionary of its attributes.
+        The data is copied, so changing the dictionary leaves the block intact.
+        """
+        return { **self.fields(), 'data': copy.deepcopy(self.data) }
+
+    def fields(self):
+        """
+        The attributes of the block, sharing its data.
         """
-        return self.__dict__
+        return {
+            'timestamp': self.timestamp,
+            'last_hash': self.last_hash,
+            'hash': self.hash,
+            'data': self.data,
+            'difficulty': self.difficulty,
+            'nonce': self.nonce
+        }
+
+    def encoded_json(self):
+        """
+        The compact json encoding of the block, computed once.
+        """
+        if self._encoded_json is None:
+            object.__setattr__(
+                self,
+                '_encoded_json',
+                json.dumps(self.fields(), separators=(',', ':')).encode('utf-8')
+            )
+
+        return self._encoded_json
+
+    def computed_hash(self):
+        """
+        The hash of the block fields, computed once.
+        """
+        if self._computed_hash is None:
+            object.__setattr__(
+                self,
+                '_computed_hash',
+                crypto_hash(
+                    self.timestamp,
+                    self.last_hash,
+                    self.data,
+                    self.nonce,
+                    self.difficulty
+                )
+            )
+
+        return self._computed_hash
+
+    def transactions(self):
+        """
+        Return the transactions recorded in the block data.
+        Data that is not a list of transactions yields no transactions.
+        """
+        return [transaction for position, transaction in self.indexed_transactions()]
+
+    def indexed_transactions(self):
+        """
+        Return (position, transaction) pairs, where position is the index of the
+        transaction in the block data.
+        """
+        if not isinstance(self.data, list):
+            return []
+
+        return [
+            (position, transaction) for position, transaction in enumerate(self.data)
+            if isinstance(transaction, dict)
+            and isinstance(transaction.get('input'), dict)
+            and isinstance(transaction.get('output'), dict)
+        ]
 
     @staticmethod
     def mine_block(last_block, data):
@@ -54,17 +158,18 @@ class Block:
         """
         timestamp = time.time_ns()
         last_hash = last_block.hash
+        hasher = BlockHasher(last_hash, data)
         difficulty = Block.adjust_difficulty(last_block, timestamp)
         nonce = 0
-        hash = crypto_hash(timestamp, last_hash, data, difficulty, nonce)
+        digest = hasher.digest(timestamp, difficulty, nonce)
 
-        while hex_to_binary(hash)[0:difficulty] != '0' * difficulty:
+        while not digest_meets_difficulty(digest, difficulty):
             nonce += 1
             timestamp = time.time_ns()
             difficulty = Block.adjust_difficulty(last_block, timestamp)
-            hash = crypto_hash(timestamp, last_hash, data, difficulty, nonce)
+            digest = hasher.digest(timestamp, difficulty, nonce)
 
-        return Block(timestamp, last_hash, hash, data, difficulty, nonce)
+        return Block(timestamp, last_hash, digest.hex(), data, difficulty, nonce)
 
     @staticmethod
     def genesis():
@@ -107,27 +212,20 @@ class Block:
         if block.last_hash != last_block.hash:
             raise Exception('The block last_hash must be correct')
 
-        if hex_to_binary(block.hash)[0:block.difficulty] != '0' * block.difficulty:
+        if not hash_meets_difficulty(block.hash, block.difficulty):
             raise Exception('The proof of work requirement was not met')
 
         if abs(last_block.difficulty - block.difficulty) > 1:
             raise Exception('The block difficulty must only adjust by 1')
 
-        reconstructed_hash = crypto_hash(
-            block.timestamp,
-            block.last_hash,
-            block.data,
-            block.nonce,
-            block.difficulty
-        )
-
-        if block.hash != reconstructed_hash:
+        if block.hash != block.computed_hash():
             raise Exception('The block hash must be correct')
 
 def main():
     genesis_block = Block.genesis()
-    bad_block = Block.mine_block(genesis_block, 'foo')
-    bad_block.last_hash = 'evil_data'
+    bad_block = Block.mine_block(genesis_block, 'foo').replace(
+        last_hash='evil_data'
+    )
 
     try:
         Block.is_valid_block(genesis_block, bad_block)
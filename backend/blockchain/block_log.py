@@ -0,0 +1,193 @@
+import json
+import os
+import struct
+import zlib
+from array import array
+
+from backend.blockchain import binary_codec
+from backend.blockchain.block import Block
+
+LOG_FILENAME = 'blocks.log'
+INDEX_FILENAME = 'blocks.idx'
+
+# Every record is a (payload length, payload crc32) header and the payload
+RECORD_HEADER = struct.Struct('>II')
+# Every index entry is the log offset of a record
+INDEX_ENTRY = struct.Struct('>Q')
+
+def encode_block(block, binary=False):
+    if binary:
+        return binary_codec.encode_block(block)
+
+    return block.encoded_json()
+
+def decode_block(payload):
+    """
+    Decode a json or binary block record. Json records start with '{', binary
+    records with the binary format version.
+    """
+    if payload[0:1] == b'{':
+        return Block.from_json(json.loads(payload))
+
+    return binary_codec.decode_block(payload)
+
+class BlockLog:
+    """
+    Append-only, on-disk storage for the blocks of a chain.
+    Blocks are length-prefixed records in a log file. An index file holds the
+    offset of every record, so that blocks can be located and the log can be
+    truncated at a fork point. Writes are fsynced in batches. A crash can leave
+    a torn record at the tail, which recover() truncates away.
+    New records are json, or the compact binary format if binary is set. Both
+    kinds of records can be read back from the same log.
+    """
+    def __init__(self, directory, fsync_every=64, binary=False):
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, LOG_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.fsync_every = fsync_every
+        self.binary = binary
+        self.unsynced_appends = 0
+
+        for path in (self.log_path, self.index_path):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+
+        self.log_file = open(self.log_path, 'r+b')
+        self.index_file = open(self.index_path, 'r+b')
+        self.offsets = array('Q')
+        self.recover()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read_record(self, offset):
+        """
+        Return the payload of the record at the offset, or None if the record
+        is torn or corrupt.
+        """
+        self.log_file.seek(offset)
+        header = self.log_file.read(RECORD_HEADER.size)
+
+        if len(header) < RECORD_HEADER.size:
+            return None
+
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = self.log_file.read(length)
+
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+
+        return payload
+
+    def recover(self):
+        """
+        Load the index and repair the files after a crash:
+          - drop index entries whose record is missing or corrupt
+          - index complete records that were written after the last entry
+          - truncate the torn record at the tail of the log
+        """
+        self.index_file.seek(0)
+        index_bytes = self.index_file.read()
+        entry_count = len(index_bytes) // INDEX_ENTRY.size
+        offsets = array('Q', (
+            INDEX_ENTRY.unpack_from(index_bytes, i * INDEX_ENTRY.size)[0]
+            for i in range(entry_count)
+        ))
+
+        position = 0
+
+        while offsets:
+            payload = self.read_record(offsets[-1])
+
+            if payload is not None:
+                position = offsets[-1] + RECORD_HEADER.size + len(payload)
+                break
+
+            offsets.pop()
+
+        while True:
+            payload = self.read_record(position)
+
+            if payload is None:
+                break
+
+            offsets.append(position)
+            position += RECORD_HEADER.size + len(payload)
+
+        self.offsets = offsets
+        self.log_file.truncate(position)
+        self.rewrite_index()
+        self.sync()
+
+    def rewrite_index(self):
+        self.index_file.seek(0)
+        self.index_file.truncate()
+        self.index_file.write(b''.join(
+            INDEX_ENTRY.pack(offset) for offset in self.offsets
+        ))
+
+    def end_offset(self):
+        self.log_file.seek(0, os.SEEK_END)
+
+        return self.log_file.tell()
+
+    def append(self, block):
+        """
+        Append a block to the log. The write is fsynced with the next batch.
+        """
+        payload = encode_block(block, self.binary)
+        offset = self.end_offset()
+
+        self.log_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self.log_file.write(payload)
+
+        self.index_file.seek(0, os.SEEK_END)
+        self.index_file.write(INDEX_ENTRY.pack(offset))
+        self.offsets.append(offset)
+
+        self.unsynced_appends += 1
+
+        if self.unsynced_appends >= self.fsync_every:
+            self.sync()
+
+    def truncate(self, length):
+        """
+        Keep only the first `length` blocks of the log.
+        """
+        if length >= len(self.offsets):
+            return
+
+        self.log_file.truncate(self.offsets[length])
+        del self.offsets[length:]
+        self.index_file.truncate(length * INDEX_ENTRY.size)
+        self.sync()
+
+    def sync(self):
+        """
+        Flush the pending writes to disk.
+        """
+        for file in (self.log_file, self.index_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.unsynced_appends = 0
+
+    def read_block(self, index):
+        payload = self.read_record(self.offsets[index])
+
+        if payload is None:
+            raise Exception(f'The block log record {index} is corrupt')
+
+        return decode_block(payload)
+
+    def read_blocks(self):
+        """
+        Read every block of the log, in order.
+        """
+        return [self.read_block(i) for i in range(len(self.offsets))]
+
+    def close(self):
+        self.sync()
+        self.log_file.close()
+        self.index_file.close()
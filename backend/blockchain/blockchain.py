@@ -1,34 +1,389 @@
+import threading
+
+from backend.blockchain.balance_index import BalanceIndex
 from backend.blockchain.block import Block
+from backend.blockchain.chain_index import ChainIndex
+from backend.blockchain.encoded_chain import EncodedChain, MappedEncodedChain
+from backend.blockchain.mapped_chain import MappedChain
+from backend.blockchain.chain_validation import (
+    find_invalid_block,
+    find_invalid_block_parallel
+)
+from backend.blockchain.mining_engine import MiningEngine
+from backend.wallet.transaction import Transaction
 
 class Blockchain:
     """
     Blockchain: a public ledger of transactions.
     Implemented as a list of blocks - data sets of transactions
+
+    The network listener, the miner and the API threads all change the chain,
+    so changes, index syncs and the reads that look up blocks by their chain
+    index hold the chain lock.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        mining_engine=None,
+        validation_workers=1,
+        validate_transactions=False,
+        block_log=None,
+        lazy_chain=False
+    ):
         self.chain = [Block.genesis()]
+        self.block_log = block_log
+        self.lazy_chain = lazy_chain
+        self.mining_engine = mining_engine or MiningEngine()
+        self.validation_workers = validation_workers
+        self.validate_transactions = validate_transactions
+        self.balance_index = BalanceIndex()
+        self.chain_index = ChainIndex()
+        self.encoded_chain = EncodedChain()
+        self.lock = threading.RLock()
+
+        if block_log is not None:
+            self.load_block_log()
+
+    def load_block_log(self):
+        """
+        Restore the chain from the block log, or start the log with the genesis
+        block. Logged blocks were validated before they were written, so they
+        are trusted without checking their proof of work again.
+        With lazy_chain set, the chain is a MappedChain view that decodes the
+        logged blocks on access instead of holding them all in memory.
+        """
+        if len(self.block_log) == 0:
+            self.block_log.append(self.chain[0])
+            self.block_log.sync()
+
+        if self.lazy_chain:
+            chain = MappedChain(self.block_log, lock=self.lock)
+            self.encoded_chain = MappedEncodedChain(chain, self.lock)
+        else:
+            chain = self.block_log.read_blocks()
+
+        if chain[0] != Block.genesis():
+            raise Exception('The block log must start with the genesis block')
+
+        self.chain = chain
 
     def add_block(self, data):
-        self.chain.append(Block.mine_block(self.chain[-1], data))
+        block = self.mining_engine.mine(self.chain[-1], data)
+
+        if block is None:
+            raise Exception('Mining stopped before a block was found')
+
+        with self.lock:
+            # Another block may have been added while mining
+            if block.last_hash != self.chain[-1].hash:
+                raise Exception('The chain tip changed while mining')
+
+            self.store_block(block)
+
+    def append_block(self, block):
+        """
+        Validate a block that extends the tip of the chain and append it,
+        without copying the chain.
+        """
+        with self.lock:
+            try:
+                Block.is_valid_block(self.chain[-1], block)
+
+                if self.validate_transactions:
+                    Blockchain.is_valid_transaction_chain(
+                        [self.chain[-1], block],
+                        1,
+                        self.validation_workers
+                    )
+            except Exception as e:
+                raise Exception(f'Cannot append. The block is invalid: {e}')
+
+            self.store_block(block)
+
+    def store_block(self, block):
+        with self.lock:
+            # A MappedChain writes appended blocks to the block log itself
+            self.chain.append(block)
+
+            if self.block_log is not None and not self.lazy_chain:
+                self.block_log.append(block)
+
+            self.sync_indexes()
 
     def __repr__(self):
         return f'Blockchain: {self.chain}'
 
-    def replace_chain(self, chain):
+    def replace_chain(self, chain, validated=False):
         """
         Replace the local chain with the incoming one if the following applies:
           - The incoming chain is longer than the local one.
           - The incoming chain is formatted properly.
+          - The incoming transactions are valid, if validate_transactions is set.
+
+        Blocks shared with the local chain were already validated when they
+        were added locally, so only the blocks after the fork point are checked.
+        Pass validated=True if the caller already validated the blocks of the
+        incoming chain, like the streaming chain loader does.
+        Return the incoming blocks after the fork point.
         """
-        if len(chain) <= len(self.chain):
-            raise Exception('Cannot replace. The incoming chain must be longer.')
+        with self.lock:
+            if len(chain) <= len(self.chain):
+                raise Exception('Cannot replace. The incoming chain must be longer.')
 
-        try:
-            Blockchain.is_valid_chain(chain)
-        except Exception as e:
-            raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+            try:
+                fork_index = self.common_prefix_length(chain)
 
-        self.chain = chain
+                if not validated:
+                    Blockchain.is_valid_chain(
+                        chain,
+                        max(fork_index, 1),
+                        self.validation_workers
+                    )
+
+                if self.validate_transactions:
+                    Blockchain.is_valid_transaction_chain(
+                        chain,
+                        max(fork_index, 1),
+                        self.validation_workers
+                    )
+            except Exception as e:
+                raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+
+            new_blocks = chain[fork_index:]
+
+            if self.block_log is None:
+                self.rollback_indexes(fork_index)
+                self.chain = chain
+            else:
+                self.write_blocks(fork_index, new_blocks)
+
+            return new_blocks
+
+    def replace_suffix(self, fork_index, blocks):
+        """
+        Replace the local blocks from the fork index on with the incoming
+        blocks, which must continue the local block before the fork index.
+        The same rules as replace_chain apply to the resulting chain, without
+        the caller having to hold a copy of the whole chain.
+        Return the incoming blocks.
+        """
+        with self.lock:
+            if fork_index + len(blocks) <= len(self.chain):
+                raise Exception('Cannot replace. The incoming chain must be longer.')
+
+            if not 1 <= fork_index <= len(self.chain):
+                raise Exception('Cannot replace. The fork index must be in the chain.')
+
+            # The local block before the fork anchors the incoming blocks
+            chain = [self.chain[fork_index - 1]] + blocks
+
+            try:
+                Blockchain.validate_blocks(chain, 1, self.validation_workers)
+
+                if self.validate_transactions:
+                    Blockchain.is_valid_transaction_chain(
+                        chain,
+                        1,
+                        self.validation_workers
+                    )
+            except Exception as e:
+                raise Exception(f'Cannot replace. The incoming chain is invalid: {e}')
+
+            if self.block_log is None:
+                self.rollback_indexes(fork_index)
+                self.chain = self.chain[:fork_index] + blocks
+            else:
+                self.write_blocks(fork_index, blocks)
+
+            return blocks
+
+    def rollback_indexes(self, length):
+        self.balance_index.rollback(length)
+        self.chain_index.rollback(length)
+        self.encoded_chain.rollback(length)
+
+    def write_blocks(self, fork_index, blocks):
+        """
+        Replace the logged blocks from the fork index on with the blocks.
+        """
+        self.rollback_indexes(fork_index)
+
+        if self.lazy_chain:
+            self.chain.truncate(fork_index)
+
+            for block in blocks:
+                self.chain.append(block)
+        else:
+            self.chain = self.chain[:fork_index] + blocks
+            self.block_log.truncate(fork_index)
+
+            for block in blocks:
+                self.block_log.append(block)
+
+        self.block_log.sync()
+
+    def sync_indexes(self):
+        """
+        Bring the balance and chain indexes up to date with the chain.
+        """
+        with self.lock:
+            self.balance_index.sync(self.chain)
+            self.chain_index.sync(self.chain)
+
+    def sync_encoded_chain(self):
+        """
+        Bring the encoded chain up to date. It is only synced when the chain
+        json is read, not on every block added to the chain.
+        """
+        with self.lock:
+            self.encoded_chain.sync(self.chain)
+
+    def balance(self, address):
+        """
+        Look up the balance of the address as of the latest block.
+        """
+        with self.lock:
+            self.sync_indexes()
+
+            return self.balance_index.balance(address)
+
+    def known_addresses(self):
+        """
+        List the addresses that received an output in the chain.
+        """
+        with self.lock:
+            self.sync_indexes()
+
+            return self.chain_index.known_addresses()
+
+    def find_transaction(self, transaction_id):
+        """
+        Return a (block index, position, transaction json) tuple for the
+        transaction id, or None if the chain doesn't hold it.
+        """
+        with self.lock:
+            self.sync_indexes()
+            location = self.chain_index.transaction_location(transaction_id)
+
+            if location is None:
+                return None
+
+            block_index, position = location
+
+            return block_index, position, self.chain[block_index].data[position]
+
+    def address_history(self, address):
+        """
+        Return the (block index, position, transaction json) tuples of the
+        transactions the address sent or received, oldest first.
+        """
+        with self.lock:
+            self.sync_indexes()
+
+            return [
+                (block_index, position, self.chain[block_index].data[position])
+                for block_index, position in self.chain_index.history(address)
+            ]
+
+    def common_prefix_length(self, chain):
+        """
+        Count the leading blocks that the incoming chain shares with the local
+        chain. Blocks copied from the local chain match by identity, blocks
+        deserialized from a peer match by value.
+        """
+        length = 0
+
+        for local_block, block in zip(self.chain, chain):
+            if local_block is not block and local_block != block:
+                break
+
+            length += 1
+
+        return length
+
+    def tip(self):
+        """
+        Return the (length, tip hash) of the chain.
+        """
+        with self.lock:
+            return len(self.chain), self.chain[-1].hash
+
+    def block_locator(self):
+        """
+        Return the hashes of the last 10 blocks, then of blocks spaced twice as
+        far apart each step back, ending with the genesis block. A peer finds
+        the fork point of diverged chains in the first hash that it knows.
+        """
+        with self.lock:
+            indices = []
+            step = 1
+            index = len(self.chain) - 1
+
+            while index > 0:
+                indices.append(index)
+
+                if len(indices) >= 10:
+                    step *= 2
+
+                index -= step
+
+            indices.append(0)
+
+            return [self.chain[i].hash for i in indices]
+
+    def locate(self, locator):
+        """
+        Return the chain index of the first block locator hash in the chain,
+        or None if the chain holds none of them.
+        """
+        with self.lock:
+            self.sync_indexes()
+
+            for block_hash in locator:
+                height = self.chain_index.block_height(block_hash)
+
+                if height is not None:
+                    return height
+
+        return None
+
+    def blocks_after(self, height, max_size):
+        """
+        Return up to max_size blocks following the chain index height.
+        """
+        with self.lock:
+            end = min(height + 1 + max_size, len(self.chain))
+
+            return [self.chain[i] for i in range(height + 1, end)]
+
+    def range_from_tip(self, start, end, max_size=None):
+        """
+        Return the blocks at positions start to end of the chain ordered from
+        the tip, like self.chain[::-1][start:end], without copying the chain.
+        """
+        with self.lock:
+            indices = range(len(self.chain))[::-1][start:end]
+
+            if max_size is not None:
+                indices = indices[:max_size]
+
+            return [self.chain[i] for i in indices]
+
+    def page_from_tip(self, cursor=None, limit=10):
+        """
+        Return up to `limit` blocks going from the chain index `cursor` towards
+        the genesis block, starting at the tip without a cursor. Return the
+        blocks and the cursor of the next page, which is None after the genesis
+        block. Cursors are chain indexes, so they stay stable as blocks are
+        added to the tip.
+        """
+        with self.lock:
+            if cursor is None or cursor >= len(self.chain):
+                cursor = len(self.chain) - 1
+
+            indices = range(cursor, max(cursor - limit, -1), -1)
+            next_cursor = indices[-1] - 1 if indices and indices[-1] > 0 else None
+
+            return [self.chain[i] for i in indices], next_cursor
 
     def to_json(self):
         """
@@ -36,6 +391,44 @@ class Blockchain:
         """
         return list(map(lambda block: block.to_json(), self.chain))
 
+    def encoded_json(self):
+        """
+        The compact json encoding of the blockchain, joined from the cached
+        encoding of each block, or from the block log records of a lazy chain.
+        """
+        with self.lock:
+            self.sync_encoded_chain()
+
+            return self.encoded_chain.body()
+
+    def encoded_response(self):
+        """
+        The compact json encoding of the blockchain and its entity tag, taken
+        from the same state of the chain.
+        """
+        with self.lock:
+            self.sync_encoded_chain()
+
+            return self.encoded_chain.body(), self.encoded_chain.etag()
+
+    def encoded_lines(self):
+        """
+        The newline delimited json of the blockchain, one block per line.
+        """
+        with self.lock:
+            self.sync_encoded_chain()
+
+            return self.encoded_chain.lines()
+
+    def etag(self):
+        """
+        An entity tag for the current state of the chain.
+        """
+        with self.lock:
+            self.sync_encoded_chain()
+
+            return self.encoded_chain.etag()
+
     @staticmethod
     def from_json(chain_json):
         """
@@ -50,20 +443,48 @@ class Blockchain:
         return blockchain
 
     @staticmethod
-    def is_valid_chain(chain):
+    def is_valid_chain(chain, start=1, workers=1):
         """
         Validate the incoming chain.
         Enforce the following rules of the blockchain:
           - the chain must start with the genesis block
           - blocks must be formatted correctly
+
+        Blocks before the start index are trusted and not checked again.
         """
         if chain[0] != Block.genesis():
             raise Exception('The genesis block must be valid')
 
-        for i in range(1, len(chain)):
-            block = chain[i]
-            last_block = chain[i-1]
-            Block.is_valid_block(last_block, block)
+        Blockchain.validate_blocks(chain, start, workers)
+
+    @staticmethod
+    def validate_blocks(chain, start=1, workers=1):
+        """
+        Validate the blocks from the start index on against the block before
+        each, raising the error of the first invalid block.
+        Long chains are split across a process pool if workers is above 1.
+        """
+        if workers > 1:
+            invalid_block = find_invalid_block_parallel(chain, start, workers)
+        else:
+            invalid_block = find_invalid_block(chain, start)
+
+        if invalid_block is not None:
+            raise Exception(invalid_block[1])
+
+    @staticmethod
+    def is_valid_transaction_chain(chain, start=1, workers=1):
+        """
+        Validate the transactions recorded in the blocks from the start index
+        on, raising the error of the first invalid transaction.
+        """
+        transactions = [
+            Transaction.from_json(transaction)
+            for block in chain[start:]
+            for transaction in block.transactions()
+        ]
+
+        Transaction.validate_many(transactions, workers)
 
 
 def main():
@@ -0,0 +1,109 @@
+class ChainIndex:
+    """
+    Lookup tables over the transactions of a chain:
+      - the known addresses that received an output
+      - the (block index, position) location of every transaction id
+      - the locations of every transaction an address took part in
+      - the chain index of every block hash
+    Blocks are applied in order and rolled back from the tip, like the
+    BalanceIndex.
+    """
+    def __init__(self):
+        self.transaction_locations = {}
+        self.address_history = {}
+        self.known_address_counts = {}
+        self.block_heights = {}
+        self.block_hashes = []
+        self.undo_log = []
+
+    @property
+    def length(self):
+        """
+        The number of chain blocks applied to the index.
+        """
+        return len(self.undo_log)
+
+    def sync(self, chain):
+        """
+        Apply the chain blocks that the index has not seen yet.
+        """
+        for i in range(self.length, len(chain)):
+            self.apply_block(chain[i])
+
+    def apply_block(self, block):
+        block_index = self.length
+        undo = []
+        self.block_heights[block.hash] = block_index
+        self.block_hashes.append(block.hash)
+
+        for position, transaction in block.indexed_transactions():
+            location = (block_index, position)
+            transaction_id = transaction.get('id')
+            output_addresses = list(transaction['output'].keys())
+            addresses = set(output_addresses)
+            addresses.add(transaction['input']['address'])
+
+            previous_location = self.transaction_locations.get(transaction_id)
+            self.transaction_locations[transaction_id] = location
+
+            for address in addresses:
+                self.address_history.setdefault(address, []).append(location)
+
+            for address in output_addresses:
+                self.known_address_counts[address] = \
+                    self.known_address_counts.get(address, 0) + 1
+
+            undo.append(
+                (transaction_id, previous_location, addresses, output_addresses)
+            )
+
+        self.undo_log.append(undo)
+
+    def rollback(self, length):
+        """
+        Undo the applied blocks until only the first `length` blocks remain.
+        """
+        while self.length > length:
+            self.block_heights.pop(self.block_hashes.pop(), None)
+
+            for transaction_id, previous_location, addresses, output_addresses \
+                    in reversed(self.undo_log.pop()):
+                if previous_location is None:
+                    del self.transaction_locations[transaction_id]
+                else:
+                    self.transaction_locations[transaction_id] = previous_location
+
+                for address in addresses:
+                    history = self.address_history[address]
+                    history.pop()
+
+                    if not history:
+                        del self.address_history[address]
+
+                for address in output_addresses:
+                    self.known_address_counts[address] -= 1
+
+                    if not self.known_address_counts[address]:
+                        del self.known_address_counts[address]
+
+    def known_addresses(self):
+        return list(self.known_address_counts.keys())
+
+    def transaction_location(self, transaction_id):
+        """
+        Return the (block index, position) of the transaction id, or None.
+        """
+        return self.transaction_locations.get(transaction_id)
+
+    def block_height(self, block_hash):
+        """
+        Return the chain index of the block with the hash, or None.
+        """
+        return self.block_heights.get(block_hash)
+
+    def history(self, address):
+        """
+        Return the (block index, position) locations of the transactions the
+        address sent or received, oldest first.
+        """
+        return self.address_history.get(address, [])
@@ -0,0 +1,59 @@
+import multiprocessing
+
+from backend.blockchain.block import Block
+from backend.config import PARALLEL_VALIDATION_MIN_BLOCKS
+
+# Chunks handed out per worker, so that one slow chunk doesn't idle the pool.
+CHUNKS_PER_WORKER = 4
+
+def find_invalid_block(chain, start=1, end=None):
+    """
+    Validate chain[start:end] block by block against the preceding block.
+    Return an (index, message) tuple for the first invalid block, or None.
+    """
+    end = len(chain) if end is None else end
+
+    for i in range(start, end):
+        try:
+            Block.is_valid_block(chain[i-1], chain[i])
+        except Exception as e:
+            return i, str(e)
+
+    return None
+
+def _find_invalid_block_in_chunk(args):
+    offset, blocks = args
+    result = find_invalid_block(blocks)
+
+    if result is None:
+        return None
+
+    index, message = result
+    return offset + index, message
+
+def find_invalid_block_parallel(chain, start=1, workers=None):
+    """
+    Validate chain[start:] in chunks across a pool of worker processes.
+    Each chunk carries the block before it, so every pair of neighbouring
+    blocks is checked exactly once. Return the same result as
+    find_invalid_block. Short chains are validated in the current process.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    block_count = len(chain) - start
+
+    if workers <= 1 or block_count < PARALLEL_VALIDATION_MIN_BLOCKS:
+        return find_invalid_block(chain, start)
+
+    chunk_size = -(-block_count // (workers * CHUNKS_PER_WORKER))
+    chunks = [
+        (chunk_start - 1, chain[chunk_start-1:chunk_start+chunk_size])
+        for chunk_start in range(start, len(chain), chunk_size)
+    ]
+
+    with multiprocessing.Pool(workers) as pool:
+        # imap keeps the chunk order, so the first failure is the lowest index.
+        for result in pool.imap(_find_invalid_block_in_chunk, chunks):
+            if result is not None:
+                return result
+
+    return None
@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+from backend.blockchain.block import Block, BLOCK_FIELDS
+from backend.config import MINING_REWARD_INPUT
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+HEADER_FIELDS = tuple(field for field in BLOCK_FIELDS if field != 'data')
+
+def transaction_digest(transaction_json):
+    """
+    A short digest of the exact json of a transaction. Transactions keep
+    their id when they are updated, so the id alone doesn't tell whether a
+    pooled transaction is the version that the block holds.
+    """
+    return hashlib.sha256(
+        json.dumps(transaction_json, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()[0:16]
+
+def is_relayed_by_reference(item):
+    """
+    Transactions that peers likely hold in their pool are sent by reference.
+    Mining rewards only exist in the block, so they are sent in full.
+    """
+    return isinstance(item, dict) \
+        and isinstance(item.get('id'), str) \
+        and isinstance(item.get('input'), dict) \
+        and item['input'] != MINING_REWARD_INPUT
+
+def compact_block(block):
+    """
+    Serialize a block for relay: the header fields, and for every data item
+    either an { 'id', 'digest' } reference to a transaction or the
+    { 'prefilled' } item itself. Data that isn't a list is sent in full.
+    """
+    compact = { field: getattr(block, field) for field in HEADER_FIELDS }
+
+    if not isinstance(block.data, list):
+        compact['data'] = block.data
+        return compact
+
+    compact['references'] = [
+        { 'id': item['id'], 'digest': transaction_digest(item) }
+        if is_relayed_by_reference(item) else { 'prefilled': item }
+        for item in block.data
+    ]
+
+    return compact
+
+def rebuild_block(compact, find_transaction):
+    """
+    Rebuild a block from its compact form, looking up the referenced
+    transactions with find_transaction(id), like the transaction pool map's
+    get. Return the block and the ids of the transactions that couldn't be
+    found. The block is None if any are missing.
+    Raise if the rebuilt block doesn't match the hash of its header.
+    """
+    header = { field: compact[field] for field in HEADER_FIELDS }
+
+    if 'references' not in compact:
+        return Block(data=compact['data'], **header), []
+
+    data = []
+    missing_ids = []
+
+    for reference in compact['references']:
+        if 'prefilled' in reference:
+            data.append(reference['prefilled'])
+            continue
+
+        transaction = find_transaction(reference['id'])
+        transaction_json = transaction.to_json() if transaction else None
+
+        if transaction_json is None or \
+                transaction_digest(transaction_json) != reference['digest']:
+            missing_ids.append(reference['id'])
+            continue
+
+        data.append(transaction_json)
+
+    if missing_ids:
+        return None, missing_ids
+
+    block = Block(data=data, **header)
+
+    if block.computed_hash() != block.hash:
+        raise Exception('The rebuilt block does not match its hash')
+
+    return block, []
+
+def main():
+    transaction = Transaction(Wallet(), 'recipient', 15)
+    reward = Transaction.reward_transaction(Wallet())
+    block = Block.mine_block(
+        Block.genesis(),
+        [transaction.to_json(), reward.to_json()]
+    )
+    compact = compact_block(block)
+
+    print(f'full block size: {len(block.encoded_json())}')
+    print(f'compact block size: {len(json.dumps(compact))}')
+    print(f'rebuilt block: {rebuild_block(compact, { transaction.id: transaction }.get)}')
+
+if __name__ == '__main__':
+    main()
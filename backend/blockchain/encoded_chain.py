@@ -0,0 +1,122 @@
+class EncodedChain:
+    """
+    The compact json encoding of every block in a chain, kept in order so
+    that the json of the whole chain can be served by joining the fragments.
+    Blocks are applied and rolled back like the chain indexes.
+    """
+    def __init__(self):
+        self.fragments = []
+        self.tip_hash = None
+        self.cached_body = None
+
+    @property
+    def length(self):
+        return len(self.fragments)
+
+    def sync(self, chain):
+        """
+        Encode the chain blocks that have not been encoded yet.
+        """
+        if self.length == len(chain):
+            return
+
+        for i in range(self.length, len(chain)):
+            self.fragments.append(chain[i].encoded_json())
+
+        self.tip_hash = chain[-1].hash
+        self.cached_body = None
+
+    def rollback(self, length):
+        """
+        Drop the encoded blocks after the first `length` blocks.
+        """
+        if length < self.length:
+            del self.fragments[length:]
+            self.tip_hash = None
+            self.cached_body = None
+
+    def body(self):
+        """
+        The json encoding of the chain as a list of blocks.
+        """
+        if self.cached_body is None:
+            self.cached_body = b'[' + b','.join(self.fragments) + b']'
+
+        return self.cached_body
+
+    def lines(self):
+        """
+        Yield the newline delimited json of the chain, one block per line.
+        The fragments are snapshotted first, so a chain that changes while the
+        lines are consumed can't tear the output.
+        """
+        fragments = self.fragments[:]
+
+        return (fragment + b'\n' for fragment in fragments)
+
+    def etag(self):
+        """
+        An entity tag that changes whenever the chain changes.
+        """
+        return f'{self.length}-{self.tip_hash}'
+
+class MappedEncodedChain:
+    """
+    The compact json encoding of a MappedChain, read from the block log
+    records instead of holding an encoded copy of every block. Only the joined
+    json of the whole chain is cached. Records are read under the chain lock,
+    since appends move the position of the shared log file.
+    """
+    def __init__(self, chain, lock):
+        self.chain = chain
+        self.lock = lock
+        self.length = 0
+        self.tip_hash = None
+        self.cached_body = None
+        # Counts rollbacks, so that streams can stop at a fork
+        self.rollbacks = 0
+
+    def sync(self, chain):
+        if self.length == len(chain):
+            return
+
+        self.length = len(chain)
+        self.tip_hash = chain[-1].hash
+        self.cached_body = None
+
+    def rollback(self, length):
+        if length < self.length:
+            self.length = length
+            self.tip_hash = None
+            self.cached_body = None
+            self.rollbacks += 1
+
+    def body(self):
+        if self.cached_body is None:
+            with self.lock:
+                self.cached_body = b'[' + b','.join(
+                    self.chain.encoded_json(i) for i in range(self.length)
+                ) + b']'
+
+        return self.cached_body
+
+    def lines(self):
+        """
+        Yield the newline delimited json of the chain as of this call, one
+        block per line. The stream ends early if the chain is rolled back to
+        a fork point while it is consumed, so it never mixes two forks.
+        """
+        return self.read_lines(self.length, self.rollbacks)
+
+    def read_lines(self, length, rollbacks):
+        for i in range(length):
+            with self.lock:
+                if self.rollbacks != rollbacks:
+                    return
+
+                line = self.chain.encoded_json(i)
+
+            yield line + b'\n'
+
+    def etag(self):
+        return f'{self.length}-{self.tip_hash}'
@@ -0,0 +1,128 @@
+import mmap
+import threading
+
+from backend.blockchain.block_log import RECORD_HEADER, decode_block
+from backend.config import MAPPED_CHAIN_CACHE_SIZE
+from backend.util.lru_cache import LRUCache
+
+class MappedChain:
+    """
+    A list-like view of the blocks in a BlockLog.
+    The log file is memory-mapped and a Block is only decoded when it is
+    accessed. Recently accessed and appended blocks stay in a small LRU cache.
+    Supports len(), indexing, slicing and iteration like the chain list.
+
+    Reads, appends and truncation hold the lock, so that a reader never remaps
+    a log that is being truncated or slices a map that another thread closed.
+    Pass the blockchain lock to share it with the chain changes.
+    """
+    def __init__(self, block_log, cache_size=MAPPED_CHAIN_CACHE_SIZE, lock=None):
+        self.block_log = block_log
+        self.cache = LRUCache(cache_size)
+        self.mapped_file = None
+        self.lock = lock or threading.RLock()
+
+    def __len__(self):
+        return len(self.block_log)
+
+    def __getitem__(self, index):
+        with self.lock:
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+
+            if index < 0:
+                index += len(self)
+
+            if not 0 <= index < len(self):
+                raise IndexError('chain index out of range')
+
+            block = self.cache.get(index)
+
+            if block is None:
+                block = self.decode(index)
+                self.cache.put(index, block)
+
+            return block
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f'MappedChain(length: {len(self)})'
+
+    def decode(self, index):
+        return decode_block(self.record(index))
+
+    def record(self, index):
+        """
+        Return the logged payload of the block at the index.
+        """
+        with self.lock:
+            offset = self.block_log.offsets[index]
+            header_end = offset + RECORD_HEADER.size
+
+            mapped_file = self.map_through(header_end)
+            length, checksum = RECORD_HEADER.unpack_from(mapped_file, offset)
+            mapped_file = self.map_through(header_end + length)
+
+            return mapped_file[header_end:header_end+length]
+
+    def encoded_json(self, index):
+        """
+        The compact json encoding of the block at the index. Json records are
+        already encoded. Binary records are decoded without being cached, so
+        that reading the whole chain doesn't evict the hot blocks.
+        """
+        payload = self.record(index)
+
+        if payload[0:1] == b'{':
+            return payload
+
+        return decode_block(payload).encoded_json()
+
+    def map_through(self, end):
+        """
+        Return a memory map of the log that covers the bytes before end,
+        remapping the log once it has grown past the current map.
+        """
+        with self.lock:
+            if self.mapped_file is None or len(self.mapped_file) < end:
+                self.release()
+                self.block_log.log_file.flush()
+                self.mapped_file = mmap.mmap(
+                    self.block_log.log_file.fileno(),
+                    0,
+                    access=mmap.ACCESS_READ
+                )
+
+            return self.mapped_file
+
+    def release(self):
+        """
+        Unmap the log file, so that it can be truncated.
+        """
+        with self.lock:
+            if self.mapped_file is not None:
+                self.mapped_file.close()
+                self.mapped_file = None
+
+    def append(self, block):
+        """
+        Append the block to the block log. It stays cached as a hot block.
+        """
+        with self.lock:
+            self.block_log.append(block)
+            self.cache.put(len(self) - 1, block)
+
+    def truncate(self, length):
+        """
+        Keep only the first `length` blocks.
+        """
+        with self.lock:
+            self.release()
+            self.block_log.truncate(length)
+
+            for index in list(self.cache.entries.keys()):
+                if index >= length:
+                    self.cache.pop(index)
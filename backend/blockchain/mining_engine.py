@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from backend.blockchain.block import Block
+from backend.util.crypto_hash import BlockHasher
+from backend.util.proof_of_work import digest_meets_difficulty
+
+# How many nonces a worker tries between checks of the shared stop signal.
+STOP_CHECK_INTERVAL = 1000
+# Seconds between checks of the caller's stop signal while the pool mines
+POOL_STOP_CHECK_INTERVAL = 0.05
+
+def mine_nonce_range(last_block, data, start_nonce=0, nonce_step=1, stop_event=None):
+    """
+    Search the nonces start_nonce, start_nonce + nonce_step, ... for a block hash
+    that meets the leading 0's proof of work requirement.
+
+    Return a (block, attempts) tuple. The block is None if the search was
+    stopped through the stop_event before a valid hash was found.
+    """
+    last_hash = last_block.hash
+    hasher = BlockHasher(last_hash, data)
+    nonce = start_nonce
+    attempts = 0
+
+    while True:
+        if stop_event is not None and attempts % STOP_CHECK_INTERVAL == 0 \
+                and stop_event.is_set():
+            return None, attempts
+
+        timestamp = time.time_ns()
+        difficulty = Block.adjust_difficulty(last_block, timestamp)
+        digest = hasher.digest(timestamp, difficulty, nonce)
+        attempts += 1
+
+        if digest_meets_difficulty(digest, difficulty):
+            block = Block(timestamp, last_hash, digest.hex(), data, difficulty, nonce)
+            return block, attempts
+
+        nonce += nonce_step
+
+class MiningEngine:
+    """
+    Single process mining engine.
+    Searches the nonce space one nonce at a time, like Block.mine_block.
+    """
+    def __init__(self):
+        self.last_attempts = 0
+
+    def mine(self, last_block, data, stop_event=None):
+        """
+        Mine a block on top of the last_block that holds the given data.
+        Return None if the stop_event, any object with an is_set() method,
+        is set before a block is found.
+        """
+        block, self.last_attempts = mine_nonce_range(
+            last_block,
+            data,
+            stop_event=stop_event
+        )
+
+        return block
+
+    def close(self):
+        pass
+
+_worker_stop_event = None
+
+def _init_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+def _mine_worker(args):
+    last_block, data, start_nonce, nonce_step = args
+    block, attempts = mine_nonce_range(
+        last_block,
+        data,
+        start_nonce,
+        nonce_step,
+        _worker_stop_event
+    )
+
+    if block is not None:
+        _worker_stop_event.set()
+
+    return block, attempts
+
+class ProcessPoolMiningEngine(MiningEngine):
+    """
+    Multi process mining engine.
+    Splits the nonce space across a pool of worker processes. Worker i tries
+    the nonces i, i + workers, i + 2 * workers, ... and every worker stops as
+    soon as one of them finds a valid hash.
+    The workers share one stop event, so concurrent calls to mine take turns.
+    """
+    def __init__(self, workers=None):
+        super().__init__()
+        self.workers = workers or os.cpu_count() or 1
+        self.stop_event = multiprocessing.Event()
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def mine(self, last_block, data, stop_event=None):
+        with self.lock:
+            return self.mine_in_pool(last_block, data, stop_event)
+
+    def mine_in_pool(self, last_block, data, stop_event):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.stop_event,)
+            )
+
+        self.stop_event.clear()
+        tasks = [
+            (last_block, data, start_nonce, self.workers)
+            for start_nonce in range(self.workers)
+        ]
+
+        found_block = None
+        self.last_attempts = 0
+        results = self.pool.imap_unordered(_mine_worker, tasks)
+
+        for i in range(len(tasks)):
+            block, attempts = self.next_result(results, stop_event)
+            self.last_attempts += attempts
+
+            if block is not None and found_block is None:
+                found_block = block
+                self.stop_event.set()
+
+        return found_block
+
+    def next_result(self, results, stop_event):
+        """
+        Wait for the next worker result, passing the caller's stop_event on to
+        the workers once it is set.
+        """
+        while True:
+            try:
+                return results.next(timeout=POOL_STOP_CHECK_INTERVAL)
+            except multiprocessing.TimeoutError:
+                if stop_event is not None and stop_event.is_set():
+                    self.stop_event.set()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+def create_mining_engine(workers=None):
+    """
+    Create the mining engine for the given number of workers, defaulting to
+    one worker per CPU. A single worker mines in the current process.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1:
+        return MiningEngine()
+
+    return ProcessPoolMiningEngine(workers)
+
+def main():
+    genesis_block = Block.genesis()
+    engine = ProcessPoolMiningEngine(workers=2)
+    block = engine.mine(genesis_block, 'foo')
+    engine.close()
+
+    print(f'block: {block}')
+    print(f'attempts: {engine.last_attempts}')
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,56 @@ SECONDS = 1000 * MILLISECONDS
 
 MINE_RATE = 4 * SECONDS
 
+PARALLEL_VALIDATION_MIN_BLOCKS = 1000
+PARALLEL_VALIDATION_MIN_TRANSACTIONS = 200
+
 STARTING_BALANCE = 1000
 
 MINING_REWARD = 50
 MINING_REWARD_INPUT = { 'address': '*--official-mining-reward--*' }
+
+MEMPOOL_MAX_TRANSACTIONS = 5000
+MEMPOOL_MAX_BYTES = 10 * 1024 * 1024
+
+BLOCK_MAX_TRANSACTIONS = 500
+BLOCK_MAX_BYTES = 1024 * 1024
+
+PUBLIC_KEY_CACHE_SIZE = 1024
+VERIFIED_SIGNATURE_CACHE_SIZE = 10000
+
+MAPPED_CHAIN_CACHE_SIZE = 256
+
+MAX_PAGE_SIZE = 100
+
+# Seconds between polls of the root node, see RootPoller
+POLL_MIN_INTERVAL = 1
+POLL_MAX_INTERVAL = 120
+POLL_BACKOFF = 2
+# Seconds to wait for the root node to connect or send data while syncing
+SYNC_REQUEST_TIMEOUT = 10
+
+# Outbound PubSub queue, see AsyncPublisher
+PUBLISH_QUEUE_SIZE = 1000
+PUBLISH_BATCH_SIZE = 50
+# PubNub rejects messages over 32KiB
+PUBLISH_BATCH_MAX_BYTES = 24 * 1024
+PUBLISH_MAX_RETRIES = 3
+# Seconds
+PUBLISH_RETRY_DELAY = 0.1
+PUBLISH_ENQUEUE_TIMEOUT = 1
+
+# 'host:port' of a TCP broker, or the path of a Unix socket, see SocketBroker
+PUBSUB_BROKER_ADDRESS = 'localhost:5040'
+
+# Recently broadcast blocks that peers can request transactions of
+ANNOUNCED_BLOCK_CACHE_SIZE = 64
+# Compact blocks waiting for their missing transactions
+PENDING_BLOCK_CACHE_SIZE = 64
+# Seconds during which a requested transaction of a block is sent only once
+BLOCK_REQUEST_WINDOW = 2
+
+# Recently received blocks and transactions, see Listener
+SEEN_BLOCK_CACHE_SIZE = 1024
+SEEN_TRANSACTION_CACHE_SIZE = 10000
+# Seconds to wait for more gaps before synchronizing with the root node
+SYNC_DEBOUNCE_DELAY = 0.5
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from backend.config import BLOCK_MAX_BYTES, BLOCK_MAX_TRANSACTIONS
+from backend.wallet.transaction import Transaction
+
+class TipChange:
+    """
+    Stop signal for a mining engine. It is set once the tip of the chain
+    moved past the block being mined on, or once the miner is stopped.
+    """
+    def __init__(self, blockchain, tip_hash, stop_event):
+        self.blockchain = blockchain
+        self.tip_hash = tip_hash
+        self.stop_event = stop_event
+
+    def is_set(self):
+        return self.stop_event.is_set() or \
+            self.blockchain.chain[-1].hash != self.tip_hash
+
+class MinerService:
+    """
+    Mines blocks on the tip of the chain from a background thread, filled
+    with the transactions that the pool selects. A search is cancelled and
+    restarted on the new tip as soon as another block is added to the chain,
+    like a block received from a peer.
+    """
+    def __init__(self, blockchain, transaction_pool, wallet, pubsub=None):
+        self.blockchain = blockchain
+        self.transaction_pool = transaction_pool
+        self.wallet = wallet
+        self.pubsub = pubsub
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.blocks = 0
+        self.cancelled = 0
+        self.hashes = 0
+        self.mining_time = 0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop mining and wait for the current search to be cancelled.
+        """
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.mine_block()
+            except Exception as e:
+                print(f'\n -- Miner error: {e}')
+                self.stop_event.wait(1)
+
+    def mine_block(self, stop_event=None):
+        """
+        Mine one block on the current tip and add it to the chain.
+        Return the block, or None if the search was cancelled. The search
+        stops with the miner unless another stop_event is given.
+        """
+        stop_event = stop_event or self.stop_event
+        tip = self.blockchain.chain[-1]
+        # Leave room for the mining reward transaction
+        data = self.transaction_pool.select_for_block(
+            BLOCK_MAX_TRANSACTIONS - 1,
+            BLOCK_MAX_BYTES
+        )
+        data.append(Transaction.reward_transaction(self.wallet).to_json())
+
+        mining_engine = self.blockchain.mining_engine
+        start_time = time.monotonic()
+        block = mining_engine.mine(
+            tip,
+            data,
+            TipChange(self.blockchain, tip.hash, stop_event)
+        )
+        self.mining_time += time.monotonic() - start_time
+        self.hashes += mining_engine.last_attempts
+
+        if block is None:
+            self.cancelled += 1
+            return None
+
+        try:
+            # Fails if the tip changed after the block was found
+            self.blockchain.append_block(block)
+        except Exception as e:
+            print(f'\n -- Discarded the mined block: {e}')
+            self.cancelled += 1
+            return None
+
+        self.blocks += 1
+        self.transaction_pool.clear_block_transactions([block])
+
+        if self.pubsub is not None:
+            self.pubsub.broadcast_block(block)
+
+        return block
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'blocks': self.blocks,
+            'cancelled': self.cancelled,
+            'hashes': self.hashes,
+            'blocks_per_second': (
+                self.blocks / self.mining_time if self.mining_time else 0
+            ),
+            'hashes_per_second': (
+                self.hashes / self.mining_time if self.mining_time else 0
+            )
+        }
@@ -1,63 +1,329 @@
+import json
 import os
+import queue
+import threading
 import time
-import requests
-
-from pubnub.pubnub import PubNub
-from pubnub.pnconfiguration import PNConfiguration
-from pubnub.callbacks import SubscribeCallback
 
 from backend.blockchain.block import Block
-from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.compact_block import (
+    compact_block,
+    rebuild_block,
+    transaction_digest
+)
+from backend.config import (
+    ANNOUNCED_BLOCK_CACHE_SIZE,
+    BLOCK_REQUEST_WINDOW,
+    PENDING_BLOCK_CACHE_SIZE,
+    PUBLISH_BATCH_MAX_BYTES,
+    PUBLISH_BATCH_SIZE,
+    PUBLISH_ENQUEUE_TIMEOUT,
+    PUBLISH_MAX_RETRIES,
+    PUBLISH_QUEUE_SIZE,
+    PUBLISH_RETRY_DELAY,
+    SEEN_BLOCK_CACHE_SIZE,
+    SEEN_TRANSACTION_CACHE_SIZE,
+    SYNC_DEBOUNCE_DELAY
+)
+from backend.sync import delta_sync
+from backend.transport import create_transport
+from backend.util.lru_cache import LRUCache
+from backend.util.proof_of_work import hash_meets_difficulty
 from backend.wallet.transaction import Transaction
 
-pnconfig = PNConfiguration()
-pnconfig.publish_key = os.environ.get('PUBNUB_PUBLISH_KEY')
-pnconfig.subscribe_key = os.environ.get('PUBNUB_SUBSCRIBE_KEY')
-pnconfig.user_id = os.environ.get('PUBNUB_USER_ID', 'blockchain-node-default')
-
 CHANNELS = {
     'TEST': 'TEST',
     'BLOCK': 'BLOCK',
+    'COMPACT_BLOCK': 'COMPACT_BLOCK',
+    'BLOCK_REQUEST': 'BLOCK_REQUEST',
+    'BLOCK_TRANSACTIONS': 'BLOCK_TRANSACTIONS',
     'TRANSACTION': 'TRANSACTION'
 }
 
-class Listener(SubscribeCallback):
-    def __init__(self, blockchain, transaction_pool):
+def unbatch(message):
+    """
+    Return the messages of a batch envelope, or the single message.
+    """
+    if isinstance(message, dict) and list(message.keys()) == ['batch']:
+        return message['batch']
+
+    return [message]
+
+class Listener:
+    """
+    Handles the messages of the network. Incoming blocks go through cheap
+    checks before any expensive validation:
+      - blocks and transactions that were already seen are dropped
+      - the block hash must meet the proof of work of its difficulty
+      - a block on the local tip is validated alone and appended
+      - a block on an older local block can't make a longer chain: dropped
+      - a block on an unknown block means blocks are missing, so a sync
+        with the root node is scheduled. Gaps found in quick succession
+        share a single sync.
+
+    A compact block that can't be rebuilt from the pool waits while only its
+    missing transactions are requested from the node that announced it.
+    """
+    def __init__(self, blockchain, transaction_pool, pubsub=None):
         self.blockchain = blockchain
         self.transaction_pool = transaction_pool
+        # Answers and sends requests for missing transactions
+        self.pubsub = pubsub
+        self.pending_blocks = LRUCache(PENDING_BLOCK_CACHE_SIZE)
+        self.answered_transactions = LRUCache(ANNOUNCED_BLOCK_CACHE_SIZE)
+        self.seen_blocks = LRUCache(SEEN_BLOCK_CACHE_SIZE)
+        self.seen_transactions = LRUCache(SEEN_TRANSACTION_CACHE_SIZE)
+        self.sync_lock = threading.Lock()
+        self.sync_timer = None
+        self.counts = {
+            'appended_blocks': 0,
+            'duplicate_blocks': 0,
+            'invalid_blocks': 0,
+            'stale_blocks': 0,
+            'duplicate_transactions': 0,
+            'rebuilt_blocks': 0,
+            'requested_blocks': 0,
+            'answered_requests': 0,
+            'syncs': 0
+        }
 
-    def message(self, pubnub, message_object):
-        print(f'\n-- Channel: {message_object.channel} | Message: {message_object.message}')
+    def message(self, channel, message):
+        if channel == CHANNELS['BLOCK']:
+            self.receive_block(Block.from_json(message))
 
-        if message_object.channel == CHANNELS['BLOCK']:
-            block = Block.from_json(message_object.message)
-            potential_chain = self.blockchain.chain[:]
-            potential_chain.append(block)
+        elif channel == CHANNELS['COMPACT_BLOCK']:
+            self.receive_compact_block(message)
 
-            try:
-                self.blockchain.replace_chain(potential_chain)
+        elif channel == CHANNELS['BLOCK_REQUEST']:
+            self.answer_block_request(message['hash'], message['missing_ids'])
+
+        elif channel == CHANNELS['BLOCK_TRANSACTIONS']:
+            self.receive_block_transactions(message['hash'], message['transactions'])
+
+        elif channel == CHANNELS['TRANSACTION']:
+            self.receive_transactions(unbatch(message))
+
+        else:
+            print(f'\n-- Channel: {channel} | Message: {message}')
+
+    def classify_block(self, block_hash, last_hash, difficulty):
+        """
+        Return how an incoming block relates to the local chain: duplicate,
+        invalid, extends_tip, stale or gap. Only looks up hashes.
+        """
+        if block_hash in self.seen_blocks or \
+                self.blockchain.locate([block_hash]) is not None:
+            return 'duplicate'
 
-                self.transaction_pool.clear_blockchain_transactions(
-                    self.blockchain
-                )
+        try:
+            if not hash_meets_difficulty(block_hash, difficulty):
+                return 'invalid'
+        except Exception:
+            return 'invalid'
+
+        if last_hash == self.blockchain.chain[-1].hash:
+            return 'extends_tip'
+
+        if self.blockchain.locate([last_hash]) is not None:
+            return 'stale'
+
+        return 'gap'
 
-                print('\n -- Successfully replaced the local chain')
+    def receive_block(self, block):
+        kind = self.classify_block(block.hash, block.last_hash, block.difficulty)
+
+        if kind == 'extends_tip':
+            try:
+                self.blockchain.append_block(block)
             except Exception as e:
-                print(f'\n -- Did not replace chain: {e}')
+                print(f'\n -- Rejected block {block.hash}: {e}')
+                self.counts['invalid_blocks'] += 1
+                return
+
+            self.transaction_pool.clear_block_transactions([block])
+            print(f'\n -- Appended block {block.hash}')
+            kind = 'appended'
+
+        self.count_block(kind)
+
+        if kind != 'invalid':
+            self.seen_blocks.put(block.hash, True)
+
+        if kind == 'gap':
+            print(f'\n -- Block {block.hash} follows an unknown block')
+            self.schedule_sync()
+
+    def count_block(self, kind):
+        if kind != 'gap':
+            self.counts[f'{kind}_blocks'] += 1
+
+    def receive_compact_block(self, compact):
+        """
+        Rebuild a relayed block from the transactions in the pool, or request
+        the transactions that are missing from it.
+        """
+        kind = self.classify_block(
+            compact['hash'],
+            compact['last_hash'],
+            compact['difficulty']
+        )
+
+        if kind != 'extends_tip':
+            self.count_block(kind)
+
+            if kind == 'gap':
+                self.schedule_sync()
+
+            return
+
+        if compact['hash'] in self.pending_blocks:
+            return
+
+        received_transactions = {}
+        missing_ids = self.complete_block(compact, received_transactions)
+
+        if not missing_ids:
+            return
+
+        print(f'\n -- Requesting the missing transactions: {missing_ids}')
+        self.counts['requested_blocks'] += 1
+        self.pending_blocks.put(compact['hash'], (compact, received_transactions))
+
+        if self.pubsub is not None:
+            self.pubsub.publish(
+                CHANNELS['BLOCK_REQUEST'],
+                { 'hash': compact['hash'], 'missing_ids': missing_ids }
+            )
+
+    def complete_block(self, compact, received_transactions):
+        """
+        Rebuild the compact block from the received transactions and the pool
+        and receive it. Return the ids of the transactions still missing.
+        """
+        def find_transaction(transaction_id):
+            transaction_json = received_transactions.get(transaction_id)
+
+            if transaction_json is not None:
+                return Transaction.from_json(transaction_json)
+
+            return self.transaction_pool.get_transaction(transaction_id)
+
+        try:
+            block, missing_ids = rebuild_block(compact, find_transaction)
+        except Exception as e:
+            print(f'\n -- Could not rebuild the compact block: {e}')
+            self.counts['invalid_blocks'] += 1
+            self.pending_blocks.pop(compact['hash'])
+            return []
+
+        if block is None:
+            return missing_ids
+
+        self.pending_blocks.pop(compact['hash'])
+        self.counts['rebuilt_blocks'] += 1
+        self.receive_block(block)
+
+        return []
+
+    def answer_block_request(self, block_hash, missing_ids):
+        """
+        Publish the requested transactions of a block this node announced.
+        Every node receives the answer, so the peers that miss the same
+        transactions share it: a transaction already sent for the block
+        within BLOCK_REQUEST_WINDOW is not sent again.
+        """
+        if self.pubsub is None:
+            return
+
+        block = self.pubsub.announced_blocks.get(block_hash)
+
+        if block is None:
+            return
+
+        missing_ids = set(missing_ids)
+        now = time.monotonic()
+        answered = self.answered_transactions.get(block_hash) or {}
+        transactions = [
+            transaction for transaction in block.transactions()
+            if transaction.get('id') in missing_ids
+            and now - answered.get(transaction['id'], -BLOCK_REQUEST_WINDOW) >= \
+                BLOCK_REQUEST_WINDOW
+        ]
+
+        if not transactions:
+            return
+
+        for transaction in transactions:
+            answered[transaction['id']] = now
+
+        self.answered_transactions.put(block_hash, answered)
+        self.counts['answered_requests'] += 1
+        self.pubsub.publish(
+            CHANNELS['BLOCK_TRANSACTIONS'],
+            { 'hash': block_hash, 'transactions': transactions }
+        )
+
+    def receive_block_transactions(self, block_hash, transactions):
+        """
+        Complete a pending compact block with the transactions sent for it.
+        The answers to the requests of other nodes can complete it as well.
+        """
+        pending = self.pending_blocks.get(block_hash)
+
+        if pending is None:
+            return
+
+        compact, received_transactions = pending
 
-                # If we can't validate the block, try to sync the full blockchain
-                # This handles cases where we're missing previous blocks
-                self.sync_blockchain()
+        for transaction_json in transactions:
+            received_transactions[transaction_json['id']] = transaction_json
+
+        self.complete_block(compact, received_transactions)
+
+    def receive_transactions(self, transaction_jsons):
+        """
+        Set the transactions that were not seen yet in the transaction pool.
+        Updated transactions keep their id, so they are told apart by digest.
+        """
+        for transaction_json in transaction_jsons:
+            seen_key = (transaction_json['id'], transaction_digest(transaction_json))
+
+            if seen_key in self.seen_transactions:
+                self.counts['duplicate_transactions'] += 1
+                continue
+
+            self.seen_transactions.put(seen_key, True)
+            self.transaction_pool.set_transaction(
+                Transaction.from_json(transaction_json)
+            )
+
+    def schedule_sync(self):
+        """
+        Synchronize with the root node after SYNC_DEBOUNCE_DELAY, unless a
+        sync is already scheduled.
+        """
+        with self.sync_lock:
+            if self.sync_timer is not None:
+                return
+
+            self.sync_timer = threading.Timer(SYNC_DEBOUNCE_DELAY, self.run_sync)
+            self.sync_timer.daemon = True
+            self.sync_timer.start()
+
+    def run_sync(self):
+        with self.sync_lock:
+            self.sync_timer = None
+
+        self.counts['syncs'] += 1
+        self.sync_blockchain()
+
+    def stats(self):
+        return dict(self.counts)
 
-        elif message_object.channel == CHANNELS['TRANSACTION']:
-            transaction = Transaction.from_json(message_object.message)
-            self.transaction_pool.set_transaction(transaction)
-            print('\n -- Set the new transaction in the transaction pool')
-    
     def sync_blockchain(self):
         """
         Synchronize the local blockchain with the root node.
-        This is called when we receive a block we can't validate.
+        This is called when we receive a block that follows a block we don't
+        have, see schedule_sync.
         """
         try:
             # Get the root backend host (main node)
@@ -66,42 +332,218 @@ class Listener(SubscribeCallback):
 
             print(f'\n -- Attempting to sync blockchain from {root_host}:{root_port}')
 
-            # Request the full blockchain from the root node
-            response = requests.get(f'http://{root_host}:{root_port}/blockchain')
-            result_blockchain = Blockchain.from_json(response.json())
-
-            # Replace our local chain with the synchronized chain
-            self.blockchain.replace_chain(result_blockchain.chain)
+            # Fetch only the blocks that the local chain is missing
+            new_blocks = delta_sync(
+                self.blockchain,
+                f'http://{root_host}:{root_port}'
+            )
+            self.transaction_pool.clear_block_transactions(new_blocks)
 
             print(f'\n -- Successfully synchronized! Chain length: {len(self.blockchain.chain)}')
         except Exception as e:
             print(f'\n -- Could not synchronize blockchain: {e}')
 
+# Tells the AsyncPublisher worker to stop
+STOP = object()
+
+class AsyncPublisher:
+    """
+    Publish messages from a background worker thread, so that callers never
+    wait on the network round trip.
+      - messages wait in a bounded queue. When it is full, publish blocks for
+        up to enqueue_timeout and then drops the message.
+      - queued messages of the batch channel are sent together as one
+        { 'batch': [...] } envelope, see unbatch.
+      - failed sends are retried with exponential backoff.
+    """
+    def __init__(
+        self,
+        send,
+        batch_channel=CHANNELS['TRANSACTION'],
+        max_queue=PUBLISH_QUEUE_SIZE,
+        batch_size=PUBLISH_BATCH_SIZE,
+        batch_max_bytes=PUBLISH_BATCH_MAX_BYTES,
+        max_retries=PUBLISH_MAX_RETRIES,
+        retry_delay=PUBLISH_RETRY_DELAY,
+        enqueue_timeout=PUBLISH_ENQUEUE_TIMEOUT
+    ):
+        self.send = send
+        self.batch_channel = batch_channel
+        self.queue = queue.Queue(max_queue)
+        self.batch_size = batch_size
+        self.batch_max_bytes = batch_max_bytes
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.enqueue_timeout = enqueue_timeout
+
+        self.lock = threading.Lock()
+        self.published = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_latency = 0
+        self.max_latency = 0
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def publish(self, channel, message):
+        """
+        Queue the message for the channel. Return False if it was dropped
+        because the queue stayed full.
+        """
+        try:
+            self.queue.put(
+                (channel, message, time.monotonic()),
+                timeout=self.enqueue_timeout
+            )
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+            print(f'\n-- Dropped a message to {channel}: the publish queue is full')
+
+            return False
+
+        return True
+
+    def run(self):
+        pending = None
+
+        while True:
+            item = pending or self.queue.get()
+            pending = None
+
+            if item is STOP:
+                self.queue.task_done()
+                return
+
+            items, pending = self.collect_batch(item)
+            channel = item[0]
+            message = item[1] if len(items) == 1 else {
+                'batch': [message for channel, message, enqueued_at in items]
+            }
+
+            self.deliver(channel, message, items)
+
+            for i in range(len(items)):
+                self.queue.task_done()
+
+    def collect_batch(self, item):
+        """
+        Take the batch channel messages queued right behind the item.
+        Return the batch and the next queued item that didn't fit, if any.
+        """
+        items = [item]
+
+        if item[0] != self.batch_channel:
+            return items, None
+
+        size = len(json.dumps(item[1]))
+
+        while len(items) < self.batch_size:
+            try:
+                next_item = self.queue.get_nowait()
+            except queue.Empty:
+                return items, None
+
+            if next_item is STOP or next_item[0] != self.batch_channel:
+                return items, next_item
+
+            size += len(json.dumps(next_item[1]))
+
+            if size > self.batch_max_bytes:
+                return items, next_item
+
+            items.append(next_item)
+
+        return items, None
+
+    def deliver(self, channel, message, items):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.send(channel, message)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f'\n-- Error publishing to {channel}: {e}')
+
+                    with self.lock:
+                        self.failed += len(items)
+
+                    return
+
+                with self.lock:
+                    self.retries += 1
+
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+        now = time.monotonic()
+
+        with self.lock:
+            self.published += len(items)
+            self.batches += 1
+
+            for channel, message, enqueued_at in items:
+                latency = now - enqueued_at
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+
+    def flush(self):
+        """
+        Wait until every queued message was published or dropped.
+        """
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(STOP)
+        self.worker.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'published': self.published,
+                'batches': self.batches,
+                'retries': self.retries,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'average_latency_ms': (
+                    1000 * self.total_latency / self.published
+                    if self.published else 0
+                ),
+                'max_latency_ms': 1000 * self.max_latency
+            }
+
 class PubSub():
     """
     Handles the publish/subscribe layer of the application.
-    Provides communication between the nodes of the blockchain network.
+    Provides communication between the nodes of the blockchain network,
+    through PubNub or another transport, see create_transport.
     """
-    def __init__(self, blockchain, transaction_pool):
-        self.pubnub = PubNub(pnconfig)
-        self.pubnub.subscribe().channels(CHANNELS.values()).execute()
-        self.pubnub.add_listener(Listener(blockchain, transaction_pool))
+    def __init__(self, blockchain, transaction_pool, transport=None):
+        self.transport = transport or create_transport()
+        self.listener = Listener(blockchain, transaction_pool, self)
+        self.announced_blocks = LRUCache(ANNOUNCED_BLOCK_CACHE_SIZE)
+        self.transport.subscribe(list(CHANNELS.values()), self.listener.message)
+        self.publisher = AsyncPublisher(self.transport.publish)
 
     def publish(self, channel, message):
         """
-        Publish the message object to the channel.
+        Queue the message object to be published to the channel.
         """
-        try:
-            result = self.pubnub.publish().channel(channel).message(message).sync()
-            print(f'\n-- Published to {channel}: {result.status.is_error()}')
-        except Exception as e:
-            print(f'\n-- Error publishing to {channel}: {e}')
+        self.publisher.publish(channel, message)
 
     def broadcast_block(self, block):
         """
         Broadcast a block object to all nodes.
+        Peers likely hold its transactions already, so only the header and
+        transaction references are sent. Peers that can't rebuild the block
+        request the transactions they miss.
         """
-        self.publish(CHANNELS['BLOCK'], block.to_json())
+        self.announced_blocks.put(block.hash, block)
+        self.publish(CHANNELS['COMPACT_BLOCK'], compact_block(block))
 
     def broadcast_transaction(self, transaction):
         """
@@ -115,6 +557,7 @@ def main():
     time.sleep(1)
 
     pubsub.publish(CHANNELS['TEST'], { 'foo': 'bar' })
+    pubsub.publisher.flush()
 
 if __name__ == '__main__':
     main()
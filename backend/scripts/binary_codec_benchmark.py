@@ -0,0 +1,43 @@
+import json
+import timeit
+
+from backend.blockchain.binary_codec import decode_block, encode_block
+from backend.blockchain.block import Block
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+TRANSACTIONS = 100
+RUNS = 50
+
+def encode_json_block(block):
+    return json.dumps(block.to_json(), separators=(',', ':')).encode('utf-8')
+
+def decode_json_block(data):
+    return Block.from_json(json.loads(data))
+
+def main():
+    wallets = [Wallet() for i in range(10)]
+    data = [
+        Transaction(wallets[i % len(wallets)], 'recipient', 1).to_json()
+        for i in range(TRANSACTIONS)
+    ]
+    block = Block.mine_block(Block.genesis(), data)
+
+    json_data = encode_json_block(block)
+    binary_data = encode_block(block)
+
+    print(f'Block with {TRANSACTIONS} transactions')
+    print(f'json: {len(json_data)} bytes')
+    print(f'binary: {len(binary_data)} bytes ({len(binary_data) / len(json_data):.0%} of json)')
+
+    for name, function, argument in [
+        ('json encode', encode_json_block, block),
+        ('binary encode', encode_block, block),
+        ('json decode', decode_json_block, json_data),
+        ('binary decode', decode_block, binary_data)
+    ]:
+        elapsed = timeit.timeit(lambda: function(argument), number=RUNS)
+        print(f'{name}: {elapsed / RUNS * 1000:.2f}ms per block')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import tracemalloc
+
+from backend.blockchain.block import Block
+from backend.util.crypto_hash import crypto_hash
+
+BLOCKS = 100000
+
+class DictBlock:
+    """
+    The previous Block layout: attributes stored in a per-instance __dict__.
+    """
+    def __init__(self, timestamp, last_hash, hash, data, difficulty, nonce):
+        self.timestamp = timestamp
+        self.last_hash = last_hash
+        self.hash = hash
+        self.data = data
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+def build_chain(block_class, hashes):
+    data = []
+    return [
+        block_class(i, hashes[i - 1], hashes[i], data, 10, i)
+        for i in range(1, BLOCKS)
+    ]
+
+def measure(block_class, hashes):
+    tracemalloc.start()
+    chain = build_chain(block_class, hashes)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, chain
+
+def main():
+    hashes = [crypto_hash(i) for i in range(BLOCKS)]
+
+    dict_size, dict_chain = measure(DictBlock, hashes)
+    del dict_chain
+    slots_size, slots_chain = measure(Block, hashes)
+
+    print(f'{BLOCKS} block chain')
+    print(f'__dict__ blocks: {dict_size / 2**20:.1f} MiB, {dict_size / BLOCKS:.0f} bytes per block')
+    print(f'__slots__ blocks: {slots_size / 2**20:.1f} MiB, {slots_size / BLOCKS:.0f} bytes per block')
+    print(f'Saved: {(1 - slots_size / dict_size) * 100:.0f}%')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import os
+import time
+
+from backend.blockchain.block import Block
+from backend.blockchain.mining_engine import (
+    MiningEngine,
+    ProcessPoolMiningEngine
+)
+from backend.config import SECONDS
+
+DIFFICULTY = int(os.environ.get('BENCHMARK_DIFFICULTY', '14'))
+BLOCKS = int(os.environ.get('BENCHMARK_BLOCKS', '5'))
+
+def benchmark(engine):
+    """
+    Mine BLOCKS blocks at a fixed difficulty and return the hashes per second.
+    A last block with an old timestamp makes adjust_difficulty settle on
+    DIFFICULTY for every mined block.
+    """
+    last_block = Block(1, 'last_hash', 'hash', [], DIFFICULTY + 1, 0)
+    attempts = 0
+    start_time = time.time_ns()
+
+    for i in range(BLOCKS):
+        engine.mine(last_block, [i])
+        attempts += engine.last_attempts
+
+    elapsed = (time.time_ns() - start_time) / SECONDS
+
+    return attempts / elapsed
+
+def main():
+    print(f'Mining {BLOCKS} blocks at difficulty {DIFFICULTY}')
+
+    serial_rate = benchmark(MiningEngine())
+    print(f'Single process: {serial_rate:.0f} hashes/s')
+
+    workers = os.cpu_count() or 1
+    engine = ProcessPoolMiningEngine(workers)
+    try:
+        pool_rate = benchmark(engine)
+    finally:
+        engine.close()
+
+    print(f'Process pool ({workers} workers): {pool_rate:.0f} hashes/s')
+    print(f'Speedup: {pool_rate / serial_rate:.2f}x')
+
+if __name__ == '__main__':
+    main()
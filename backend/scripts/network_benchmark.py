@@ -0,0 +1,101 @@
+import os
+import statistics
+import threading
+import time
+
+from backend.blockchain.blockchain import Blockchain
+from backend.pubsub import CHANNELS, PubSub, unbatch
+from backend.transport import (
+    LocalBroker,
+    LocalTransport,
+    SocketBroker,
+    SocketTransport
+)
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+NODES = int(os.environ.get('BENCHMARK_NODES', '4'))
+TRANSACTIONS = int(os.environ.get('BENCHMARK_TRANSACTIONS', '200'))
+# local: in-memory broker, socket: every message crosses a TCP broker
+TRANSPORT = os.environ.get('BENCHMARK_TRANSPORT', 'local')
+
+class ArrivalProbe:
+    """
+    Records when each transaction reached a node.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.arrivals = {}
+
+    def __call__(self, channel, message):
+        now = time.monotonic()
+
+        with self.lock:
+            for transaction_json in unbatch(message):
+                self.arrivals.setdefault(transaction_json['id'], now)
+
+def create_transports():
+    """
+    Return a transport factory and a function that shuts the broker down.
+    """
+    if TRANSPORT == 'socket':
+        broker = SocketBroker('127.0.0.1:0')
+        broker.start()
+
+        return lambda: SocketTransport(broker.address), broker.close
+
+    broker = LocalBroker()
+
+    return lambda: LocalTransport(broker), lambda: None
+
+def main():
+    print(f'{NODES} nodes, {TRANSACTIONS} transactions over the {TRANSPORT} transport')
+
+    create_transport, close_broker = create_transports()
+    nodes = []
+
+    for i in range(NODES):
+        transport = create_transport()
+        probe = ArrivalProbe()
+        transport.subscribe([CHANNELS['TRANSACTION']], probe)
+        transaction_pool = TransactionPool()
+        pubsub = PubSub(Blockchain(), transaction_pool, transport)
+        nodes.append((pubsub, transaction_pool, probe))
+
+    # Let the socket subscriptions reach the broker
+    time.sleep(0.2)
+
+    transactions = [
+        Transaction(Wallet(), 'recipient', 1) for i in range(TRANSACTIONS)
+    ]
+    sent_at = {}
+    start_time = time.monotonic()
+
+    for transaction in transactions:
+        sent_at[transaction.id] = time.monotonic()
+        nodes[0][0].broadcast_transaction(transaction)
+
+    for pubsub, transaction_pool, probe in nodes:
+        while len(transaction_pool.transaction_map) < TRANSACTIONS:
+            time.sleep(0.001)
+
+    elapsed = time.monotonic() - start_time
+    latencies = sorted(
+        1000 * (arrival - sent_at[transaction_id])
+        for pubsub, transaction_pool, probe in nodes
+        for transaction_id, arrival in probe.arrivals.items()
+    )
+
+    print(f'Throughput: {TRANSACTIONS / elapsed:.0f} transactions/s to every node')
+    print(f'Propagation latency p50: {statistics.median(latencies):.2f}ms')
+    print(f'Propagation latency p99: {latencies[int(len(latencies) * 0.99) - 1]:.2f}ms')
+    print(f'Publisher: {nodes[0][0].publisher.stats()}')
+
+    for pubsub, transaction_pool, probe in nodes:
+        pubsub.transport.close()
+
+    close_broker()
+
+if __name__ == '__main__':
+    main()
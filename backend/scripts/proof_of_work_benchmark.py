@@ -0,0 +1,40 @@
+import timeit
+
+from backend.util.crypto_hash import crypto_hash
+from backend.util.hex_to_binary import hex_to_binary
+from backend.util.proof_of_work import (
+    digest_meets_difficulty,
+    hash_meets_difficulty
+)
+
+DIFFICULTY = 12
+RUNS = 100000
+
+hash = crypto_hash('benchmark')
+digest = bytes.fromhex(hash)
+
+def check_hex_to_binary():
+    return hex_to_binary(hash)[0:DIFFICULTY] == '0' * DIFFICULTY
+
+def check_hash():
+    return hash_meets_difficulty(hash, DIFFICULTY)
+
+def check_digest():
+    return digest_meets_difficulty(digest, DIFFICULTY)
+
+def main():
+    baseline = timeit.timeit(check_hex_to_binary, number=RUNS)
+    print(f'hex_to_binary: {baseline / RUNS * 1e9:.0f}ns per check')
+
+    for name, check in [
+        ('hash_meets_difficulty', check_hash),
+        ('digest_meets_difficulty', check_digest)
+    ]:
+        elapsed = timeit.timeit(check, number=RUNS)
+        print(
+            f'{name}: {elapsed / RUNS * 1e9:.0f}ns per check, '
+            f'{baseline / elapsed:.1f}x faster'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import json
+import os
+import time
+
+import requests
+
+from backend.blockchain.block import Block
+from backend.config import (
+    MAX_PAGE_SIZE,
+    POLL_BACKOFF,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+    SYNC_REQUEST_TIMEOUT
+)
+
+def root_url():
+    """
+    The base url of the root node that peers synchronize with.
+    """
+    root_host = os.environ.get('ROOT_HOST', 'localhost')
+    root_port = os.environ.get('ROOT_PORT', '5050')
+
+    return f'http://{root_host}:{root_port}'
+
+def load_chain_lines(local_chain, lines):
+    """
+    Build a chain from lines of block json, validating every block as soon as
+    it arrives. Leading blocks that match the local chain are replaced by the
+    local block objects and trusted, so only the new blocks are validated.
+    Raise as soon as an invalid block arrives.
+    """
+    chain = []
+
+    for line in lines:
+        if not line:
+            continue
+
+        block = Block.from_json(json.loads(line))
+        index = len(chain)
+
+        if index < len(local_chain) and \
+                (index == 0 or chain[-1] is local_chain[index - 1]) and \
+                block == local_chain[index]:
+            block = local_chain[index]
+        elif index == 0:
+            if block != Block.genesis():
+                raise Exception('The genesis block must be valid')
+        else:
+            try:
+                Block.is_valid_block(chain[-1], block)
+            except Exception as e:
+                raise Exception(f'Invalid block {index}: {e}')
+
+        chain.append(block)
+
+    return chain
+
+def stream_blockchain(blockchain, url=None):
+    """
+    Download the root node's chain as newline delimited json and replace the
+    local chain with it. Blocks are parsed and validated one at a time as
+    they stream in, instead of after the whole document arrived.
+    Return the new blocks, like Blockchain.replace_chain.
+    """
+    url = url or f'{root_url()}/blockchain/stream'
+
+    with requests.get(url, stream=True, timeout=SYNC_REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        chain = load_chain_lines(blockchain.chain, response.iter_lines())
+
+    return blockchain.replace_chain(chain, validated=True)
+
+def fetch_blocks(url, **kwargs):
+    """
+    Request a page of blocks from a sync endpoint. Return the chain index of
+    the first block and the blocks, or None if the root doesn't know the
+    requested block.
+    """
+    response = requests.request(url=url, timeout=SYNC_REQUEST_TIMEOUT, **kwargs)
+
+    if response.status_code == 404:
+        return None
+
+    response.raise_for_status()
+    page = response.json()
+
+    return page['start'], [Block.from_json(block_json) for block_json in page['blocks']]
+
+def delta_sync(blockchain, url=None, page_size=MAX_PAGE_SIZE):
+    """
+    Fetch only the blocks the local chain is missing from the root node.
+      - compare the root tip to the local tip first
+      - request the blocks after the local tip hash
+      - if the root doesn't know the local tip, the chains diverged: send a
+        block locator to find the fork point and take the blocks after it
+    Return the new blocks, like Blockchain.replace_chain.
+    """
+    url = url or root_url()
+    length, tip_hash = blockchain.tip()
+    root_tip = requests.get(
+        f'{url}/blockchain/tip',
+        timeout=SYNC_REQUEST_TIMEOUT
+    ).json()
+
+    if root_tip['hash'] == tip_hash or root_tip['length'] <= length:
+        return []
+
+    page = fetch_blocks(
+        f'{url}/blockchain/after/{tip_hash}',
+        method='GET',
+        params={ 'limit': page_size }
+    )
+
+    if page is None:
+        page = fetch_blocks(
+            f'{url}/blockchain/locate',
+            method='POST',
+            json={ 'locator': blockchain.block_locator(), 'limit': page_size }
+        )
+
+    if page is None:
+        raise Exception('The root chain shares no blocks with the local chain')
+
+    fork_index, blocks = page
+    page_blocks = blocks
+
+    while page_blocks and fork_index + len(blocks) < root_tip['length']:
+        page = fetch_blocks(
+            f'{url}/blockchain/after/{blocks[-1].hash}',
+            method='GET',
+            params={ 'limit': page_size }
+        )
+
+        if page is None:
+            raise Exception('The root chain changed during the sync')
+
+        page_blocks = page[1]
+        blocks.extend(page_blocks)
+
+    return blockchain.replace_suffix(fork_index, blocks)
+
+class RootPoller:
+    """
+    Poll the root node for new blocks with delta_sync. A poll that finds the
+    root tip unchanged skips the download. The interval adapts:
+      - right after new blocks arrive, poll again after min_interval
+      - while the root is idle, back off up to idle_interval
+      - while the root is unreachable, back off up to max_interval
+    """
+    def __init__(
+        self,
+        blockchain,
+        transaction_pool,
+        url=None,
+        idle_interval=15,
+        min_interval=POLL_MIN_INTERVAL,
+        max_interval=POLL_MAX_INTERVAL
+    ):
+        self.blockchain = blockchain
+        self.transaction_pool = transaction_pool
+        self.url = url or root_url()
+        self.idle_interval = max(idle_interval, min_interval)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, self.idle_interval)
+        self.interval = self.idle_interval
+        self.skipped_syncs = 0
+        self.syncs = 0
+        self.failed_polls = 0
+
+    def poll(self):
+        """
+        Poll the root once and return the seconds to wait for the next poll.
+        """
+        try:
+            new_blocks = delta_sync(self.blockchain, self.url)
+        except Exception as e:
+            print(f'\n -- Error polling root blockchain: {e}')
+            self.failed_polls += 1
+            self.interval = min(self.interval * POLL_BACKOFF, self.max_interval)
+
+            return self.interval
+
+        if new_blocks:
+            self.transaction_pool.clear_block_transactions(new_blocks)
+            print(f'\n -- Synchronized {len(new_blocks)} blocks from {self.url}')
+            self.syncs += 1
+            self.interval = self.min_interval
+        else:
+            self.skipped_syncs += 1
+            self.interval = min(
+                max(self.interval, self.min_interval) * POLL_BACKOFF,
+                self.idle_interval
+            )
+
+        return self.interval
+
+    def run(self):
+        while True:
+            time.sleep(self.poll())
+
+    def stats(self):
+        return {
+            'syncs': self.syncs,
+            'skipped_syncs': self.skipped_syncs,
+            'failed_polls': self.failed_polls,
+            'interval': self.interval
+        }
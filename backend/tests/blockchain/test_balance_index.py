@@ -0,0 +1,86 @@
+import random
+
+from backend.blockchain.balance_index import BalanceIndex
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.config import STARTING_BALANCE
+
+ADDRESSES = ['a', 'b', 'c', 'd']
+
+def scan_balance(chain, address):
+    balance = STARTING_BALANCE
+
+    for block in chain:
+        for transaction in block.data:
+            if transaction['input']['address'] == address:
+                balance = transaction['output'][address]
+            elif address in transaction['output']:
+                balance += transaction['output'][address]
+
+    return balance
+
+def random_transaction():
+    sender = random.choice(ADDRESSES + ['*--official-mining-reward--*'])
+    output = {
+        address: random.randint(0, 100)
+        for address in random.sample(ADDRESSES, random.randint(1, 3))
+    }
+
+    if sender in ADDRESSES:
+        output[sender] = random.randint(0, 100)
+
+    return { 'id': 'id', 'input': { 'address': sender }, 'output': output }
+
+def random_chain(length):
+    chain = [Block.genesis()]
+
+    for i in range(length):
+        data = [random_transaction() for j in range(random.randint(0, 4))]
+        chain.append(Block(i, 'last_hash', 'hash', data, 1, 0))
+
+    return chain
+
+def test_balance_index_matches_scan():
+    for i in range(50):
+        chain = random_chain(10)
+        balance_index = BalanceIndex()
+        balance_index.sync(chain)
+
+        for address in ADDRESSES + ['unknown']:
+            assert balance_index.balance(address) == scan_balance(chain, address)
+
+def test_balance_index_rollback():
+    for i in range(50):
+        chain = random_chain(10)
+        fork_index = random.randint(0, 10)
+        fork_chain = chain[:fork_index] + random_chain(10)[fork_index:]
+
+        balance_index = BalanceIndex()
+        balance_index.sync(chain)
+        balance_index.rollback(fork_index)
+        balance_index.sync(fork_chain)
+
+        for address in ADDRESSES:
+            assert balance_index.balance(address) == \
+                scan_balance(fork_chain, address)
+
+def test_balance_index_skips_non_transaction_data():
+    balance_index = BalanceIndex()
+    balance_index.sync([Block.genesis(), Block(1, 'x', 'y', 'test-data', 1, 0)])
+
+    assert balance_index.length == 2
+    assert balance_index.balances == {}
+
+def test_blockchain_balance_after_replace_chain():
+    blockchain = Blockchain()
+    blockchain.add_block([random_transaction()])
+    assert blockchain.balance('a') == scan_balance(blockchain.chain, 'a')
+
+    longer_blockchain = Blockchain()
+    for i in range(3):
+        longer_blockchain.add_block([random_transaction(), random_transaction()])
+    blockchain.replace_chain(longer_blockchain.chain)
+
+    for address in ADDRESSES:
+        assert blockchain.balance(address) == \
+            scan_balance(longer_blockchain.chain, address)
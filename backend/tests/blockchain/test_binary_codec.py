@@ -0,0 +1,125 @@
+import pytest
+
+from backend.blockchain import binary_codec
+from backend.blockchain.binary_codec import (
+    decode_block,
+    decode_json,
+    decode_transaction,
+    encode_block,
+    encode_json,
+    encode_transaction
+)
+from backend.blockchain.block import Block
+from backend.blockchain.block_log import BlockLog
+from backend.blockchain.blockchain import Blockchain
+from backend.util.crypto_hash import crypto_hash
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
+
+@pytest.fixture
+def block():
+    transactions = [
+        Transaction(Wallet(), 'recipient', 15).to_json(),
+        Transaction(Wallet(), Wallet().address, 3).to_json(),
+        Transaction.reward_transaction(Wallet()).to_json()
+    ]
+    return Block.mine_block(Block.genesis(), transactions)
+
+def test_block_round_trip(block):
+    decoded_block = decode_block(encode_block(block))
+
+    assert decoded_block == block
+    assert decoded_block.encoded_json() == block.encoded_json()
+
+def test_genesis_round_trip():
+    assert decode_block(encode_block(Block.genesis())) == Block.genesis()
+
+def test_binary_block_is_smaller(block):
+    assert len(encode_block(block)) * 2 < len(block.encoded_json())
+
+def test_transaction_round_trip():
+    transaction = Transaction(Wallet(), 'recipient', 15)
+    decoded_transaction = decode_transaction(encode_transaction(transaction))
+
+    assert decoded_transaction.to_json() == transaction.to_json()
+    Transaction.is_valid_transaction(decoded_transaction)
+
+def test_reward_transaction_round_trip():
+    transaction = Transaction.reward_transaction(Wallet())
+
+    assert decode_transaction(encode_transaction(transaction)).to_json() == \
+        transaction.to_json()
+
+def test_integer_signature_round_trip():
+    transaction_json = Transaction(Wallet(), 'recipient', 15).to_json()
+    transaction_json['input']['signature'] = [
+        int(value) for value in transaction_json['input']['signature']
+    ]
+
+    assert decode_json(encode_json(transaction_json)) == transaction_json
+
+@pytest.mark.parametrize('value', [
+    None,
+    True,
+    False,
+    0,
+    -1,
+    2 ** 300,
+    -(2 ** 70),
+    1.5,
+    '',
+    'test-data',
+    'ünïcode',
+    crypto_hash('foo'),
+    crypto_hash('foo').upper(),
+    [1, 'two', [3.0, None]],
+    { 'b': 1, 'a': { 'nested': [True] } }
+])
+def test_json_value_round_trip(value):
+    decoded_value = decode_json(encode_json(value))
+
+    assert decoded_value == value
+    assert type(decoded_value) == type(value)
+
+def test_non_standard_transactions_fall_back_to_dicts():
+    transaction_json = Transaction(Wallet(), 'recipient', 15).to_json()
+    float_amount = { **transaction_json, 'output': { 'recipient': 1.5 } }
+    bad_key = {
+        **transaction_json,
+        'input': { **transaction_json['input'], 'public_key': 'not-a-pem' }
+    }
+    padded_signature = {
+        **transaction_json,
+        'input': { **transaction_json['input'], 'signature': ['01', '2'] }
+    }
+
+    for value in [float_amount, bad_key, padded_signature]:
+        assert binary_codec.transaction_layout(value) is None
+        assert decode_json(encode_json(value)) == value
+
+def test_dict_key_order_is_kept():
+    value = { 'z': 1, 'a': 2 }
+
+    assert list(decode_json(encode_json(value)).keys()) == ['z', 'a']
+
+def test_unsupported_version():
+    with pytest.raises(Exception, match='Unsupported binary format version'):
+        decode_json(b'\x02\x00')
+
+def test_trailing_data():
+    with pytest.raises(Exception, match='trailing binary data'):
+        decode_json(encode_json(1) + b'\x00')
+
+def test_binary_block_log(tmp_path):
+    blockchain = Blockchain()
+    blockchain.add_block([Transaction(Wallet(), 'recipient', 15).to_json()])
+
+    json_log = BlockLog(tmp_path)
+    json_log.append(blockchain.chain[0])
+    json_log.close()
+
+    binary_log = BlockLog(tmp_path, binary=True)
+    binary_log.append(blockchain.chain[1])
+    binary_log.close()
+
+    assert BlockLog(tmp_path).read_blocks() == blockchain.chain
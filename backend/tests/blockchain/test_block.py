@@ -1,3 +1,5 @@
+import json
+import pickle
 import pytest
 import time
 
@@ -62,27 +64,74 @@ def test_is_valid_block(last_block, block):
 	Block.is_valid_block(last_block, block)
 
 def test_is_valid_block_bad_last_hash(last_block, block):
-	block.last_hash = 'evil_last_hash'
+	block = block.replace(last_hash='evil_last_hash')
 
 	with pytest.raises(Exception, match='last_hash must be correct'):
 		Block.is_valid_block(last_block, block)
 
 def test_is_valid_block_bad_proof_of_work(last_block, block):
-	block.hash = 'fff'
+	block = block.replace(hash='fff')
 
 	with pytest.raises(Exception, match='proof of work requirement was not met'):
 		Block.is_valid_block(last_block, block)
 
 def test_is_valid_block_jumped_difficulty(last_block, block):
 	jumped_difficulty = 10
-	block.difficulty = jumped_difficulty
-	block.hash = f'{"0" * jumped_difficulty}111abc'
+	block = block.replace(
+		difficulty=jumped_difficulty,
+		hash=f'{"0" * jumped_difficulty}111abc'
+	)
 
 	with pytest.raises(Exception, match='difficulty must only adjust by 1'):
 		Block.is_valid_block(last_block, block)
 
 def test_is_valid_block_bad_block_hash(last_block, block):
-	block.hash = '0000000000000000bbbabc'
+	block = block.replace(hash='0000000000000000bbbabc')
 
 	with pytest.raises(Exception, match='block hash must be correct'):
 		Block.is_valid_block(last_block, block)
+
+def test_block_is_immutable(block):
+	with pytest.raises(AttributeError, match='immutable'):
+		block.hash = 'evil_hash'
+
+	block_json = block.to_json()
+	block_json['hash'] = 'evil_hash'
+
+	assert block.hash != 'evil_hash'
+
+def test_block_replace(block):
+	replaced_block = block.replace(data='new_data')
+
+	assert replaced_block.data == 'new_data'
+	assert replaced_block.hash == block.hash
+	assert block.data == 'test_data'
+
+def test_block_encoded_json(block):
+	assert json.loads(block.encoded_json()) == block.to_json()
+	assert block.encoded_json() is block.encoded_json()
+
+def test_block_computed_hash(block):
+	assert block.computed_hash() == block.hash
+	assert block.replace(data='evil_data').computed_hash() != block.hash
+
+def test_block_to_json_copies_data():
+	block = Block.mine_block(Block.genesis(), [{ 'amount': 1 }])
+	encoded_json = block.encoded_json()
+	computed_hash = block.computed_hash()
+
+	block_json = block.to_json()
+	block_json['data'][0]['amount'] = 2
+	block_json['data'].append('evil_data')
+
+	assert block.data == [{ 'amount': 1 }]
+	assert block.encoded_json() == encoded_json
+	assert block.computed_hash() == computed_hash
+	Block.is_valid_block(Block.genesis(), block)
+
+def test_block_pickle(block):
+	block.encoded_json()
+	restored_block = pickle.loads(pickle.dumps(block))
+
+	assert restored_block == block
+	assert restored_block._encoded_json is None
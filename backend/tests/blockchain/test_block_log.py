@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.block_log import BlockLog, INDEX_ENTRY
+from backend.blockchain.blockchain import Blockchain
+
+@pytest.fixture
+def chain():
+    blockchain = Blockchain()
+    for i in range(3):
+        blockchain.add_block([i])
+    return blockchain.chain
+
+def reopen(block_log, directory):
+    block_log.close()
+    return BlockLog(directory)
+
+def test_block_log_append_and_read(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log = reopen(block_log, tmp_path)
+
+    assert len(block_log) == len(chain)
+    assert block_log.read_blocks() == chain
+    assert block_log.read_block(2) == chain[2]
+
+def test_block_log_truncate(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log.truncate(2)
+    block_log.append(chain[3])
+    block_log = reopen(block_log, tmp_path)
+
+    assert block_log.read_blocks() == [chain[0], chain[1], chain[3]]
+
+def test_block_log_recovers_torn_tail(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log.close()
+    log_size = os.path.getsize(block_log.log_path)
+
+    with open(block_log.log_path, 'r+b') as log_file:
+        log_file.truncate(log_size - 5)
+
+    block_log = BlockLog(tmp_path)
+
+    assert block_log.read_blocks() == chain[0:3]
+    assert os.path.getsize(block_log.log_path) < log_size - 5
+    assert os.path.getsize(block_log.index_path) == 3 * INDEX_ENTRY.size
+
+    block_log.append(chain[3])
+    block_log = reopen(block_log, tmp_path)
+
+    assert block_log.read_blocks() == chain
+
+def test_block_log_indexes_unindexed_records(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log.close()
+
+    with open(block_log.index_path, 'r+b') as index_file:
+        index_file.truncate(2 * INDEX_ENTRY.size + 3)
+
+    assert BlockLog(tmp_path).read_blocks() == chain
+
+def test_block_log_drops_corrupt_tail_record(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log.close()
+
+    with open(block_log.log_path, 'r+b') as log_file:
+        log_file.seek(-2, os.SEEK_END)
+        log_file.write(b'!!')
+
+    assert BlockLog(tmp_path).read_blocks() == chain[0:3]
+
+def test_blockchain_restores_from_block_log(tmp_path, monkeypatch):
+    blockchain = Blockchain(block_log=BlockLog(tmp_path))
+    blockchain.add_block(['one'])
+    blockchain.add_block(['two'])
+    blockchain.block_log.close()
+
+    def is_valid_block(last_block, block):
+        raise Exception('Logged blocks should not be validated again')
+
+    monkeypatch.setattr(Block, 'is_valid_block', is_valid_block)
+    restored_blockchain = Blockchain(block_log=BlockLog(tmp_path))
+
+    assert restored_blockchain.chain == blockchain.chain
+
+def test_blockchain_replace_chain_rewrites_block_log(tmp_path):
+    blockchain = Blockchain(block_log=BlockLog(tmp_path))
+    blockchain.add_block(['local'])
+
+    longer_blockchain = Blockchain()
+    longer_blockchain.add_block(['peer-one'])
+    longer_blockchain.add_block(['peer-two'])
+    blockchain.replace_chain(longer_blockchain.chain)
+    blockchain.block_log.close()
+
+    assert BlockLog(tmp_path).read_blocks() == longer_blockchain.chain
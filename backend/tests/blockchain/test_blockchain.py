@@ -1,5 +1,12 @@
+import threading
+import time
+
+import pytest
+
 from backend.blockchain.blockchain import Blockchain
-from backend.blockchain.block import GENESIS_DATA
+from backend.blockchain.block import Block, GENESIS_DATA
+from backend.wallet.transaction import Transaction
+from backend.wallet.wallet import Wallet
 
 def test_blockchain_instance():
     blockchain = Blockchain()
@@ -11,3 +18,304 @@ def test_add_block():
     blockchain.add_block(data)
 
     assert blockchain.chain[-1].data == data
+
+@pytest.fixture
+def blockchain_three_blocks():
+    blockchain = Blockchain()
+    for i in range(3):
+        blockchain.add_block(i)
+    return blockchain
+
+def test_is_valid_chain(blockchain_three_blocks):
+    Blockchain.is_valid_chain(blockchain_three_blocks.chain)
+
+def test_is_valid_chain_bad_genesis(blockchain_three_blocks):
+    chain = blockchain_three_blocks.chain
+    chain[0] = chain[0].replace(hash='evil_hash')
+
+    with pytest.raises(Exception, match='genesis block must be valid'):
+        Blockchain.is_valid_chain(blockchain_three_blocks.chain)
+
+def test_replace_chain(blockchain_three_blocks):
+    blockchain = Blockchain()
+    blockchain.replace_chain(blockchain_three_blocks.chain)
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+
+def test_replace_chain_not_longer(blockchain_three_blocks):
+    blockchain = Blockchain()
+
+    with pytest.raises(Exception, match='The incoming chain must be longer'):
+        blockchain_three_blocks.replace_chain(blockchain.chain)
+
+def test_replace_chain_bad_chain(blockchain_three_blocks):
+    blockchain = Blockchain()
+    chain = blockchain_three_blocks.chain
+    chain[1] = chain[1].replace(hash='evil_hash')
+
+    with pytest.raises(Exception, match='The incoming chain is invalid'):
+        blockchain.replace_chain(blockchain_three_blocks.chain)
+
+def test_replace_chain_bad_genesis(blockchain_three_blocks):
+    blockchain = Blockchain()
+    chain = blockchain_three_blocks.chain
+    chain[0] = chain[0].replace(hash='evil_hash')
+
+    with pytest.raises(Exception, match='genesis block must be valid'):
+        blockchain.replace_chain(blockchain_three_blocks.chain)
+
+def test_replace_chain_validates_from_fork_point(
+    blockchain_three_blocks,
+    monkeypatch
+):
+    chain = blockchain_three_blocks.chain[:]
+    chain.append(Block.mine_block(chain[-1], 'new-block'))
+    validated_blocks = []
+
+    def is_valid_block(last_block, block):
+        validated_blocks.append(block)
+
+    monkeypatch.setattr(Block, 'is_valid_block', is_valid_block)
+    blockchain_three_blocks.replace_chain(chain)
+
+    assert validated_blocks == [chain[-1]]
+    assert blockchain_three_blocks.chain == chain
+
+def test_replace_chain_validates_deserialized_suffix(
+    blockchain_three_blocks,
+    monkeypatch
+):
+    peer_blockchain = Blockchain.from_json(blockchain_three_blocks.to_json())
+    peer_blockchain.add_block('new-block')
+    validated_blocks = []
+
+    def is_valid_block(last_block, block):
+        validated_blocks.append(block)
+
+    monkeypatch.setattr(Block, 'is_valid_block', is_valid_block)
+    blockchain_three_blocks.replace_chain(peer_blockchain.chain)
+
+    assert validated_blocks == [peer_blockchain.chain[-1]]
+
+def test_replace_chain_tampered_shared_block(blockchain_three_blocks):
+    chain = Blockchain.from_json(blockchain_three_blocks.to_json()).chain
+    chain[1] = chain[1].replace(data='evil_data')
+    chain.append(Block.mine_block(chain[-1], 'new-block'))
+
+    with pytest.raises(Exception, match='block hash must be correct'):
+        blockchain_three_blocks.replace_chain(chain)
+
+def test_is_valid_transaction_chain():
+    blockchain = Blockchain()
+    blockchain.add_block([
+        Transaction(Wallet(), 'recipient', 50).to_json(),
+        Transaction.reward_transaction(Wallet()).to_json()
+    ])
+
+    Blockchain.is_valid_transaction_chain(blockchain.chain)
+
+def test_is_valid_transaction_chain_bad_transaction():
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    transaction.input['signature'] = Wallet().sign(transaction.output)
+    blockchain = Blockchain()
+    blockchain.add_block([transaction.to_json()])
+
+    with pytest.raises(Exception, match='Invalid signature'):
+        Blockchain.is_valid_transaction_chain(blockchain.chain)
+
+def test_replace_chain_validate_transactions():
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    transaction.output['recipient'] = 9001
+    peer_blockchain = Blockchain()
+    peer_blockchain.add_block([transaction.to_json()])
+
+    Blockchain().replace_chain(peer_blockchain.chain)
+
+    with pytest.raises(Exception, match='Invalid transaction output values'):
+        Blockchain(validate_transactions=True).replace_chain(peer_blockchain.chain)
+
+@pytest.fixture
+def blockchain_six_blocks(blockchain_three_blocks):
+    for i in range(3, 6):
+        blockchain_three_blocks.add_block(i)
+    return blockchain_three_blocks
+
+@pytest.mark.parametrize('start, end', [
+    (0, 3), (2, 5), (0, 100), (5, 7), (-2, 7), (3, 1), (0, -1)
+])
+def test_range_from_tip(blockchain_six_blocks, start, end):
+    assert blockchain_six_blocks.range_from_tip(start, end) == \
+        blockchain_six_blocks.chain[::-1][start:end]
+
+def test_range_from_tip_max_size(blockchain_six_blocks):
+    assert blockchain_six_blocks.range_from_tip(1, 6, 2) == \
+        blockchain_six_blocks.chain[::-1][1:3]
+
+def test_page_from_tip(blockchain_six_blocks):
+    chain = blockchain_six_blocks.chain
+    blocks, next_cursor = blockchain_six_blocks.page_from_tip(limit=3)
+
+    assert blocks == chain[::-1][0:3]
+    assert next_cursor == 3
+
+    blocks, next_cursor = blockchain_six_blocks.page_from_tip(next_cursor, 3)
+
+    assert blocks == chain[::-1][3:6]
+    assert next_cursor == 0
+
+    blocks, next_cursor = blockchain_six_blocks.page_from_tip(next_cursor, 3)
+
+    assert blocks == [chain[0]]
+    assert next_cursor is None
+
+def test_page_from_tip_cursor_is_stable(blockchain_six_blocks):
+    blocks, next_cursor = blockchain_six_blocks.page_from_tip(limit=2)
+    blockchain_six_blocks.add_block('new-block')
+    next_blocks, next_cursor = blockchain_six_blocks.page_from_tip(next_cursor, 2)
+
+    assert next_blocks == blockchain_six_blocks.chain[3:5][::-1]
+
+def test_tip(blockchain_three_blocks):
+    assert blockchain_three_blocks.tip() == (4, blockchain_three_blocks.chain[-1].hash)
+
+def test_block_locator():
+    blockchain = Blockchain()
+    blockchain.chain += [
+        Block.genesis().replace(hash=f'hash-{i}') for i in range(1, 31)
+    ]
+
+    locator = blockchain.block_locator()
+    hashes = [block.hash for block in blockchain.chain]
+    indices = [hashes.index(block_hash) for block_hash in locator]
+
+    assert indices == [30, 29, 28, 27, 26, 25, 24, 23, 22, 21, 19, 15, 7, 0]
+
+def test_block_locator_genesis_only():
+    assert Blockchain().block_locator() == [Block.genesis().hash]
+
+def test_locate(blockchain_three_blocks):
+    chain = blockchain_three_blocks.chain
+    locator = ['unknown', chain[2].hash, chain[0].hash]
+
+    assert blockchain_three_blocks.locate(locator) == 2
+    assert blockchain_three_blocks.locate(['unknown']) is None
+
+def test_blocks_after(blockchain_six_blocks):
+    chain = blockchain_six_blocks.chain
+
+    assert blockchain_six_blocks.blocks_after(2, 2) == chain[3:5]
+    assert blockchain_six_blocks.blocks_after(5, 10) == chain[6:]
+
+def test_replace_suffix(blockchain_six_blocks):
+    blockchain = Blockchain()
+    blockchain.chain = blockchain_six_blocks.chain[:3]
+    new_blocks = blockchain.replace_suffix(3, blockchain_six_blocks.chain[3:])
+
+    assert blockchain.chain == blockchain_six_blocks.chain
+    assert new_blocks == blockchain_six_blocks.chain[3:]
+
+def test_replace_suffix_fork(blockchain_three_blocks):
+    fork = Blockchain()
+    fork.chain = blockchain_three_blocks.chain[:2]
+    fork.add_block('fork-one')
+    fork.add_block('fork-two')
+    fork.add_block('fork-three')
+    blockchain_three_blocks.replace_suffix(2, fork.chain[2:])
+
+    assert blockchain_three_blocks.chain == fork.chain
+    assert blockchain_three_blocks.locate([fork.chain[-1].hash]) == 4
+
+def test_replace_suffix_not_longer(blockchain_three_blocks):
+    with pytest.raises(Exception, match='The incoming chain must be longer'):
+        blockchain_three_blocks.replace_suffix(2, blockchain_three_blocks.chain[2:])
+
+def test_replace_suffix_bad_anchor(blockchain_six_blocks):
+    blockchain = Blockchain()
+    blockchain.chain = blockchain_six_blocks.chain[:3]
+
+    with pytest.raises(Exception, match='The block last_hash must be correct'):
+        blockchain.replace_suffix(2, blockchain_six_blocks.chain[3:])
+
+def test_append_block(blockchain_three_blocks):
+    blockchain = Blockchain()
+    blockchain.chain = blockchain_three_blocks.chain[:3]
+    chain = blockchain.chain
+    blockchain.append_block(blockchain_three_blocks.chain[3])
+
+    assert blockchain.chain is chain
+    assert blockchain.chain == blockchain_three_blocks.chain
+
+def test_append_block_bad_block(blockchain_three_blocks):
+    blockchain = Blockchain()
+
+    with pytest.raises(Exception, match='Cannot append. The block is invalid'):
+        blockchain.append_block(blockchain_three_blocks.chain[2])
+
+def test_append_block_competing_blocks(monkeypatch):
+    blockchain = Blockchain()
+    parent = blockchain.chain[-1]
+    blocks = [Block.mine_block(parent, [i]) for i in range(2)]
+    is_valid_block = Block.is_valid_block
+
+    def slow_is_valid_block(last_block, block):
+        is_valid_block(last_block, block)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(Block, 'is_valid_block', staticmethod(slow_is_valid_block))
+    errors = []
+
+    def append(block):
+        try:
+            blockchain.append_block(block)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(block,)) for block in blocks]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(blockchain.chain) == 2
+    assert len(errors) == 1
+    Blockchain.is_valid_chain(blockchain.chain)
+
+def test_sync_indexes_concurrently(blockchain_three_blocks):
+    blockchain = Blockchain()
+    blockchain.chain = blockchain_three_blocks.chain
+    threads = [
+        threading.Thread(target=target)
+        for target in [blockchain.sync_indexes, blockchain.sync_encoded_chain] * 2
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert blockchain.encoded_chain.length == len(blockchain.chain)
+    assert blockchain.chain_index.length == len(blockchain.chain)
+
+@pytest.mark.parametrize('read', [
+    lambda blockchain: blockchain.find_transaction('id'),
+    lambda blockchain: blockchain.address_history('address'),
+    lambda blockchain: blockchain.blocks_after(0, 10),
+    lambda blockchain: blockchain.range_from_tip(0, 10),
+    lambda blockchain: blockchain.page_from_tip(),
+    lambda blockchain: blockchain.block_locator()
+])
+def test_chain_reads_wait_for_the_chain_lock(blockchain_three_blocks, read):
+    reader = threading.Thread(target=read, args=(blockchain_three_blocks,))
+
+    with blockchain_three_blocks.lock:
+        reader.start()
+        reader.join(0.05)
+
+        assert reader.is_alive()
+
+    reader.join()
+
+    assert not reader.is_alive()
@@ -0,0 +1,92 @@
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_index import ChainIndex
+
+def transaction(id, sender, output):
+    return { 'id': id, 'input': { 'address': sender }, 'output': output }
+
+def make_chain():
+    return [
+        Block.genesis(),
+        Block(1, 'x', 'y', [
+            transaction('tx-1', 'a', { 'a': 10, 'b': 5 }),
+            'not-a-transaction',
+            transaction('tx-2', 'c', { 'c': 1, 'd': 2 })
+        ], 1, 0),
+        Block(2, 'x', 'y', [transaction('tx-3', 'b', { 'b': 4, 'a': 1 })], 1, 0)
+    ]
+
+def test_chain_index():
+    chain_index = ChainIndex()
+    chain_index.sync(make_chain())
+
+    assert sorted(chain_index.known_addresses()) == ['a', 'b', 'c', 'd']
+    assert chain_index.transaction_location('tx-2') == (1, 2)
+    assert chain_index.transaction_location('missing') is None
+    assert chain_index.history('a') == [(1, 0), (2, 0)]
+    assert chain_index.history('d') == [(1, 2)]
+
+def test_chain_index_rollback():
+    chain_index = ChainIndex()
+    chain_index.sync(make_chain())
+    chain_index.rollback(2)
+
+    assert chain_index.length == 2
+    assert chain_index.transaction_location('tx-3') is None
+    assert chain_index.history('a') == [(1, 0)]
+
+    chain_index.rollback(1)
+
+    assert chain_index.known_addresses() == []
+    assert chain_index.history('a') == []
+    assert chain_index.transaction_locations == {}
+
+def test_chain_index_rollback_restores_duplicate_id():
+    chain = make_chain()
+    chain.append(Block(3, 'x', 'y', [transaction('tx-1', 'e', { 'e': 3 })], 1, 0))
+    chain_index = ChainIndex()
+    chain_index.sync(chain)
+
+    assert chain_index.transaction_location('tx-1') == (3, 0)
+
+    chain_index.rollback(3)
+
+    assert chain_index.transaction_location('tx-1') == (1, 0)
+    assert 'e' not in chain_index.known_addresses()
+
+def test_blockchain_find_transaction():
+    blockchain = Blockchain()
+    data = [transaction('tx-1', 'a', { 'a': 10, 'b': 5 })]
+    blockchain.add_block(data)
+
+    assert blockchain.find_transaction('tx-1') == (1, 0, data[0])
+    assert blockchain.find_transaction('missing') is None
+    assert blockchain.address_history('b') == [(1, 0, data[0])]
+
+def test_blockchain_indexes_follow_replace_chain():
+    blockchain = Blockchain()
+    blockchain.add_block([transaction('tx-1', 'a', { 'a': 10 })])
+
+    longer_blockchain = Blockchain()
+    longer_blockchain.add_block([transaction('tx-2', 'b', { 'b': 10 })])
+    longer_blockchain.add_block([transaction('tx-3', 'c', { 'c': 10 })])
+    blockchain.replace_chain(longer_blockchain.chain)
+
+    assert blockchain.find_transaction('tx-1') is None
+    assert blockchain.find_transaction('tx-3')[0:2] == (2, 0)
+    assert sorted(blockchain.known_addresses()) == ['b', 'c']
+
+def test_block_height():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+    blockchain.add_block(['two'])
+    chain_index = ChainIndex()
+    chain_index.sync(blockchain.chain)
+
+    assert chain_index.block_height(blockchain.chain[2].hash) == 2
+    assert chain_index.block_height('missing') is None
+
+    chain_index.rollback(2)
+
+    assert chain_index.block_height(blockchain.chain[2].hash) is None
+    assert chain_index.block_height(blockchain.chain[1].hash) == 1
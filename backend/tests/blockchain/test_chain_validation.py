@@ -0,0 +1,52 @@
+import pytest
+
+from backend.blockchain import chain_validation
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.chain_validation import (
+    find_invalid_block,
+    find_invalid_block_parallel
+)
+
+@pytest.fixture
+def chain():
+    blockchain = Blockchain()
+    for i in range(12):
+        blockchain.add_block(i)
+    return blockchain.chain
+
+@pytest.fixture(autouse=True)
+def parallel_short_chains(monkeypatch):
+    monkeypatch.setattr(chain_validation, 'PARALLEL_VALIDATION_MIN_BLOCKS', 2)
+
+def test_find_invalid_block_valid_chain(chain):
+    assert find_invalid_block(chain) is None
+    assert find_invalid_block_parallel(chain, workers=3) is None
+
+def test_find_invalid_block_reports_first_invalid_index(chain):
+    chain[9] = chain[9].replace(last_hash='evil_last_hash')
+    chain[5] = chain[5].replace(hash='fff')
+
+    assert find_invalid_block(chain) == \
+        (5, 'The proof of work requirement was not met')
+    assert find_invalid_block_parallel(chain, workers=3) == \
+        find_invalid_block(chain)
+
+def test_find_invalid_block_parallel_chunk_boundaries(chain):
+    for index in range(1, len(chain)):
+        tampered_chain = chain[:]
+        tampered_chain[index] = chain[index].replace(data='evil_data')
+
+        assert find_invalid_block_parallel(tampered_chain, workers=2) == \
+            (index, 'The block hash must be correct')
+
+def test_find_invalid_block_parallel_from_start(chain):
+    chain[2] = chain[2].replace(data='evil_data')
+
+    assert find_invalid_block_parallel(chain, start=3, workers=2) is None
+
+def test_is_valid_chain_parallel(chain):
+    Blockchain.is_valid_chain(chain, workers=2)
+    chain[4] = chain[4].replace(data='evil_data')
+
+    with pytest.raises(Exception, match='The block hash must be correct'):
+        Blockchain.is_valid_chain(chain, workers=2)
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.compact_block import (
+    compact_block,
+    rebuild_block,
+    transaction_digest
+)
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+@pytest.fixture
+def transaction_pool():
+    transaction_pool = TransactionPool()
+
+    for i in range(3):
+        transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', i + 1))
+
+    return transaction_pool
+
+@pytest.fixture
+def block(transaction_pool):
+    data = transaction_pool.transaction_data()
+    data.append(Transaction.reward_transaction(Wallet()).to_json())
+
+    return Block.mine_block(Block.genesis(), data)
+
+def relay(compact):
+    return json.loads(json.dumps(compact))
+
+def test_compact_block_references_pool_transactions(block):
+    compact = compact_block(block)
+
+    assert [reference['id'] for reference in compact['references'][0:3]] == \
+        [transaction['id'] for transaction in block.data[0:3]]
+    assert compact['references'][3] == { 'prefilled': block.data[3] }
+    assert len(json.dumps(compact)) < len(block.encoded_json())
+
+def test_rebuild_block(block, transaction_pool):
+    rebuilt_block, missing_ids = rebuild_block(
+        relay(compact_block(block)),
+        transaction_pool.transaction_map.get
+    )
+
+    assert missing_ids == []
+    assert rebuilt_block == block
+
+def test_rebuild_block_missing_transaction(block, transaction_pool):
+    missing_id = block.data[1]['id']
+    transaction_pool.remove_transaction(missing_id)
+    rebuilt_block, missing_ids = rebuild_block(
+        relay(compact_block(block)),
+        transaction_pool.transaction_map.get
+    )
+
+    assert rebuilt_block is None
+    assert missing_ids == [missing_id]
+
+def test_rebuild_block_outdated_transaction(block, transaction_pool):
+    transaction = transaction_pool.transaction_map[block.data[0]['id']]
+    sender_wallet = Wallet()
+    transaction.output = { 'recipient': 1, sender_wallet.address: 999 }
+
+    assert transaction_digest(transaction.to_json()) != \
+        compact_block(block)['references'][0]['digest']
+
+    rebuilt_block, missing_ids = rebuild_block(
+        relay(compact_block(block)),
+        transaction_pool.transaction_map.get
+    )
+
+    assert missing_ids == [transaction.id]
+
+def test_rebuild_block_bad_hash(block, transaction_pool):
+    compact = relay(compact_block(block))
+    compact['nonce'] += 1
+
+    with pytest.raises(Exception, match='does not match its hash'):
+        rebuild_block(compact, transaction_pool.transaction_map.get)
+
+def test_compact_block_non_list_data():
+    block = Block.mine_block(Block.genesis(), 'foo')
+    rebuilt_block, missing_ids = rebuild_block(relay(compact_block(block)), {}.get)
+
+    assert rebuilt_block == block
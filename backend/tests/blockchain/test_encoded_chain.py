@@ -0,0 +1,79 @@
+import json
+
+from backend.blockchain.blockchain import Blockchain
+
+def test_encoded_json_matches_to_json():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+    blockchain.add_block([{ 'two': 2 }])
+
+    assert blockchain.encoded_json() == \
+        json.dumps(blockchain.to_json(), separators=(',', ':')).encode('utf-8')
+
+def test_encoded_json_is_cached():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+
+    assert blockchain.encoded_json() is blockchain.encoded_json()
+
+def test_encoded_json_follows_add_block():
+    blockchain = Blockchain()
+    etag = blockchain.etag()
+    blockchain.add_block(['one'])
+
+    assert blockchain.etag() != etag
+    assert json.loads(blockchain.encoded_json()) == blockchain.to_json()
+
+def test_encoded_json_follows_replace_chain():
+    blockchain = Blockchain()
+    blockchain.add_block(['local'])
+    blockchain.encoded_json()
+    etag = blockchain.etag()
+
+    longer_blockchain = Blockchain()
+    longer_blockchain.add_block(['peer-one'])
+    longer_blockchain.add_block(['peer-two'])
+    blockchain.replace_chain(longer_blockchain.chain)
+
+    assert blockchain.encoded_json() == longer_blockchain.encoded_json()
+    assert blockchain.etag() == longer_blockchain.etag()
+    assert blockchain.etag() != etag
+
+def test_encoded_lines_hold_one_block_per_line():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+    lines = list(blockchain.encoded_lines())
+
+    assert [json.loads(line) for line in lines] == blockchain.to_json()
+    assert all(line.endswith(b'\n') for line in lines)
+
+def test_encoded_lines_ignore_blocks_added_while_streaming():
+    blockchain = Blockchain()
+    lines = blockchain.encoded_lines()
+    blockchain.add_block(['one'])
+
+    assert len(list(lines)) == 1
+
+def test_encoded_chain_is_not_synced_on_add_block():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+
+    assert blockchain.encoded_chain.length == 0
+
+    blockchain.encoded_json()
+
+    assert blockchain.encoded_chain.length == len(blockchain.chain)
+
+def test_encoded_response_pairs_the_body_with_its_etag():
+    blockchain = Blockchain()
+    blockchain.add_block(['one'])
+    body, etag = blockchain.encoded_response()
+
+    assert body == blockchain.encoded_json()
+    assert etag == blockchain.etag()
+
+    blockchain.add_block(['two'])
+    body, etag = blockchain.encoded_response()
+
+    assert json.loads(body) == blockchain.to_json()
+    assert etag == f'{len(blockchain.chain)}-{blockchain.chain[-1].hash}'
@@ -0,0 +1,153 @@
+import threading
+
+import pytest
+
+from backend.blockchain.block_log import BlockLog
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.encoded_chain import MappedEncodedChain
+from backend.blockchain.mapped_chain import MappedChain
+
+@pytest.fixture
+def chain():
+    blockchain = Blockchain()
+    for i in range(5):
+        blockchain.add_block([i])
+    return blockchain.chain
+
+@pytest.fixture
+def mapped_chain(tmp_path, chain):
+    block_log = BlockLog(tmp_path)
+
+    for block in chain:
+        block_log.append(block)
+
+    block_log.close()
+    mapped_chain = MappedChain(BlockLog(tmp_path), cache_size=2)
+    yield mapped_chain
+    mapped_chain.release()
+
+def test_mapped_chain_len_and_indexing(mapped_chain, chain):
+    assert len(mapped_chain) == len(chain)
+    assert mapped_chain[0] == chain[0]
+    assert mapped_chain[3] == chain[3]
+    assert mapped_chain[-1] == chain[-1]
+
+    with pytest.raises(IndexError):
+        mapped_chain[len(chain)]
+
+def test_mapped_chain_slicing_and_iteration(mapped_chain, chain):
+    assert mapped_chain[:] == chain
+    assert mapped_chain[1:4] == chain[1:4]
+    assert mapped_chain[::-1] == chain[::-1]
+    assert list(mapped_chain) == chain
+    assert len(mapped_chain.cache) == 2
+
+def test_mapped_chain_decodes_lazily(mapped_chain, chain):
+    mapped_chain[2]
+    mapped_chain[2]
+
+    assert mapped_chain.cache.stats()['misses'] == 1
+    assert mapped_chain.cache.stats()['hits'] == 1
+
+def test_mapped_chain_append_and_truncate(mapped_chain, chain):
+    mapped_chain.truncate(3)
+
+    assert mapped_chain[:] == chain[0:3]
+
+    mapped_chain.append(chain[4])
+    mapped_chain.cache.clear()
+
+    assert mapped_chain[:] == chain[0:3] + [chain[4]]
+
+def test_mapped_chain_reads_while_truncating(mapped_chain, chain):
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                assert mapped_chain[-1] in chain
+
+                with mapped_chain.lock:
+                    mapped_chain.encoded_json(len(mapped_chain) - 1)
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for i in range(2)]
+
+    for reader in readers:
+        reader.start()
+
+    for i in range(50):
+        mapped_chain.truncate(2)
+
+        for block in chain[2:]:
+            mapped_chain.append(block)
+
+    done.set()
+
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert mapped_chain[:] == chain
+
+def test_lazy_blockchain(tmp_path):
+    blockchain = Blockchain(block_log=BlockLog(tmp_path), lazy_chain=True)
+    blockchain.add_block(['one'])
+    blockchain.add_block(['two'])
+
+    assert isinstance(blockchain.chain, MappedChain)
+    Blockchain.is_valid_chain(blockchain.chain)
+
+    longer_blockchain = Blockchain()
+    for data in [['one'], ['peer-two'], ['peer-three']]:
+        longer_blockchain.add_block(data)
+
+    blockchain.replace_chain(longer_blockchain.chain)
+    blockchain.chain.cache.clear()
+
+    assert blockchain.to_json() == longer_blockchain.to_json()
+
+    blockchain.chain.release()
+    blockchain.block_log.close()
+    restored_blockchain = Blockchain(block_log=BlockLog(tmp_path), lazy_chain=True)
+
+    assert restored_blockchain.chain[:] == longer_blockchain.chain
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_lazy_blockchain_encoded_json(tmp_path, binary):
+    blockchain = Blockchain(
+        block_log=BlockLog(tmp_path, binary=binary),
+        lazy_chain=True
+    )
+    blockchain.add_block(['one'])
+    blockchain.add_block([{ 'two': 2 }])
+    expected_lines = [block.encoded_json() + b'\n' for block in blockchain.chain]
+
+    assert blockchain.encoded_json() == \
+        b'[' + b','.join(line[:-1] for line in expected_lines) + b']'
+    assert list(blockchain.encoded_lines()) == expected_lines
+    assert blockchain.encoded_chain.cached_body is not None
+    assert isinstance(blockchain.encoded_chain, MappedEncodedChain)
+
+    blockchain.chain.release()
+
+def test_lazy_blockchain_encoded_lines_stop_at_a_fork(tmp_path):
+    blockchain = Blockchain(block_log=BlockLog(tmp_path), lazy_chain=True)
+    blockchain.add_block(['one'])
+    blockchain.add_block(['two'])
+    lines = blockchain.encoded_lines()
+    first_line = next(lines)
+
+    longer_blockchain = Blockchain()
+    for data in [['peer-one'], ['peer-two'], ['peer-three']]:
+        longer_blockchain.add_block(data)
+
+    blockchain.replace_chain(longer_blockchain.chain)
+
+    assert first_line == blockchain.chain[0].encoded_json() + b'\n'
+    assert list(lines) == []
+    assert blockchain.etag() == longer_blockchain.etag()
+
+    blockchain.chain.release()
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.blockchain.mining_engine import (
+    MiningEngine,
+    ProcessPoolMiningEngine,
+    create_mining_engine,
+    mine_nonce_range
+)
+
+@pytest.fixture
+def process_pool_engine():
+    engine = ProcessPoolMiningEngine(workers=2)
+    yield engine
+    engine.close()
+
+def test_mine_nonce_range_uses_the_nonce_stride():
+    block, attempts = mine_nonce_range(Block.genesis(), 'foo', 3, 4)
+
+    assert block.nonce % 4 == 3
+    assert attempts == (block.nonce - 3) // 4 + 1
+
+def test_mining_engine():
+    engine = MiningEngine()
+    last_block = Block.genesis()
+    block = engine.mine(last_block, 'test-data')
+
+    Block.is_valid_block(last_block, block)
+    assert engine.last_attempts == block.nonce + 1
+
+def test_process_pool_mining_engine(process_pool_engine):
+    last_block = Block.genesis()
+    block = process_pool_engine.mine(last_block, 'test-data')
+
+    assert isinstance(block, Block)
+    assert block.data == 'test-data'
+    assert process_pool_engine.last_attempts >= 1
+    Block.is_valid_block(last_block, block)
+
+def test_process_pool_mining_engine_blockchain(process_pool_engine):
+    blockchain = Blockchain(process_pool_engine)
+
+    for i in range(3):
+        blockchain.add_block([i])
+
+    Blockchain.is_valid_chain(blockchain.chain)
+
+def test_create_mining_engine():
+    assert type(create_mining_engine(1)) == MiningEngine
+
+    engine = create_mining_engine(2)
+    assert isinstance(engine, ProcessPoolMiningEngine)
+    assert engine.workers == 2
+
+# An old timestamp keeps the difficulty at 39, which is never met in a test
+UNMINEABLE_LAST_BLOCK = Block(1, 'last_hash', 'hash', [], 40, 0)
+
+def test_mining_engine_stop_event():
+    stop_event = threading.Event()
+    stop_event.set()
+
+    assert MiningEngine().mine(UNMINEABLE_LAST_BLOCK, 'foo', stop_event) is None
+
+def test_process_pool_mining_engine_stop_event(process_pool_engine):
+    stop_event = threading.Event()
+    threading.Timer(0.2, stop_event.set).start()
+    block = process_pool_engine.mine(UNMINEABLE_LAST_BLOCK, 'foo', stop_event)
+
+    assert block is None
+    assert process_pool_engine.last_attempts > 0
+
+def test_process_pool_mining_engine_concurrent_calls(process_pool_engine):
+    last_block = Block.genesis()
+    blocks = [None, None]
+
+    def mine(i):
+        blocks[i] = process_pool_engine.mine(last_block, [i])
+
+    threads = [threading.Thread(target=mine, args=(i,)) for i in range(2)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    for i, block in enumerate(blocks):
+        assert block.data == [i]
+        Block.is_valid_block(last_block, block)
+
+class StoppedMiningEngine:
+    last_attempts = 0
+
+    def mine(self, last_block, data, stop_event=None):
+        return None
+
+def test_add_block_stopped_mining():
+    blockchain = Blockchain(StoppedMiningEngine())
+
+    with pytest.raises(Exception, match='Mining stopped'):
+        blockchain.add_block(['foo'])
+
+    assert blockchain.chain == [Block.genesis()]
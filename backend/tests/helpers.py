@@ -0,0 +1,14 @@
+import time
+
+def wait_for(condition, timeout=5):
+    """
+    Wait until the condition holds, for the messages and blocks that other
+    threads deliver. Raise once the timeout in seconds is over.
+    """
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            raise Exception('Timed out waiting for the condition')
+
+        time.sleep(0.001)
@@ -0,0 +1,87 @@
+import threading
+
+from backend.blockchain.block import Block
+from backend.blockchain.blockchain import Blockchain
+from backend.miner import MinerService, TipChange
+from backend.tests.helpers import wait_for
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+def test_tip_change():
+    blockchain = Blockchain()
+    stop_event = threading.Event()
+    tip_change = TipChange(blockchain, blockchain.chain[-1].hash, stop_event)
+
+    assert not tip_change.is_set()
+
+    blockchain.add_block(['one'])
+
+    assert tip_change.is_set()
+
+def test_tip_change_stopped():
+    blockchain = Blockchain()
+    stop_event = threading.Event()
+    stop_event.set()
+
+    assert TipChange(blockchain, blockchain.chain[-1].hash, stop_event).is_set()
+
+def test_mine_block():
+    blockchain = Blockchain(validate_transactions=True)
+    transaction_pool = TransactionPool()
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    transaction_pool.set_transaction(transaction)
+    miner = MinerService(blockchain, transaction_pool, Wallet(blockchain))
+    block = miner.mine_block()
+
+    assert blockchain.chain[-1] is block
+    assert block.data[0] == transaction.to_json()
+    assert block.data[1]['input'] == Transaction.reward_transaction(Wallet()).input
+    assert transaction_pool.transaction_map == {}
+    assert miner.stats()['blocks'] == 1
+    assert miner.stats()['hashes'] >= 1
+
+class SlowMiningEngine:
+    """
+    Mines like the default engine after another block was added to the tip.
+    """
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.last_attempts = 0
+
+    def mine(self, last_block, data, stop_event=None):
+        self.blockchain.chain.append(Block.mine_block(last_block, ['peer']))
+
+        return None if stop_event.is_set() else Block.mine_block(last_block, data)
+
+def test_mine_block_cancelled_by_a_new_tip():
+    blockchain = Blockchain()
+    blockchain.mining_engine = SlowMiningEngine(blockchain)
+    miner = MinerService(blockchain, TransactionPool(), Wallet())
+
+    assert miner.mine_block() is None
+    assert len(blockchain.chain) == 2
+    assert miner.stats()['cancelled'] == 1
+
+def test_miner_start_stop():
+    blockchain = Blockchain()
+    miner = MinerService(blockchain, TransactionPool(), Wallet())
+    miner.start()
+    wait_for(lambda: len(blockchain.chain) >= 3)
+    miner.stop()
+
+    stats = miner.stats()
+    assert not stats['running']
+    assert stats['blocks'] == len(blockchain.chain) - 1
+    assert stats['blocks_per_second'] > 0
+    assert stats['hashes_per_second'] > 0
+    Blockchain.is_valid_chain(blockchain.chain)
+
+def test_mine_block_while_stopped():
+    blockchain = Blockchain()
+    miner = MinerService(blockchain, TransactionPool(), Wallet())
+    miner.start()
+    miner.stop()
+
+    assert miner.mine_block() is None
+    assert miner.mine_block(threading.Event()) is blockchain.chain[-1]
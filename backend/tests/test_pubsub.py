@@ -0,0 +1,294 @@
+import threading
+import time
+
+import pytest
+
+from backend import pubsub
+from backend.pubsub import CHANNELS, AsyncPublisher, Listener, PubSub, unbatch
+from backend.tests.helpers import wait_for
+from backend.transport import LocalBroker, LocalTransport
+from backend.blockchain.blockchain import Blockchain
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+class GatedSend:
+    """
+    Records sent messages. Sends wait until the gate opens, so that messages
+    pile up in the publisher queue.
+    """
+    def __init__(self, failures=0):
+        self.sent = []
+        self.gate = threading.Event()
+        self.failures = failures
+
+    def __call__(self, channel, message):
+        self.gate.wait()
+
+        if self.failures:
+            self.failures -= 1
+            raise Exception('Broker unavailable')
+
+        self.sent.append((channel, message))
+
+def test_unbatch():
+    assert unbatch({ 'batch': [1, 2] }) == [1, 2]
+    assert unbatch({ 'id': 'tx' }) == [{ 'id': 'tx' }]
+
+def test_async_publisher_publishes():
+    send = GatedSend()
+    send.gate.set()
+    publisher = AsyncPublisher(send)
+    publisher.publish(CHANNELS['BLOCK'], { 'block': 1 })
+    publisher.flush()
+
+    assert send.sent == [(CHANNELS['BLOCK'], { 'block': 1 })]
+    assert publisher.stats()['published'] == 1
+    assert publisher.stats()['queue_depth'] == 0
+
+def test_async_publisher_batches_queued_transactions():
+    send = GatedSend()
+    publisher = AsyncPublisher(send, batch_size=3)
+    publisher.publish(CHANNELS['BLOCK'], 'block-1')
+
+    for i in range(4):
+        publisher.publish(CHANNELS['TRANSACTION'], f'tx-{i}')
+
+    publisher.publish(CHANNELS['BLOCK'], 'block-2')
+    send.gate.set()
+    publisher.flush()
+
+    assert send.sent == [
+        (CHANNELS['BLOCK'], 'block-1'),
+        (CHANNELS['TRANSACTION'], { 'batch': ['tx-0', 'tx-1', 'tx-2'] }),
+        (CHANNELS['TRANSACTION'], 'tx-3'),
+        (CHANNELS['BLOCK'], 'block-2')
+    ]
+    assert publisher.stats()['batches'] == 4
+    assert publisher.stats()['published'] == 6
+
+def test_async_publisher_batch_max_bytes():
+    send = GatedSend()
+    publisher = AsyncPublisher(send, batch_max_bytes=20)
+    publisher.publish(CHANNELS['BLOCK'], 'block')
+
+    for i in range(3):
+        publisher.publish(CHANNELS['TRANSACTION'], 'x' * 6)
+
+    send.gate.set()
+    publisher.flush()
+
+    assert [message for channel, message in send.sent[1:]] == \
+        [{ 'batch': ['x' * 6, 'x' * 6] }, 'x' * 6]
+
+def test_async_publisher_retries():
+    send = GatedSend(failures=2)
+    send.gate.set()
+    publisher = AsyncPublisher(send, retry_delay=0)
+    publisher.publish(CHANNELS['BLOCK'], 'block')
+    publisher.flush()
+
+    assert send.sent == [(CHANNELS['BLOCK'], 'block')]
+    assert publisher.stats()['retries'] == 2
+
+def test_async_publisher_gives_up():
+    send = GatedSend(failures=10)
+    send.gate.set()
+    publisher = AsyncPublisher(send, max_retries=1, retry_delay=0)
+    publisher.publish(CHANNELS['BLOCK'], 'block')
+    publisher.flush()
+
+    assert send.sent == []
+    assert publisher.stats()['failed'] == 1
+
+def test_async_publisher_drops_when_full():
+    send = GatedSend()
+    publisher = AsyncPublisher(send, max_queue=1, enqueue_timeout=0.01)
+    publisher.publish(CHANNELS['BLOCK'], 'in-flight')
+
+    while publisher.stats()['queue_depth']:
+        pass
+
+    assert publisher.publish(CHANNELS['BLOCK'], 'queued')
+    assert not publisher.publish(CHANNELS['BLOCK'], 'dropped')
+    assert publisher.stats()['dropped'] == 1
+
+    send.gate.set()
+    publisher.flush()
+
+    assert [message for channel, message in send.sent] == ['in-flight', 'queued']
+
+def test_async_publisher_close():
+    send = GatedSend()
+    send.gate.set()
+    publisher = AsyncPublisher(send)
+    publisher.close()
+
+    assert not publisher.worker.is_alive()
+
+def test_listener_sets_batched_transactions():
+    transaction_pool = TransactionPool()
+    listener = Listener(Blockchain(), transaction_pool)
+    transactions = [Transaction(Wallet(), 'recipient', 1) for i in range(2)]
+    listener.message(
+        CHANNELS['TRANSACTION'],
+        { 'batch': [transaction.to_json() for transaction in transactions] }
+    )
+
+    assert set(transaction_pool.transaction_map) == \
+        { transaction.id for transaction in transactions }
+
+def mine_pooled_block(blockchain, transaction_pool):
+    data = transaction_pool.transaction_data()
+    data.append(Transaction.reward_transaction(Wallet()).to_json())
+    blockchain.add_block(data)
+
+    return blockchain.chain[-1]
+
+def test_compact_block_relay():
+    broker = LocalBroker()
+    miner_blockchain, peer_blockchain = Blockchain(), Blockchain()
+    miner_pool, peer_pool = TransactionPool(), TransactionPool()
+    miner = PubSub(miner_blockchain, miner_pool, LocalTransport(broker))
+    peer = PubSub(peer_blockchain, peer_pool, LocalTransport(broker))
+
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    miner.broadcast_transaction(transaction)
+    wait_for(lambda: transaction.id in peer_pool.transaction_map)
+
+    miner.broadcast_block(mine_pooled_block(miner_blockchain, miner_pool))
+    wait_for(lambda: len(peer_blockchain.chain) == 2)
+
+    assert peer_blockchain.chain == miner_blockchain.chain
+    assert peer.listener.stats()['rebuilt_blocks'] == 1
+    assert peer.listener.stats()['requested_blocks'] == 0
+    assert transaction.id not in peer_pool.transaction_map
+
+def test_compact_block_relay_requests_missing_transactions():
+    broker = LocalBroker()
+    miner_blockchain, peer_blockchain = Blockchain(), Blockchain()
+    miner_pool = TransactionPool()
+    miner = PubSub(miner_blockchain, miner_pool, LocalTransport(broker))
+    peer = PubSub(peer_blockchain, TransactionPool(), LocalTransport(broker))
+
+    miner_pool.set_transaction(Transaction(Wallet(), 'recipient', 1))
+    miner.broadcast_block(mine_pooled_block(miner_blockchain, miner_pool))
+    wait_for(lambda: len(peer_blockchain.chain) == 2)
+
+    assert peer_blockchain.chain == miner_blockchain.chain
+    assert peer.listener.stats()['rebuilt_blocks'] == 1
+    assert peer.listener.stats()['requested_blocks'] == 1
+    assert miner.listener.stats()['answered_requests'] == 1
+
+def test_compact_block_relay_answers_missing_transactions_once():
+    broker = LocalBroker()
+    miner_blockchain = Blockchain()
+    miner_pool = TransactionPool()
+    miner = PubSub(miner_blockchain, miner_pool, LocalTransport(broker))
+    peers = [
+        PubSub(Blockchain(), TransactionPool(), LocalTransport(broker))
+        for i in range(3)
+    ]
+    relayed = []
+    recorder = LocalTransport(broker)
+    recorder.subscribe(
+        [CHANNELS['BLOCK'], CHANNELS['BLOCK_TRANSACTIONS']],
+        lambda channel, message: relayed.append((channel, message))
+    )
+
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    miner_pool.set_transaction(transaction)
+    miner.broadcast_block(mine_pooled_block(miner_blockchain, miner_pool))
+    wait_for(lambda: all(
+        peer.listener.blockchain.chain == miner_blockchain.chain for peer in peers
+    ))
+    miner.publisher.flush()
+    wait_for(lambda: relayed)
+
+    assert miner.listener.stats()['answered_requests'] == 1
+    assert [channel for channel, message in relayed] == [CHANNELS['BLOCK_TRANSACTIONS']]
+    assert relayed[0][1]['transactions'] == [transaction.to_json()]
+
+@pytest.fixture
+def listener(monkeypatch):
+    monkeypatch.setattr(pubsub, 'SYNC_DEBOUNCE_DELAY', 0.05)
+    listener = Listener(Blockchain(), TransactionPool())
+    listener.sync_calls = 0
+
+    def sync_blockchain():
+        listener.sync_calls += 1
+
+    listener.sync_blockchain = sync_blockchain
+
+    return listener
+
+@pytest.fixture
+def peer_blocks():
+    blockchain = Blockchain()
+
+    for i in range(3):
+        blockchain.add_block([i])
+
+    return blockchain.chain
+
+def test_listener_appends_a_block_on_the_tip(listener, peer_blocks):
+    chain = listener.blockchain.chain
+    listener.message(CHANNELS['BLOCK'], peer_blocks[1].to_json())
+
+    assert listener.blockchain.chain is chain
+    assert chain == peer_blocks[0:2]
+    assert listener.stats()['appended_blocks'] == 1
+
+def test_listener_drops_duplicate_blocks(listener, peer_blocks):
+    for i in range(3):
+        listener.message(CHANNELS['BLOCK'], peer_blocks[1].to_json())
+
+    assert listener.stats()['appended_blocks'] == 1
+    assert listener.stats()['duplicate_blocks'] == 2
+
+def test_listener_rejects_invalid_proof_of_work(listener, peer_blocks):
+    block = peer_blocks[1].replace(hash='f' * 64)
+    listener.message(CHANNELS['BLOCK'], block.to_json())
+
+    assert listener.blockchain.chain == peer_blocks[0:1]
+    assert listener.stats()['invalid_blocks'] == 1
+
+def test_listener_rejects_invalid_blocks_on_the_tip(listener, peer_blocks):
+    block = peer_blocks[1].replace(data=['evil_data'])
+    listener.message(CHANNELS['BLOCK'], block.to_json())
+    listener.message(CHANNELS['BLOCK'], peer_blocks[1].to_json())
+
+    assert listener.stats()['invalid_blocks'] == 1
+    assert listener.stats()['appended_blocks'] == 1
+
+def test_listener_ignores_stale_blocks(listener, peer_blocks):
+    listener.blockchain.add_block(['local'])
+    listener.message(CHANNELS['BLOCK'], peer_blocks[1].to_json())
+
+    assert listener.stats()['stale_blocks'] == 1
+    assert listener.sync_calls == 0
+
+def test_listener_debounces_syncs_on_gaps(listener, peer_blocks):
+    listener.message(CHANNELS['BLOCK'], peer_blocks[2].to_json())
+    listener.message(CHANNELS['BLOCK'], peer_blocks[3].to_json())
+    wait_for(lambda: listener.sync_calls == 1)
+    time.sleep(0.1)
+
+    assert listener.sync_calls == 1
+    assert listener.stats()['syncs'] == 1
+
+def test_listener_drops_duplicate_transactions(listener):
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    listener.message(CHANNELS['TRANSACTION'], transaction.to_json())
+    listener.message(CHANNELS['TRANSACTION'], transaction.to_json())
+
+    assert listener.stats()['duplicate_transactions'] == 1
+
+    transaction_pool = listener.transaction_pool
+    sender_wallet = Wallet()
+    updated_transaction = Transaction(sender_wallet, 'recipient', 1)
+    updated_transaction.id = transaction.id
+    listener.message(CHANNELS['TRANSACTION'], updated_transaction.to_json())
+
+    assert transaction_pool.transaction_map[transaction.id].output == \
+        updated_transaction.output
@@ -0,0 +1,227 @@
+import pytest
+
+from backend.blockchain.block import Block
+
+from backend.blockchain.blockchain import Blockchain
+from backend.config import SYNC_REQUEST_TIMEOUT
+from backend.wallet.transaction_pool import TransactionPool
+from backend import sync
+from backend.sync import RootPoller, delta_sync, load_chain_lines, stream_blockchain
+
+@pytest.fixture
+def blockchain_three_blocks():
+    blockchain = Blockchain()
+    for i in range(3):
+        blockchain.add_block([i])
+
+    return blockchain
+
+def block_lines(chain):
+    return [block.encoded_json() + b'\n' for block in chain]
+
+def test_load_chain_lines(blockchain_three_blocks):
+    local_chain = Blockchain().chain
+    chain = load_chain_lines(local_chain, blockchain_three_blocks.encoded_lines())
+
+    assert chain == blockchain_three_blocks.chain
+
+def test_load_chain_lines_reuses_the_local_prefix(blockchain_three_blocks):
+    local_chain = blockchain_three_blocks.chain[:2]
+    chain = load_chain_lines(local_chain, blockchain_three_blocks.encoded_lines())
+
+    assert chain[0] is local_chain[0]
+    assert chain[1] is local_chain[1]
+    assert chain[2] is not blockchain_three_blocks.chain[2]
+    assert chain == blockchain_three_blocks.chain
+
+def test_load_chain_lines_skips_blank_lines(blockchain_three_blocks):
+    lines = [b''] + list(blockchain_three_blocks.encoded_lines()) + [b'']
+
+    assert load_chain_lines([], lines) == blockchain_three_blocks.chain
+
+def test_load_chain_lines_reuses_the_local_genesis(blockchain_three_blocks):
+    local_chain = [Block.genesis()]
+    chain = load_chain_lines(local_chain, blockchain_three_blocks.encoded_lines())
+
+    assert chain[0] is local_chain[0]
+
+def test_load_chain_lines_bad_genesis(blockchain_three_blocks):
+    blockchain_three_blocks.chain[0] = \
+        blockchain_three_blocks.chain[0].replace(hash='evil_hash')
+
+    with pytest.raises(Exception, match='The genesis block must be valid'):
+        load_chain_lines([], block_lines(blockchain_three_blocks.chain))
+
+def test_load_chain_lines_stops_at_the_invalid_block(blockchain_three_blocks):
+    blockchain_three_blocks.chain[1] = \
+        blockchain_three_blocks.chain[1].replace(data=['evil_data'])
+
+    def lines():
+        for i, line in enumerate(block_lines(blockchain_three_blocks.chain)):
+            assert i <= 1, 'read past the invalid block'
+            yield line
+
+    with pytest.raises(Exception, match='Invalid block 1'):
+        load_chain_lines([], lines())
+
+def test_replace_chain_with_loaded_lines(blockchain_three_blocks):
+    blockchain = Blockchain()
+    chain = load_chain_lines(blockchain.chain, blockchain_three_blocks.encoded_lines())
+    new_blocks = blockchain.replace_chain(chain, validated=True)
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+    assert new_blocks == blockchain_three_blocks.chain[1:]
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'HTTP {self.status_code}')
+
+class FakeRoot:
+    """
+    Answers the sync requests of a peer from a root blockchain, like the
+    routes of the app.
+    """
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.requested_urls = []
+        self.timeouts = []
+
+    def get(self, url, **kwargs):
+        return self.request(url, method='GET', **kwargs)
+
+    def request(self, url, method, params=None, json=None, timeout=None):
+        self.requested_urls.append(url)
+        self.timeouts.append(timeout)
+        path = url[len('http://root'):]
+
+        if path == '/blockchain/tip':
+            length, tip_hash = self.blockchain.tip()
+            return FakeResponse({ 'length': length, 'hash': tip_hash })
+
+        if path.startswith('/blockchain/after/'):
+            height = self.blockchain.locate([path.split('/')[-1]])
+            limit = params['limit']
+        else:
+            height = self.blockchain.locate(json['locator'])
+            limit = json['limit']
+
+        if height is None:
+            return FakeResponse({}, 404)
+
+        return FakeResponse({
+            'start': height + 1,
+            'blocks': [
+                block.to_json()
+                for block in self.blockchain.blocks_after(height, limit)
+            ]
+        })
+
+@pytest.fixture
+def root(monkeypatch):
+    root = FakeRoot(Blockchain())
+    monkeypatch.setattr(sync.requests, 'get', root.get)
+    monkeypatch.setattr(sync.requests, 'request', root.request)
+
+    return root
+
+def test_delta_sync_up_to_date(root):
+    assert delta_sync(Blockchain(), 'http://root') == []
+    assert root.requested_urls == ['http://root/blockchain/tip']
+
+def test_delta_sync_fetches_the_missing_blocks(root):
+    blockchain = Blockchain()
+    for i in range(3):
+        root.blockchain.add_block([i])
+    blockchain.chain = root.blockchain.chain[:2]
+    new_blocks = delta_sync(blockchain, 'http://root', page_size=1)
+
+    assert new_blocks == root.blockchain.chain[2:]
+    assert blockchain.chain == root.blockchain.chain
+    assert 'http://root/blockchain/locate' not in root.requested_urls
+
+def test_delta_sync_locates_the_fork(root):
+    for i in range(3):
+        root.blockchain.add_block([i])
+    blockchain = Blockchain()
+    blockchain.chain = root.blockchain.chain[:2]
+    blockchain.add_block(['local'])
+    delta_sync(blockchain, 'http://root')
+
+    assert blockchain.chain == root.blockchain.chain
+    assert 'http://root/blockchain/locate' in root.requested_urls
+    assert root.timeouts == [SYNC_REQUEST_TIMEOUT] * len(root.requested_urls)
+
+class FakeStream:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+def test_stream_blockchain_sets_a_timeout(blockchain_three_blocks, monkeypatch):
+    requests = []
+
+    def get(url, **kwargs):
+        requests.append(kwargs)
+        return FakeStream(block_lines(blockchain_three_blocks.chain))
+
+    monkeypatch.setattr(sync.requests, 'get', get)
+    blockchain = Blockchain()
+    stream_blockchain(blockchain, 'http://root/blockchain/stream')
+
+    assert blockchain.chain == blockchain_three_blocks.chain
+    assert requests == [{ 'stream': True, 'timeout': SYNC_REQUEST_TIMEOUT }]
+
+@pytest.fixture
+def poller(root):
+    return RootPoller(
+        Blockchain(),
+        TransactionPool(),
+        'http://root',
+        idle_interval=8,
+        min_interval=1,
+        max_interval=32
+    )
+
+def test_root_poller_skips_unchanged_tips(poller, root):
+    assert poller.poll() == 8
+    assert poller.stats()['skipped_syncs'] == 1
+    assert root.requested_urls == ['http://root/blockchain/tip']
+
+def test_root_poller_speeds_up_after_new_blocks(poller, root):
+    root.blockchain.add_block(['one'])
+
+    assert poller.poll() == 1
+    assert poller.blockchain.chain == root.blockchain.chain
+    assert poller.stats()['syncs'] == 1
+
+    assert poller.poll() == 2
+    assert poller.poll() == 4
+    assert poller.poll() == 8
+    assert poller.poll() == 8
+
+def test_root_poller_backs_off_while_unreachable(poller, monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise Exception('Connection refused')
+
+    monkeypatch.setattr(sync.requests, 'get', unreachable)
+
+    assert [poller.poll() for i in range(4)] == [16, 32, 32, 32]
+    assert poller.stats()['failed_polls'] == 4
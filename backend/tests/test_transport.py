@@ -0,0 +1,97 @@
+import pytest
+
+from backend.blockchain.blockchain import Blockchain
+from backend.pubsub import PubSub
+from backend.tests.helpers import wait_for
+from backend.transport import (
+    LocalBroker,
+    LocalTransport,
+    SocketBroker,
+    SocketTransport,
+    Transport,
+    create_transport,
+    parse_address
+)
+from backend.wallet.transaction import Transaction
+from backend.wallet.transaction_pool import TransactionPool
+from backend.wallet.wallet import Wallet
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, channel, message):
+        self.messages.append((channel, message))
+
+def test_parse_address():
+    assert parse_address('localhost:5040')[1] == ('localhost', 5040)
+    assert parse_address(':5040')[1] == ('localhost', 5040)
+    assert parse_address('/tmp/broker.sock')[1] == '/tmp/broker.sock'
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+def test_create_transport_unknown():
+    with pytest.raises(Exception, match='Unknown PubSub transport'):
+        create_transport('carrier-pigeon')
+
+def test_local_transport():
+    broker = LocalBroker()
+    first, second = LocalTransport(broker), LocalTransport(broker)
+    first_recorder, second_recorder = Recorder(), Recorder()
+    first.subscribe(['BLOCK'], first_recorder)
+    second.subscribe(['BLOCK', 'TRANSACTION'], second_recorder)
+
+    message = { 'foo': 'bar' }
+    first.publish('TRANSACTION', message)
+    first.publish('BLOCK', message)
+    wait_for(lambda: len(second_recorder.messages) == 2)
+    wait_for(lambda: len(first_recorder.messages) == 1)
+
+    assert second_recorder.messages == [('TRANSACTION', message), ('BLOCK', message)]
+    assert first_recorder.messages[0][1] is not message
+
+def test_local_transport_close():
+    broker = LocalBroker()
+    transport = LocalTransport(broker)
+    transport.subscribe(['BLOCK'], Recorder())
+    transport.close()
+
+    assert broker.subscriptions == []
+
+@pytest.fixture(params=['tcp', 'unix'])
+def socket_broker(request, tmp_path):
+    address = '127.0.0.1:0' if request.param == 'tcp' else str(tmp_path / 'broker.sock')
+    broker = SocketBroker(address)
+    broker.start()
+    yield broker
+    broker.close()
+
+def test_socket_transport(socket_broker):
+    first = SocketTransport(socket_broker.address)
+    second = SocketTransport(socket_broker.address)
+    recorder = Recorder()
+    second.subscribe(['BLOCK'], recorder)
+    wait_for(lambda: len(socket_broker.subscriptions) == 1)
+
+    first.publish('TRANSACTION', 'ignored')
+    first.publish('BLOCK', { 'foo': [1, 2] })
+    wait_for(lambda: recorder.messages)
+
+    assert recorder.messages == [('BLOCK', { 'foo': [1, 2] })]
+
+    second.close()
+    wait_for(lambda: not socket_broker.subscriptions)
+    first.close()
+
+def test_pubsub_over_a_local_transport():
+    broker = LocalBroker()
+    sender_pool, receiver_pool = TransactionPool(), TransactionPool()
+    sender = PubSub(Blockchain(), sender_pool, LocalTransport(broker))
+    PubSub(Blockchain(), receiver_pool, LocalTransport(broker))
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    sender.broadcast_transaction(transaction)
+
+    wait_for(lambda: transaction.id in receiver_pool.transaction_map)
+    wait_for(lambda: transaction.id in sender_pool.transaction_map)
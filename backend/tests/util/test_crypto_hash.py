@@ -1,7 +1,36 @@
-from backend.util.crypto_hash import crypto_hash
+import random
+import uuid
+
+from backend.util.crypto_hash import crypto_hash, BlockHasher
 
 def test_crypto_hash():
     # It should create the same hash with arguments of different data types in
     # any order
     assert crypto_hash(1, [2], 'three') == crypto_hash('three', 1, [2])
     assert crypto_hash('foo') == 'b2213295d564916f89a6a42455567c87c3f480fcd7a1c15e220f17d7169a790b'
+
+def random_block_data():
+    return random.choice([
+        'test-data',
+        random.randint(-10**6, 10**6),
+        random.random() * 100,
+        None,
+        True,
+        [random.randint(0, 9) for i in range(random.randint(0, 5))],
+        [{ 'id': str(uuid.uuid4())[0:8], 'output': { 'a': random.randint(1, 50) } }],
+        { 'foo': random.random() }
+    ])
+
+def test_block_hasher_matches_crypto_hash():
+    for i in range(500):
+        last_hash = random.choice([str(uuid.uuid4()), 'genesis_hash', ''])
+        data = random_block_data()
+        hasher = BlockHasher(last_hash, data)
+
+        for j in range(5):
+            timestamp = random.randint(-10**20, 10**20)
+            difficulty = random.randint(1, 20)
+            nonce = random.randint(0, 10**9)
+
+            assert hasher.hash(timestamp, difficulty, nonce) == \
+                crypto_hash(timestamp, last_hash, data, difficulty, nonce)
@@ -0,0 +1,32 @@
+from backend.util.lru_cache import LRUCache
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert len(cache) == 2
+
+def test_lru_cache_stats():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.stats() == { 'size': 1, 'max_size': 2, 'hits': 1, 'misses': 1 }
+
+def test_lru_cache_pop_and_clear():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+
+    assert cache.pop('a') == 1
+    assert cache.pop('a') is None
+
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,40 @@
+import random
+
+from backend.util.crypto_hash import crypto_hash
+from backend.util.hex_to_binary import hex_to_binary
+from backend.util.proof_of_work import (
+    digest_meets_difficulty,
+    hash_meets_difficulty
+)
+
+def test_hash_meets_difficulty():
+    assert hash_meets_difficulty('0fff', 4)
+    assert not hash_meets_difficulty('0fff', 5)
+    assert hash_meets_difficulty('00ff', 8)
+    assert hash_meets_difficulty('1fff', 3)
+    assert not hash_meets_difficulty('fff', 1)
+
+def test_hash_meets_difficulty_longer_than_hash():
+    assert not hash_meets_difficulty('00', 9)
+
+def test_negative_difficulty_is_not_met():
+    assert not hash_meets_difficulty('0fff', -1)
+    assert not hash_meets_difficulty('ffff', -5)
+    assert not digest_meets_difficulty(bytes.fromhex('0fff'), -1)
+
+def test_hash_meets_difficulty_matches_hex_to_binary():
+    for i in range(1000):
+        hash = crypto_hash(i)
+        hash = '0' * random.randint(0, 4) + hash[random.randint(0, 60):]
+        difficulty = random.randint(0, 30)
+
+        assert hash_meets_difficulty(hash, difficulty) == \
+            (hex_to_binary(hash)[0:difficulty] == '0' * difficulty)
+
+def test_digest_meets_difficulty():
+    for i in range(1000):
+        hash = crypto_hash(i)
+        difficulty = random.randint(0, 8)
+
+        assert digest_meets_difficulty(bytes.fromhex(hash), difficulty) == \
+            hash_meets_difficulty(hash, difficulty)
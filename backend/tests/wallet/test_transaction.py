@@ -1,5 +1,6 @@
 import pytest
 
+from backend.wallet import transaction as transaction_module
 from backend.wallet.transaction import Transaction
 from backend.wallet.wallet import Wallet
 
@@ -82,3 +83,70 @@ def test_valid_transaction_with_invalid_signature():
 
     with pytest.raises(Exception, match='Invalid signature'):
         Transaction.is_valid_transaction(transaction)
+
+def test_valid_transaction_caches_verified_signature(monkeypatch):
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    Transaction.is_valid_transaction(transaction)
+    verify_calls = []
+
+    def verify(public_key, data, signature):
+        verify_calls.append(data)
+        return True
+
+    monkeypatch.setattr(Wallet, 'verify', verify)
+    Transaction.is_valid_transaction(transaction)
+    Transaction.is_valid_transaction(Transaction.from_json(transaction.to_json()))
+
+    assert verify_calls == []
+
+def test_valid_transaction_cache_checks_output(monkeypatch):
+    transaction = Transaction(Wallet(), 'recipient', 50)
+    Transaction.is_valid_transaction(transaction)
+
+    transaction.output['recipient'] = 40
+    transaction.output['evil_recipient'] = 10
+
+    with pytest.raises(Exception, match='Invalid signature'):
+        Transaction.is_valid_transaction(transaction)
+
+@pytest.fixture
+def parallel_small_batches(monkeypatch):
+    monkeypatch.setattr(transaction_module, 'PARALLEL_VALIDATION_MIN_TRANSACTIONS', 2)
+
+def test_validate_many(parallel_small_batches):
+    transactions = [Transaction(Wallet(), 'recipient', 50) for i in range(5)]
+    transactions.append(Transaction.reward_transaction(Wallet()))
+
+    Transaction.validate_many(transactions, workers=2)
+
+def test_validate_many_remembers_verified_signatures(parallel_small_batches):
+    transactions = [Transaction(Wallet(), 'recipient', 50) for i in range(4)]
+    Transaction.validate_many(transactions, workers=2)
+
+    for transaction in transactions:
+        assert Transaction.is_signature_verified(transaction)
+
+def test_validate_many_raises_first_error(parallel_small_batches):
+    transactions = [Transaction(Wallet(), 'recipient', 50) for i in range(6)]
+    transactions[4].input['signature'] = Wallet().sign(transactions[4].output)
+    transactions[2].output['recipient'] = 9001
+
+    for workers in [1, 2]:
+        with pytest.raises(Exception, match='Invalid transaction output values'):
+            Transaction.validate_many(transactions, workers)
+
+def test_validate_many_orders_cached_and_pending_errors(parallel_small_batches):
+    transactions = [Transaction(Wallet(), 'recipient', 50) for i in range(4)]
+    Transaction.is_valid_transaction(transactions[3])
+    reward_transaction = Transaction.reward_transaction(Wallet())
+    reward_transaction.output[Wallet().address] = 1
+    transactions[0].input['signature'] = Wallet().sign(transactions[0].output)
+
+    with pytest.raises(Exception, match='Invalid signature'):
+        Transaction.validate_many(transactions + [reward_transaction], workers=2)
+
+    with pytest.raises(Exception, match='Invalid mining reward'):
+        Transaction.validate_many(
+            [reward_transaction] + transactions,
+            workers=2
+        )
@@ -1,4 +1,6 @@
-from backend.wallet.transaction_pool import TransactionPool
+import threading
+
+from backend.wallet.transaction_pool import TransactionPool, transaction_size
 from backend.wallet.transaction import Transaction
 from backend.wallet.wallet import Wallet
 from backend.blockchain.blockchain import Blockchain
@@ -28,3 +30,168 @@ def test_clear_blockchain_transactions():
 
     assert not transaction_1.id in transaction_pool.transaction_map
     assert not transaction_2.id in transaction_pool.transaction_map
+
+def test_existing_transaction():
+    transaction_pool = TransactionPool()
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 1)
+    transaction_pool.set_transaction(transaction)
+
+    assert transaction_pool.existing_transaction(sender_wallet.address) == transaction
+    assert transaction_pool.existing_transaction(Wallet().address) is None
+
+def test_remove_transaction():
+    transaction_pool = TransactionPool()
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 1)
+    transaction_pool.set_transaction(transaction)
+    transaction_pool.remove_transaction(transaction.id)
+    transaction_pool.remove_transaction(transaction.id)
+
+    assert transaction_pool.transaction_map == {}
+    assert transaction_pool.existing_transaction(sender_wallet.address) is None
+
+def test_clear_block_transactions():
+    transaction_pool = TransactionPool()
+    transaction_1 = Transaction(Wallet(), 'recipient', 1)
+    transaction_2 = Transaction(Wallet(), 'recipient', 2)
+
+    transaction_pool.set_transaction(transaction_1)
+    transaction_pool.set_transaction(transaction_2)
+
+    blockchain = Blockchain()
+    blockchain.add_block([transaction_1.to_json()])
+    transaction_pool.clear_block_transactions(blockchain.chain[-1:])
+
+    assert not transaction_1.id in transaction_pool.transaction_map
+    assert transaction_2.id in transaction_pool.transaction_map
+
+def test_clear_block_transactions_after_replace_chain():
+    transaction_pool = TransactionPool()
+    transaction_1 = Transaction(Wallet(), 'recipient', 1)
+    transaction_2 = Transaction(Wallet(), 'recipient', 2)
+
+    transaction_pool.set_transaction(transaction_1)
+    transaction_pool.set_transaction(transaction_2)
+
+    blockchain = Blockchain()
+    blockchain.add_block([transaction_1.to_json()])
+
+    longer_blockchain = Blockchain()
+    longer_blockchain.add_block([transaction_2.to_json()])
+    longer_blockchain.add_block('test-data')
+
+    new_blocks = blockchain.replace_chain(longer_blockchain.chain)
+    transaction_pool.clear_block_transactions(new_blocks)
+
+    assert transaction_1.id in transaction_pool.transaction_map
+    assert not transaction_2.id in transaction_pool.transaction_map
+
+def test_bounded_pool_evicts_lowest_priority():
+    transaction_pool = TransactionPool(max_transactions=2)
+    transactions = [Transaction(Wallet(), 'recipient', 1) for i in range(3)]
+
+    assert transaction_pool.set_transaction(transactions[0]) == []
+    assert transaction_pool.set_transaction(transactions[1]) == []
+    assert transaction_pool.set_transaction(transactions[2]) == [transactions[2]]
+    assert list(transaction_pool.transaction_map.keys()) == \
+        [transactions[0].id, transactions[1].id]
+
+def test_bounded_pool_max_bytes():
+    transaction = Transaction(Wallet(), 'recipient', 1)
+    transaction_pool = TransactionPool(max_bytes=transaction_size(transaction))
+    transaction_pool.set_transaction(transaction)
+    transaction_pool.set_transaction(Transaction(Wallet(), 'recipient', 1))
+
+    assert list(transaction_pool.transaction_map.keys()) == [transaction.id]
+    assert transaction_pool.total_bytes == transaction_size(transaction)
+
+def test_bounded_pool_custom_priority():
+    transactions = [Transaction(Wallet(), 'recipient', amount) for amount in [5, 1, 3]]
+    transaction_pool = TransactionPool(
+        max_transactions=2,
+        priority=lambda transaction: transaction.output['recipient']
+    )
+
+    for transaction in transactions:
+        transaction_pool.set_transaction(transaction)
+
+    assert set(transaction_pool.transaction_map.keys()) == \
+        { transactions[0].id, transactions[2].id }
+
+def test_updated_transaction_keeps_pool_accounting():
+    sender_wallet = Wallet()
+    transaction = Transaction(sender_wallet, 'recipient', 1)
+    transaction_pool = TransactionPool(max_transactions=1)
+    transaction_pool.set_transaction(transaction)
+
+    transaction.update(sender_wallet, 'another_recipient', 2)
+    assert transaction_pool.set_transaction(transaction) == []
+    assert transaction_pool.total_bytes == transaction_size(transaction)
+
+    transaction_pool.remove_transaction(transaction.id)
+    assert transaction_pool.total_bytes == 0
+    assert transaction_pool.evict() == []
+
+def test_select_for_block():
+    transaction_pool = TransactionPool()
+    transactions = [Transaction(Wallet(), 'recipient', 1) for i in range(4)]
+
+    for transaction in reversed(transactions):
+        transaction_pool.set_transaction(transaction)
+
+    assert transaction_pool.select_for_block(2) == \
+        [transactions[0].to_json(), transactions[1].to_json()]
+
+    max_bytes = transaction_size(transactions[0]) + transaction_size(transactions[1])
+    assert transaction_pool.select_for_block(max_bytes=max_bytes) == \
+        [transactions[0].to_json(), transactions[1].to_json()]
+    assert len(transaction_pool.select_for_block()) == 4
+
+def test_set_transaction_replaces_another_senders_transaction():
+    transaction_pool = TransactionPool()
+    first_wallet, second_wallet = Wallet(), Wallet()
+    transaction = Transaction(first_wallet, 'recipient', 1)
+    transaction_pool.set_transaction(transaction)
+
+    replacement = Transaction(second_wallet, 'recipient', 1)
+    replacement.id = transaction.id
+    transaction_pool.set_transaction(replacement)
+
+    assert transaction_pool.existing_transaction(first_wallet.address) is None
+    assert transaction_pool.existing_transaction(second_wallet.address) is replacement
+    assert transaction_pool.total_bytes == transaction_size(replacement)
+
+    transaction_pool.remove_transaction(transaction.id)
+
+    assert transaction_pool.existing_transaction(first_wallet.address) is None
+    assert transaction_pool.existing_transaction(second_wallet.address) is None
+
+def test_transaction_pool_concurrent_writers():
+    transaction_pool = TransactionPool()
+    transactions = [Transaction(Wallet(), 'recipient', 1) for i in range(4)]
+
+    for transaction in transactions[1:]:
+        transaction.id = transactions[0].id
+
+    def write(transaction):
+        for i in range(200):
+            transaction_pool.set_transaction(transaction)
+            transaction_pool.select_for_block()
+            transaction_pool.remove_transaction(transaction.id)
+
+    threads = [
+        threading.Thread(target=write, args=(transaction,))
+        for transaction in transactions
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert transaction_pool.transaction_map == {}
+    assert transaction_pool.sender_map == {}
+    assert transaction_pool.heap_sequences == {}
+    assert transaction_pool.total_bytes == 0
@@ -1,3 +1,6 @@
+from backend.blockchain.blockchain import Blockchain
+from backend.config import STARTING_BALANCE
+from backend.wallet.transaction import Transaction
 from backend.wallet.wallet import Wallet
 
 def test_verify_valid_signature():
@@ -13,3 +16,51 @@ def test_verify_invalid_signature():
     signature = wallet.sign(data)
 
     assert not Wallet.verify(Wallet().public_key, data, signature)
+
+def test_calculate_balance():
+    blockchain = Blockchain()
+    wallet = Wallet()
+
+    assert Wallet.calculate_balance(blockchain, wallet.address) == STARTING_BALANCE
+
+    amount = 50
+    transaction = Transaction(Wallet(), wallet.address, amount)
+    blockchain.add_block([transaction.to_json()])
+
+    assert Wallet.calculate_balance(blockchain, wallet.address) == \
+        STARTING_BALANCE + amount
+
+    recipient_amount_1 = 25
+    transaction_1 = Transaction(Wallet(), wallet.address, recipient_amount_1)
+
+    recipient_amount_2 = 43
+    transaction_2 = Transaction(Wallet(), wallet.address, recipient_amount_2)
+
+    blockchain.add_block([transaction_1.to_json(), transaction_2.to_json()])
+
+    assert Wallet.calculate_balance(blockchain, wallet.address) == \
+        STARTING_BALANCE + amount + recipient_amount_1 + recipient_amount_2
+
+def test_calculate_balance_resets_on_send():
+    blockchain = Blockchain()
+    wallet = Wallet(blockchain)
+
+    transaction = Transaction(wallet, 'recipient', 30)
+    blockchain.add_block([transaction.to_json()])
+
+    assert wallet.balance == STARTING_BALANCE - 30
+
+    received = Transaction(Wallet(), wallet.address, 12)
+    blockchain.add_block([received.to_json()])
+
+    assert wallet.balance == STARTING_BALANCE - 30 + 12
+
+def test_load_public_key_is_cached():
+    wallet = Wallet()
+    hits = Wallet.public_key_cache.hits
+
+    first_key = Wallet.load_public_key(wallet.public_key)
+    second_key = Wallet.load_public_key(wallet.public_key)
+
+    assert first_key is second_key
+    assert Wallet.public_key_cache.hits == hits + 1
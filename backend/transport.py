@@ -0,0 +1,365 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+from pubnub.pubnub import PubNub
+from pubnub.pnconfiguration import PNConfiguration
+from pubnub.callbacks import SubscribeCallback
+
+from backend.config import PUBSUB_BROKER_ADDRESS
+
+pnconfig = PNConfiguration()
+pnconfig.publish_key = os.environ.get('PUBNUB_PUBLISH_KEY')
+pnconfig.subscribe_key = os.environ.get('PUBNUB_SUBSCRIBE_KEY')
+pnconfig.user_id = os.environ.get('PUBNUB_USER_ID', 'blockchain-node-default')
+
+# Tells an Inbox thread to stop
+STOP = object()
+
+class Transport(ABC):
+    """
+    Moves json messages between the nodes of the network.
+    Every node that subscribed to a channel receives the messages published
+    to it, including its own. Callbacks are called as callback(channel,
+    message) on a thread of the transport.
+    """
+    @abstractmethod
+    def subscribe(self, channels, callback):
+        pass
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """
+        Publish the message to the channel. Raise if it can't be published.
+        """
+
+    def close(self):
+        pass
+
+class PubNubCallback(SubscribeCallback):
+    def __init__(self, callback):
+        self.callback = callback
+
+    def message(self, pubnub, message_object):
+        self.callback(message_object.channel, message_object.message)
+
+class PubNubTransport(Transport):
+    """
+    Transport through the PubNub cloud service.
+    """
+    def __init__(self, config=pnconfig):
+        self.pubnub = PubNub(config)
+
+    def subscribe(self, channels, callback):
+        self.pubnub.add_listener(PubNubCallback(callback))
+        self.pubnub.subscribe().channels(channels).execute()
+
+    def publish(self, channel, message):
+        result = self.pubnub.publish().channel(channel).message(message).sync()
+
+        if result.status.is_error():
+            raise Exception(f'PubNub returned an error status: {result.status}')
+
+    def close(self):
+        self.pubnub.stop()
+
+class Inbox:
+    """
+    Calls a subscriber callback with its messages, in order, on a thread of
+    its own. A slow subscriber doesn't hold up the other subscribers.
+    """
+    def __init__(self, callback):
+        self.callback = callback
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, channel, message):
+        self.queue.put((channel, message))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+
+            if item is STOP:
+                return
+
+            try:
+                self.callback(*item)
+            except Exception as e:
+                print(f'\n-- Error handling a message from {item[0]}: {e}')
+
+    def close(self):
+        self.queue.put(STOP)
+
+class LocalBroker:
+    """
+    In-memory broker that connects the LocalTransports of one process.
+    Messages are copied through json, like they would be on a network.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []
+
+    def subscribe(self, channels, inbox):
+        with self.lock:
+            self.subscriptions.append((set(channels), inbox))
+
+    def unsubscribe(self, inbox):
+        with self.lock:
+            self.subscriptions = [
+                subscription for subscription in self.subscriptions
+                if subscription[1] is not inbox
+            ]
+
+    def publish(self, channel, message):
+        encoded_message = json.dumps(message)
+
+        with self.lock:
+            inboxes = [
+                inbox for channels, inbox in self.subscriptions
+                if channel in channels
+            ]
+
+        for inbox in inboxes:
+            inbox.put(channel, json.loads(encoded_message))
+
+local_broker = LocalBroker()
+
+class LocalTransport(Transport):
+    """
+    Transport between nodes that run in the same process.
+    """
+    def __init__(self, broker=local_broker):
+        self.broker = broker
+        self.inboxes = []
+
+    def subscribe(self, channels, callback):
+        inbox = Inbox(callback)
+        self.inboxes.append(inbox)
+        self.broker.subscribe(channels, inbox)
+
+    def publish(self, channel, message):
+        self.broker.publish(channel, message)
+
+    def close(self):
+        for inbox in self.inboxes:
+            self.broker.unsubscribe(inbox)
+            inbox.close()
+
+def parse_address(address):
+    """
+    Return the socket family and address of a broker address. 'host:port'
+    addresses are TCP, any other address is the path of a Unix socket.
+    """
+    host, separator, port = address.rpartition(':')
+
+    if separator and port.isdigit():
+        return socket.AF_INET, (host or 'localhost', int(port))
+
+    return socket.AF_UNIX, address
+
+class BrokerConnection(socketserver.StreamRequestHandler):
+    """
+    A node connected to the SocketBroker. Nodes send newline delimited json
+    frames:
+      - { 'op': 'subscribe', 'channels': [...] }
+      - { 'op': 'publish', 'channel': ..., 'message': ... }
+    Publish frames are forwarded as they are to the subscribed nodes.
+    """
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+
+    def handle(self):
+        broker = self.server.broker
+
+        try:
+            for line in self.rfile:
+                frame = json.loads(line)
+
+                if frame['op'] == 'subscribe':
+                    broker.subscribe(self, frame['channels'])
+                elif frame['op'] == 'publish':
+                    broker.forward(frame['channel'], line)
+        finally:
+            broker.unsubscribe(self)
+
+    def send(self, frame):
+        with self.write_lock:
+            self.wfile.write(frame)
+            self.wfile.flush()
+
+class TCPBrokerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class UnixBrokerServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class SocketBroker:
+    """
+    Broker that connects the SocketTransports of nodes in separate processes
+    over TCP or a Unix socket.
+    """
+    def __init__(self, address=PUBSUB_BROKER_ADDRESS):
+        family, server_address = parse_address(address)
+        self.unix_path = None
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)
+
+            self.unix_path = address
+            self.server = UnixBrokerServer(server_address, BrokerConnection)
+        else:
+            self.server = TCPBrokerServer(server_address, BrokerConnection)
+
+        self.server.broker = self
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.thread = None
+
+    @property
+    def address(self):
+        """
+        The address to connect to, with the actual port of a TCP broker.
+        """
+        if self.unix_path is not None:
+            return self.unix_path
+
+        host, port = self.server.server_address[0:2]
+
+        return f'{host}:{port}'
+
+    def subscribe(self, connection, channels):
+        with self.lock:
+            self.subscriptions.setdefault(connection, set()).update(channels)
+
+    def unsubscribe(self, connection):
+        with self.lock:
+            self.subscriptions.pop(connection, None)
+
+    def forward(self, channel, frame):
+        with self.lock:
+            connections = [
+                connection for connection, channels in self.subscriptions.items()
+                if channel in channels
+            ]
+
+        for connection in connections:
+            try:
+                connection.send(frame)
+            except OSError:
+                self.unsubscribe(connection)
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        """
+        Serve from a background thread.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self.thread is not None:
+            self.server.shutdown()
+
+        self.server.server_close()
+
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+
+class SocketTransport(Transport):
+    """
+    Transport through a SocketBroker.
+    """
+    def __init__(self, address=PUBSUB_BROKER_ADDRESS):
+        family, server_address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(server_address)
+
+        if family == socket.AF_INET:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.write_lock = threading.Lock()
+        self.subscriptions = []
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def send_frame(self, frame):
+        data = json.dumps(frame).encode('utf-8') + b'\n'
+
+        with self.write_lock:
+            self.socket.sendall(data)
+
+    def subscribe(self, channels, callback):
+        inbox = Inbox(callback)
+        self.subscriptions.append((set(channels), inbox))
+        self.send_frame({ 'op': 'subscribe', 'channels': list(channels) })
+
+    def publish(self, channel, message):
+        self.send_frame({ 'op': 'publish', 'channel': channel, 'message': message })
+
+    def read(self):
+        try:
+            for line in self.socket.makefile('rb'):
+                frame = json.loads(line)
+
+                for channels, inbox in self.subscriptions:
+                    if frame['channel'] in channels:
+                        inbox.put(frame['channel'], frame['message'])
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self.socket.close()
+
+        for channels, inbox in self.subscriptions:
+            inbox.close()
+
+def create_transport(kind=None, address=None):
+    """
+    Create the transport named by kind, or by the PUBSUB_TRANSPORT
+    environment variable: pubnub (the default), local or socket.
+    """
+    kind = kind or os.environ.get('PUBSUB_TRANSPORT', 'pubnub')
+
+    if kind == 'pubnub':
+        return PubNubTransport()
+
+    if kind == 'local':
+        return LocalTransport()
+
+    if kind == 'socket':
+        return SocketTransport(
+            address or os.environ.get('PUBSUB_BROKER', PUBSUB_BROKER_ADDRESS)
+        )
+
+    raise Exception(f'Unknown PubSub transport: {kind}')
+
+def main():
+    address = sys.argv[1] if len(sys.argv) > 1 else \
+        os.environ.get('PUBSUB_BROKER', PUBSUB_BROKER_ADDRESS)
+    broker = SocketBroker(address)
+    print(f'\n-- Broker listening on {broker.address}')
+
+    try:
+        broker.serve_forever()
+    finally:
+        broker.close()
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,59 @@ def crypto_hash(*args):
 
     return hashlib.sha256(joined_data.encode('utf-8')).hexdigest()
 
+class BlockHasher:
+    """
+    Mining fast path for crypto_hash(timestamp, last_hash, data, difficulty, nonce).
+    Serializes the last_hash and data once per block, so that every nonce
+    attempt only encodes the integer timestamp, difficulty and nonce.
+
+    crypto_hash sorts the serialized arguments. The serialized integers start
+    with a digit or a '-'. Fixed arguments that sort before those go into a
+    hashlib state that is copied for every attempt, fixed arguments that sort
+    after them are kept as pre-encoded bytes, and the rest (numeric data) is
+    sorted along with the integers.
+    """
+    def __init__(self, last_hash, data):
+        head = []
+        middle = []
+        tail = []
+
+        for stringified_arg in (json.dumps(last_hash), json.dumps(data)):
+            if stringified_arg[0] < '-':
+                head.append(stringified_arg)
+            elif stringified_arg[0] > '9':
+                tail.append(stringified_arg)
+            else:
+                middle.append(stringified_arg)
+
+        self.head_state = hashlib.sha256(''.join(sorted(head)).encode('utf-8'))
+        self.middle = middle
+        self.tail_bytes = ''.join(sorted(tail)).encode('utf-8')
+
+    def hash(self, timestamp, difficulty, nonce):
+        """
+        Return the crypto_hash of the block fields for the given integer
+        timestamp, difficulty and nonce.
+        """
+        return self.state(timestamp, difficulty, nonce).hexdigest()
+
+    def digest(self, timestamp, difficulty, nonce):
+        """
+        Return the raw bytes behind BlockHasher.hash.
+        """
+        return self.state(timestamp, difficulty, nonce).digest()
+
+    def state(self, timestamp, difficulty, nonce):
+        stringified_args = [str(timestamp), str(difficulty), str(nonce)]
+        stringified_args.extend(self.middle)
+        stringified_args.sort()
+
+        state = self.head_state.copy()
+        state.update(''.join(stringified_args).encode('utf-8'))
+        state.update(self.tail_bytes)
+
+        return state
+
 def main():
     print(f"crypto_hash('one', 2, [3]): {crypto_hash('one', 2, [3])}")
     print(f"crypto_hash(2, 'one', [3]): {crypto_hash(2, 'one', [3])}")
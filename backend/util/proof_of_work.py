@@ -0,0 +1,35 @@
+from backend.util.crypto_hash import crypto_hash
+
+def digest_meets_difficulty(digest, difficulty):
+    """
+    Check that the raw digest bytes start with at least `difficulty` 0 bits.
+    A negative difficulty is never met.
+    """
+    bit_length = len(digest) * 8
+
+    if not 0 <= difficulty <= bit_length:
+        return False
+
+    return int.from_bytes(digest, 'big') >> (bit_length - difficulty) == 0
+
+def hash_meets_difficulty(hash, difficulty):
+    """
+    Check that the hex hash string starts with at least `difficulty` 0 bits.
+    Matches hex_to_binary(hash)[0:difficulty] == '0' * difficulty without
+    building the binary string. A negative difficulty is never met.
+    """
+    bit_length = len(hash) * 4
+
+    if not 0 <= difficulty <= bit_length:
+        return False
+
+    return int(hash, 16) >> (bit_length - difficulty) == 0
+
+def main():
+    hash = crypto_hash('test-data')
+    print(f'hash: {hash}')
+    print(f'hash_meets_difficulty(hash, 1): {hash_meets_difficulty(hash, 1)}')
+    print(f"hash_meets_difficulty('0fff', 4): {hash_meets_difficulty('0fff', 4)}")
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,41 @@
+import hashlib
+import json
+import multiprocessing
 import time
 import uuid
 
 from backend.wallet.wallet import Wallet
-from backend.config import MINING_REWARD, MINING_REWARD_INPUT
+from backend.config import (
+    MINING_REWARD,
+    MINING_REWARD_INPUT,
+    PARALLEL_VALIDATION_MIN_TRANSACTIONS,
+    VERIFIED_SIGNATURE_CACHE_SIZE
+)
+from backend.util.lru_cache import LRUCache
+
+# Chunks handed out per worker when validating transactions in parallel
+CHUNKS_PER_WORKER = 4
+
+def _find_invalid_transaction(args):
+    offset, transactions = args
+
+    for i, transaction in enumerate(transactions):
+        try:
+            Transaction.is_valid_transaction(transaction)
+        except Exception as e:
+            return offset + i, str(e)
+
+    return None
 
 class Transaction:
     """
     Document of an exchange in currency from a sender to one
     or more recipients.
     """
+    # (id, output digest, signature) keys of transactions whose signature
+    # already passed verification
+    verified_signature_cache = LRUCache(VERIFIED_SIGNATURE_CACHE_SIZE)
+
     def __init__(
         self,
         sender_wallet=None,
@@ -125,6 +152,11 @@ class Transaction:
         if transaction.input['amount'] != output_total:
             raise Exception('Invalid transaction output values')
 
+        cache_key = Transaction.signature_cache_key(transaction)
+
+        if Transaction.verified_signature_cache.get(cache_key):
+            return
+
         if not Wallet.verify(
             transaction.input['public_key'],
             transaction.output,
@@ -132,6 +164,100 @@ class Transaction:
         ):
             raise Exception('Invalid signature')
 
+        Transaction.verified_signature_cache.put(cache_key, True)
+
+    @staticmethod
+    def validate_many(transactions, workers=None):
+        """
+        Validate a batch of transactions, spreading the signature checks across
+        a pool of worker processes. Raise the exception of the first invalid
+        transaction, exactly like calling is_valid_transaction one at a time.
+        Small batches and already verified signatures stay in this process.
+        """
+        workers = workers or multiprocessing.cpu_count()
+        pending = []
+        cheap_error = None
+
+        for transaction in transactions:
+            if transaction.input == MINING_REWARD_INPUT or \
+                    Transaction.is_signature_verified(transaction):
+                try:
+                    Transaction.is_valid_transaction(transaction)
+                except Exception as e:
+                    # Transactions after the first failure don't matter
+                    cheap_error = e
+                    break
+            else:
+                pending.append(transaction)
+
+        if workers <= 1 or len(pending) < PARALLEL_VALIDATION_MIN_TRANSACTIONS:
+            for transaction in pending:
+                Transaction.is_valid_transaction(transaction)
+        else:
+            Transaction.validate_in_pool(pending, workers)
+
+        if cheap_error is not None:
+            raise cheap_error
+
+    @staticmethod
+    def is_signature_verified(transaction):
+        try:
+            cache_key = Transaction.signature_cache_key(transaction)
+        except Exception:
+            return False
+
+        return cache_key in Transaction.verified_signature_cache
+
+    @staticmethod
+    def validate_in_pool(transactions, workers):
+        """
+        Validate the transactions in ordered chunks across a process pool.
+        The workers' signature caches are lost, so remember the verified
+        transactions in this process.
+        """
+        chunk_size = -(-len(transactions) // (workers * CHUNKS_PER_WORKER))
+        chunks = [
+            (offset, transactions[offset:offset+chunk_size])
+            for offset in range(0, len(transactions), chunk_size)
+        ]
+        invalid_transaction = None
+
+        with multiprocessing.Pool(workers) as pool:
+            # imap keeps the chunk order, so the first failure is the lowest index.
+            for result in pool.imap(_find_invalid_transaction, chunks):
+                if result is not None:
+                    invalid_transaction = result
+                    break
+
+        valid_count = len(transactions)
+
+        if invalid_transaction is not None:
+            valid_count, message = invalid_transaction
+
+        for transaction in transactions[0:valid_count]:
+            Transaction.verified_signature_cache.put(
+                Transaction.signature_cache_key(transaction),
+                True
+            )
+
+        if invalid_transaction is not None:
+            raise Exception(message)
+
+    @staticmethod
+    def signature_cache_key(transaction):
+        """
+        Key a transaction signature check by the transaction id, a digest of
+        the signed output and the public key, and the signature itself.
+        """
+        output_digest = hashlib.sha256(
+            (
+                json.dumps(transaction.output) + transaction.input['public_key']
+            ).encode('utf-8')
+        ).digest()
+        (r, s) = transaction.input['signature']
+
+        return (transaction.id, output_digest, int(r), int(s))
+
     @staticmethod
     def reward_transaction(miner_wallet):
         """
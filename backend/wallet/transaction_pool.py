@@ -1,39 +1,208 @@
+import heapq
+import itertools
+import json
+import threading
+
+def transaction_age_priority(transaction):
+    """
+    Rank older transactions higher, by their input timestamp.
+    """
+    return -transaction.input['timestamp']
+
+def transaction_size(transaction):
+    """
+    The byte size of the transaction's json serialized form.
+    """
+    return len(json.dumps(transaction.to_json(), separators=(',', ':')))
+
 class TransactionPool:
-    def __init__(self):
+    """
+    The pending transactions that have not been recorded in a block yet.
+    Unbounded by default. With max_transactions or max_bytes set, the pool
+    evicts its lowest priority transactions to stay within those limits.
+
+    The miner, the network listeners and the API threads all use the pool,
+    so its methods hold the pool lock.
+    """
+    def __init__(self, max_transactions=None, max_bytes=None, priority=None):
         self.transaction_map = {}
+        self.sender_map = {}
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.priority = priority or transaction_age_priority
+        self.transaction_sizes = {}
+        self.total_bytes = 0
+        # Min-heap of (priority, sequence, transaction id). Entries whose
+        # sequence is no longer the latest for their transaction are stale.
+        self.priority_heap = []
+        self.heap_sequences = {}
+        self.sequence = itertools.count()
+        self.lock = threading.RLock()
 
     def set_transaction(self, transaction):
         """
         Set a transaction in the transaction pool.
+        Return the transactions evicted to stay within the pool limits.
+        """
+        size = transaction_size(transaction)
+
+        with self.lock:
+            # The replaced transaction may come from another sender
+            self.remove_transaction(transaction.id)
+
+            self.transaction_map[transaction.id] = transaction
+            self.sender_map.setdefault(
+                transaction.input['address'],
+                {}
+            )[transaction.id] = True
+
+            self.total_bytes += size
+            self.transaction_sizes[transaction.id] = size
+
+            sequence = next(self.sequence)
+            self.heap_sequences[transaction.id] = sequence
+            heapq.heappush(
+                self.priority_heap,
+                (self.priority(transaction), sequence, transaction.id)
+            )
+
+            return self.evict()
+
+    def remove_transaction(self, transaction_id):
+        """
+        Remove a transaction from the transaction pool, if it is there.
+        """
+        with self.lock:
+            transaction = self.transaction_map.pop(transaction_id, None)
+
+            if transaction is None:
+                return
+
+            address = transaction.input['address']
+            transaction_ids = self.sender_map[address]
+            del transaction_ids[transaction_id]
+
+            if not transaction_ids:
+                del self.sender_map[address]
+
+            self.total_bytes -= self.transaction_sizes.pop(transaction_id)
+            del self.heap_sequences[transaction_id]
+
+            if len(self.priority_heap) > 2 * len(self.transaction_map) + 64:
+                self.compact_heap()
+
+    def get_transaction(self, transaction_id):
+        """
+        Return the pooled transaction with the id, or None.
+        """
+        with self.lock:
+            return self.transaction_map.get(transaction_id)
+
+    def is_full(self):
+        return (
+            (self.max_transactions is not None
+                and len(self.transaction_map) > self.max_transactions)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        )
+
+    def evict(self):
+        """
+        Remove the lowest priority transactions until the pool is within its
+        limits. Return the evicted transactions.
         """
-        self.transaction_map[transaction.id] = transaction
+        evicted = []
+
+        with self.lock:
+            while self.is_full():
+                priority, sequence, transaction_id = heapq.heappop(self.priority_heap)
 
+                if self.heap_sequences.get(transaction_id) != sequence:
+                    continue
+
+                evicted.append(self.transaction_map[transaction_id])
+                self.remove_transaction(transaction_id)
+
+        return evicted
+
+    def compact_heap(self):
+        """
+        Drop the stale entries of the priority heap.
+        """
+        with self.lock:
+            self.priority_heap = [
+                entry for entry in self.priority_heap
+                if self.heap_sequences.get(entry[2]) == entry[1]
+            ]
+            heapq.heapify(self.priority_heap)
 
     def existing_transaction(self, address):
         """
         Find a transaction generated by the address in the transaction pool
         """
-        for transaction in self.transaction_map.values():
-            if transaction.input['address'] == address:
-                return transaction
+        with self.lock:
+            transaction_ids = self.sender_map.get(address)
+
+            if transaction_ids:
+                return self.transaction_map[next(iter(transaction_ids))]
 
     def transaction_data(self):
         """
         Return the transactions of thje transaction pool represented in their
         json serialized form.
         """
-        return list(map(
-            lambda transaction: transaction.to_json(),
-            self.transaction_map.values()
-        ))
+        with self.lock:
+            transactions = list(self.transaction_map.values())
+
+        return list(map(lambda transaction: transaction.to_json(), transactions))
+
+    def select_for_block(self, max_count=None, max_bytes=None):
+        """
+        Return the json serialized form of the highest priority transactions
+        that fit within max_count transactions and max_bytes bytes.
+        """
+        selected = []
+        selected_bytes = 0
+
+        with self.lock:
+            transactions = sorted(
+                self.transaction_map.values(),
+                key=self.priority,
+                reverse=True
+            )
+            sizes = [self.transaction_sizes[transaction.id] for transaction in transactions]
+
+        for transaction, size in zip(transactions, sizes):
+            if max_count is not None and len(selected) >= max_count:
+                break
+
+            if max_bytes is not None and selected_bytes + size > max_bytes:
+                continue
+
+            selected.append(transaction.to_json())
+            selected_bytes += size
+
+        return selected
+
+    def clear_block_transactions(self, blocks):
+        """
+        Delete the transactions recorded in the given blocks from the
+        transaction pool. Pass the blocks that were just added to the chain,
+        like the ones returned by Blockchain.replace_chain.
+        """
+        with self.lock:
+            for block in blocks:
+                for transaction in block.transactions():
+                    self.remove_transaction(transaction.get('id'))
 
     def clear_blockchain_transactions(self, blockchain):
         """
         Delete blockchain recorded transactions from the transaction pool.
+        Looks each pooled transaction up in the blockchain's transaction index,
+        without holding the pool lock while the chain lock is taken.
         """
-        for block in blockchain.chain:
-            for transaction in block.data:
-                try:
-                    del self.transaction_map[transaction['id']]
-                except KeyError:
-                    pass
+        with self.lock:
+            transaction_ids = list(self.transaction_map.keys())
+
+        for transaction_id in transaction_ids:
+            if blockchain.find_transaction(transaction_id) is not None:
+                self.remove_transaction(transaction_id)
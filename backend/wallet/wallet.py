@@ -1,7 +1,8 @@
 import json
 import uuid
 
-from backend.config import STARTING_BALANCE
+from backend.config import PUBLIC_KEY_CACHE_SIZE, STARTING_BALANCE
+from backend.util.lru_cache import LRUCache
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.asymmetric.utils import (
@@ -17,6 +18,9 @@ class Wallet:
     Keeps track of the miner's balance.
     Allows a miner to authorize transactions.
     """
+    # Deserialized public keys, keyed by their PEM string
+    public_key_cache = LRUCache(PUBLIC_KEY_CACHE_SIZE)
+
     def __init__(self, blockchain=None):
         self.blockchain = blockchain
         self.address = str(uuid.uuid4())[0:8]
@@ -50,15 +54,28 @@ class Wallet:
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ).decode('utf-8')
 
+    @staticmethod
+    def load_public_key(public_key):
+        """
+        Deserialize a PEM public key, reusing recently loaded keys.
+        """
+        deserialized_public_key = Wallet.public_key_cache.get(public_key)
+
+        if deserialized_public_key is None:
+            deserialized_public_key = serialization.load_pem_public_key(
+                public_key.encode('utf-8'),
+                default_backend()
+            )
+            Wallet.public_key_cache.put(public_key, deserialized_public_key)
+
+        return deserialized_public_key
+
     @staticmethod
     def verify(public_key, data, signature):
         """
         Verify a signature based on the original public key and data.
         """
-        deserialized_public_key = serialization.load_pem_public_key(
-            public_key.encode('utf-8'),
-            default_backend()
-        )
+        deserialized_public_key = Wallet.load_public_key(public_key)
 
         (r, s) = signature
 
@@ -79,23 +96,13 @@ class Wallet:
         data within the blockchain.
 
         The balance is found by adding the output values that belong to the
-        address since the most recent transaction by that address.
+        address since the most recent transaction by that address. The
+        blockchain keeps these balances indexed as blocks are added.
         """
-        balance = STARTING_BALANCE
-
         if not blockchain:
-            return balance
-
-        for block in blockchain.chain:
-            for transaction in block.data:
-                if transaction['input']['address'] == address:
-                    # Any time the address conducts a new transaction it resets
-                    # its balance
-                    balance = transaction['output'][address]
-                elif address in transaction['output']:
-                    balance += transaction['output'][address]
-
-        return balance
+            return STARTING_BALANCE
+
+        return blockchain.balance(address)
 
 def main():
     wallet = Wallet()